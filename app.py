@@ -1,46 +1,79 @@
 # app.py
 import os
 import streamlit as st
-from utils.loaders import load_sop_files_from_config
 from utils.config_loader import load_config, setup_internal_sources
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import FastEmbedEmbeddings
-from langchain_community.vectorstores import FAISS
+from rag.vector_store import get_store_settings, sources_fingerprint
+from rag.partitions import load_partitions
+from rag.index_sync import sync_partitions
+from rag.ingest_queue import start_ingest_queue
 from hybrid_assistant import HybridSOPAssistant
-from case_submission_ui import show_add_case_form
+from case_submission_ui import show_add_case_form, show_case_statuses
 
 # ------------------------------
-# Load configuration & SOPs
+# Shared, process-wide state
 # ------------------------------
-config = load_config("config.yaml")
-internal_sources = config.get("internal_sources", [])
-local_paths = setup_internal_sources(internal_sources)
+# Streamlit re-executes this script on every widget interaction, so everything
+# heavy lives in st.cache_resource and is shared by all sessions. Per-session
+# choices (mode, engine) live in st.session_state and are passed per query.
+@st.cache_resource
+def load_app_config():
+    config = load_config("config.yaml")
+    local_paths = setup_internal_sources(config.get("internal_sources", []), interactive=False)
+    return config, local_paths
+
+
+@st.cache_resource(show_spinner="📂 Loading SOP index...")
+def load_assistant():
+    """
+    Open the published index (memory-mapped, shared with the other workers on
+    the node) and the engines once per process. Queries follow newly
+    published snapshots on their own.
+    """
+    config, local_paths = load_app_config()
+    index = load_partitions(local_paths, config)
+    if index is None:
+        return None, None
+    return index, HybridSOPAssistant(index=index, engines_config=config)
+
+
+@st.cache_resource
+def load_ingest_queue():
+    """Durable queue of submitted cases, indexed by one background worker per process."""
+    config, local_paths = load_app_config()
+    index, _ = load_assistant()
+    return start_ingest_queue(index, local_paths, config)
+
+
+@st.cache_resource(max_entries=1, show_spinner="🔄 Re-indexing changed SOP files...")
+def sync_sources(sources_key: str):
+    """Re-index and publish a snapshot when the SOP files change (sources_key); all workers switch to it."""
+    config, local_paths = load_app_config()
+    index, _ = load_assistant()
+    if index is not None:
+        sync_partitions(index, local_paths, config)
+
+
+config, local_paths = load_app_config()
 
 st.title("📄 SOP Assistant")
 
 st.write("Ask a question related to the SOPs, switch modes, or add a new case.")
 
-docs = load_sop_files_from_config(local_paths)
-splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-chunks = splitter.split_documents(docs)
-embeddings = FastEmbedEmbeddings()
-db = FAISS.from_documents(chunks, embeddings)
-
-# ------------------------------
-# Initialize Assistant
-# ------------------------------
-assistant = HybridSOPAssistant(db=db, engines_config=config)
+index, assistant = load_assistant()
+if index is None:
+    st.warning("⚠️ No SOP documents loaded. Make sure your internal sources exist.")
+    st.stop()
+sync_sources(sources_fingerprint(local_paths, get_store_settings(config)))
 
 # ------------------------------
 # UI: Mode selection
 # ------------------------------
 mode_options = ["rag", "hybrid", "external"]
 if "current_mode" not in st.session_state:
-    st.session_state.current_mode = assistant.mode
+    st.session_state.current_mode = assistant.default_mode
 
 new_mode = st.selectbox("Select mode", mode_options, index=mode_options.index(st.session_state.current_mode))
 if new_mode != st.session_state.current_mode:
-    assistant.set_mode(new_mode)
     st.session_state.current_mode = new_mode
     st.success(f"Mode switched to {new_mode.upper()}")
 
@@ -49,15 +82,22 @@ if new_mode != st.session_state.current_mode:
 # ------------------------------
 engine_options = list(assistant.engine_instances.keys())
 if engine_options:
-    if "current_engine" not in st.session_state:
-        st.session_state.current_engine = assistant.current_engine or engine_options[0]
+    if st.session_state.get("current_engine") not in engine_options:
+        st.session_state.current_engine = engine_options[0]
 
     new_engine = st.selectbox("Select external engine", engine_options, index=engine_options.index(st.session_state.current_engine))
     if new_engine != st.session_state.current_engine:
-        assistant.set_engine(new_engine)
         st.session_state.current_engine = new_engine
         st.success(f"External engine switched to {new_engine}")
 
+# ------------------------------
+# UI: SOP sources to search
+# ------------------------------
+source_options = index.names + [team for team in index.teams if team not in index.partitions]
+sop_sources = st.multiselect("Search SOP sources / teams (none selected = all)", source_options,
+                             default=st.session_state.get("sop_sources", []))
+st.session_state.sop_sources = sop_sources
+
 # ------------------------------
 # UI: Query input
 # ------------------------------
@@ -66,16 +106,32 @@ query = st.text_input("Enter your question:")
 if st.button("Ask"):
     if query:
         try:
-            result = assistant.query(query)
             st.subheader("🤖 Assistant Response:")
-            st.write(result.get("result", ""))
-
+            answer_box = st.empty()
+            warnings_box = st.container()
             st.subheader("📎 Sources:")
-            for doc in result.get("sources", []):
-                if isinstance(doc, dict):
-                    st.markdown(f"- [{doc.get('type')}] `{doc.get('source')}`")
-                else:
-                    st.markdown(f"- {doc}")
+            sources_box = st.empty()
+
+            # Render tokens and sources as they arrive
+            answer, sources = "", []
+            for event in assistant.stream_query(
+                query,
+                mode=st.session_state.current_mode,
+                engine=st.session_state.get("current_engine"),
+                sop_sources=st.session_state.sop_sources or None,
+            ):
+                if event["type"] == "token":
+                    answer += event["text"]
+                    answer_box.markdown(answer + "▌")
+                elif event["type"] == "sources":
+                    sources.extend(event["sources"])
+                    sources_box.markdown("\n".join(
+                        f"- [{doc.get('type')}] `{doc.get('source')}`" if isinstance(doc, dict) else f"- {doc}"
+                        for doc in sources
+                    ))
+                elif event["type"] == "warning":
+                    warnings_box.warning(f"⚠ {event['text']}")
+            answer_box.markdown(answer)
 
         except Exception as e:
             st.error(f"⚠ Error during query: {e}")
@@ -89,5 +145,7 @@ if "show_add_case" not in st.session_state:
 if st.button("➕ Add New Case"):
     st.session_state["show_add_case"] = True
 
+ingest_queue = load_ingest_queue()
 if st.session_state["show_add_case"]:
-    show_add_case_form(db)
+    show_add_case_form(ingest_queue)
+show_case_statuses(ingest_queue)
@@ -0,0 +1,145 @@
+# benchmarks/ann_index.py
+"""
+Recall vs. latency vs. memory of the FAISS index types and vector codes on the SOP corpus.
+
+Vectors are taken from the current snapshots of all source partitions
+(re-embedded through the embedding cache, so this is fast after a normal run). Queries are questions
+from --questions, or the opening of randomly sampled chunks. Recall@k is
+measured against the exact flat index. Lossy indexes are also measured with
+re-scoring of rescore_factor x k candidates by exact distance; memory is the
+index itself (the exact vectors live in a memory-mapped file).
+
+    python benchmarks/ann_index.py --k 10
+    python benchmarks/ann_index.py --types flat,hnsw --quantization none,sq8,pq
+    python benchmarks/ann_index.py --synthetic 300000   # grow the corpus with noisy copies
+"""
+import argparse
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag.ann_index import (  # noqa: E402
+    INDEX_TYPES, QUANTIZATION_TYPES, configure_search, create_index, describe_index, get_index_settings, is_lossy,
+)
+from rag.partitions import partitioned_index  # noqa: E402
+from utils.config_loader import load_config  # noqa: E402
+
+
+def corpus_vectors(config: dict) -> tuple[np.ndarray, list[str], object]:
+    index = partitioned_index(config)
+    texts = [
+        db.docstore.search(i).page_content
+        for _, db in index.current()
+        for i in db.index_to_docstore_id.values()
+    ]
+    if not texts:
+        sys.exit("❌ No index snapshots, run main.py once to build them.")
+    vectors = np.asarray(index.embeddings.embed_documents(texts), dtype=np.float32)
+    return vectors, texts, index.embeddings
+
+
+def grow(vectors: np.ndarray, size: int, rng: np.random.Generator) -> np.ndarray:
+    """Pad the corpus to `size` vectors with noisy copies of real ones."""
+    if size <= len(vectors):
+        return vectors
+    picks = rng.integers(0, len(vectors), size - len(vectors))
+    noise = rng.normal(0, vectors.std() * 0.3, (len(picks), vectors.shape[1])).astype(np.float32)
+    return np.vstack([vectors, vectors[picks] + noise])
+
+
+def run(index: faiss.Index, queries: np.ndarray, k: int, vectors: np.ndarray | None = None,
+        rescore_factor: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Search one query at a time, as the assistant does, optionally re-scoring
+    rescore_factor * k candidates against the exact `vectors`.
+    Returns:
+        (ids, per-query ms)
+    """
+    faiss.omp_set_num_threads(1)
+    ids = np.full((len(queries), k), -1, dtype=np.int64)
+    times = np.empty(len(queries))
+    for i, q in enumerate(queries):
+        t0 = time.perf_counter()
+        _, found = index.search(q[None, :], k * rescore_factor)
+        found = found[0][found[0] != -1]
+        if vectors is not None:
+            found = found[np.argsort(((vectors[found] - q) ** 2).sum(axis=1), kind="stable")]
+        ids[i, :min(k, len(found))] = found[:k]
+        times[i] = (time.perf_counter() - t0) * 1000
+    return ids, times
+
+
+def configurations(types: list[str], codes: list[str]) -> list[tuple[str, str]]:
+    """(index type, quantization) pairs, exact flat first as the reference."""
+    configs = [("flat", "none")]
+    for kind in types:
+        for q in (["none"] if kind == "ivfpq" else codes):
+            if (kind, q) not in configs:
+                configs.append((kind, q))
+    return configs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="number of sampled chunk queries")
+    parser.add_argument("--questions", help="file with one question per line (instead of sampled chunks)")
+    parser.add_argument("--synthetic", type=int, default=0, help="grow the corpus to this many vectors")
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--quantization", default=",".join(QUANTIZATION_TYPES),
+                        help="vector codes to try with flat / HNSW")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    index_settings = get_index_settings(config)
+    rng = np.random.default_rng(0)
+
+    vectors, texts, embeddings = corpus_vectors(config)
+    if args.questions:
+        with open(args.questions) as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        sample = rng.choice(len(texts), min(args.queries, len(texts)), replace=False)
+        questions = [texts[i][:200] for i in sample]
+    queries = np.asarray([embeddings.embed_query(q) for q in questions], dtype=np.float32)
+    vectors = grow(vectors, args.synthetic, rng)
+    print(f"📊 {len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}\n")
+
+    exact = None
+    print(f"{'index':<52} {'build s':>8} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'memory MB':>10}")
+    for kind, codes in configurations(args.types.split(","), args.quantization.split(",")):
+        kind_settings = dict(index_settings, type=kind)
+        kind_settings["quantization"] = dict(index_settings["quantization"], type=codes)
+        t0 = time.perf_counter()
+        train = None
+        if is_lossy(kind_settings):
+            size = kind_settings["ivfpq" if kind == "ivfpq" else "quantization"]["train_size"]
+            train = vectors[rng.choice(len(vectors), min(len(vectors), size), replace=False)]
+        index = create_index(vectors.shape[1], kind_settings, train)
+        index.add(vectors)
+        configure_search(index, kind_settings)
+        build = time.perf_counter() - t0
+        memory = faiss.serialize_index(index).nbytes / 1e6
+
+        runs = [("", run(index, queries, args.k))]
+        if is_lossy(kind_settings):
+            factor = kind_settings["quantization"]["rescore_factor"]
+            runs.append((f" + rescore x{factor}", run(index, queries, args.k, vectors, factor)))
+        for suffix, (ids, times) in runs:
+            if exact is None:
+                exact = ids
+            recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(ids, exact)])
+            print(
+                f"{describe_index(index) + suffix:<52} {build:>8.1f} {recall:>9.3f} "
+                f"{np.percentile(times, 50):>8.3f} {np.percentile(times, 95):>8.3f} {memory:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# benchmarks/concurrent_queries.py
+"""
+Retrieval throughput of one shared index under concurrent queries.
+
+Runs the assistant's hybrid retrieval (query embedding, FAISS, BM25, RRF,
+docstore lookups) from 1, 2, 4, ... threads against the published snapshots
+of all source partitions, the way concurrent Streamlit sessions or MCP calls
+do, and reports queries per second and latency per thread count. With --writer, another thread keeps
+adding chunks to a private writable copy of the first partition meanwhile, as
+a sync or case submission would before publishing. The LLM call is left out.
+
+    python benchmarks/concurrent_queries.py --threads 1,2,4,8
+    python benchmarks/concurrent_queries.py --threads 1,4 --writer --seconds 20
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag.chunk_store import add_chunks  # noqa: E402
+from rag.retriever import HybridRetriever  # noqa: E402
+from rag.partitions import PartitionedIndex, partitioned_index  # noqa: E402
+from rag.vector_store import load_snapshot  # noqa: E402
+from utils.config_loader import load_config  # noqa: E402
+
+
+def sample_questions(index: PartitionedIndex, count: int, rng: np.random.Generator) -> list[str]:
+    chunks = [(db, i) for _, db in index.current() for i in db.index_to_docstore_id.values()]
+    picks = rng.choice(len(chunks), min(count, len(chunks)), replace=False)
+    return [chunks[i][0].docstore.search(chunks[i][1]).page_content[:200] for i in picks]
+
+
+def run(retriever: HybridRetriever, questions: list[str], threads: int, seconds: float) -> tuple[int, np.ndarray]:
+    """
+    Query from `threads` threads until `seconds` have passed.
+    Returns:
+        (queries completed, per-query ms)
+    """
+    stop = time.monotonic() + seconds
+    times: list[list[float]] = [[] for _ in range(threads)]
+
+    def worker(n: int):
+        i = n
+        while time.monotonic() < stop:
+            t0 = time.perf_counter()
+            retriever.invoke(questions[i % len(questions)])
+            times[n].append((time.perf_counter() - t0) * 1000)
+            i += threads
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+    flat = np.array([t for per_thread in times for t in per_thread])
+    return len(flat), flat
+
+
+class Writer(threading.Thread):
+    """Adds batches of chunks to a private copy of the index until stopped."""
+
+    def __init__(self, index: PartitionedIndex, texts: list[str], batch: int = 32):
+        super().__init__(name="benchmark-writer", daemon=True)
+        name, _ = index.current()[0]
+        live = index.partitions[name]
+        self.db = load_snapshot(live.store_path, index.embeddings, live.index_settings)
+        self.texts = texts
+        self.batch = batch
+        self.added = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            texts = [t[::-1] for t in self.texts[:self.batch]]
+            vectors = self.db.embeddings.embed_documents(texts)
+            ids = [str(uuid.uuid4()) for _ in texts]
+            add_chunks(self.db, texts, vectors, [{"source": "benchmark"}] * len(texts), ids)
+            self.added += len(texts)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--threads", default="1,2,4,8", help="comma-separated thread counts")
+    parser.add_argument("--seconds", type=float, default=10, help="run time per thread count")
+    parser.add_argument("--queries", type=int, default=200, help="number of sampled chunk queries")
+    parser.add_argument("--questions", help="file with one question per line (instead of sampled chunks)")
+    parser.add_argument("--writer", action="store_true", help="add chunks to a private index copy meanwhile")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    index = partitioned_index(config)
+    if not index.current():
+        sys.exit("❌ No index snapshots, run main.py once to build them.")
+
+    retrieval = ((config.get("assistant") or {}).get("retrieval") or {})
+    retriever = HybridRetriever(
+        index=index, k=retrieval.get("k", 10), fetch_k=retrieval.get("fetch_k", 30), rrf_k=retrieval.get("rrf_k", 60),
+    )
+    if args.questions:
+        with open(args.questions) as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        questions = sample_questions(index, args.queries, np.random.default_rng(0))
+
+    # Warm up the page cache, the BM25 index and the embedding model
+    for question in questions[:10]:
+        retriever.invoke(question)
+
+    writer = None
+    if args.writer:
+        writer = Writer(index, questions)
+        writer.start()
+
+    chunks = sum(db.index.ntotal for _, db in index.current())
+    print(f"📊 {chunks} chunks in {len(index.names)} sources, {len(questions)} queries, {args.seconds:g}s per run, "
+          f"{os.cpu_count()} CPUs{', writer adding chunks' if writer else ''}\n")
+    print(f"{'threads':>7} {'queries':>8} {'qps':>8} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    base = None
+    for threads in [int(t) for t in args.threads.split(",")]:
+        done, times = run(retriever, questions, threads, args.seconds)
+        qps = done / args.seconds
+        base = base or qps
+        print(f"{threads:>7} {done:>8} {qps:>8.1f} {qps / base:>7.2f}x "
+              f"{np.percentile(times, 50):>8.2f} {np.percentile(times, 95):>8.2f}")
+
+    if writer is not None:
+        writer.stop()
+        print(f"\n✍️ Writer added {writer.added} chunks meanwhile")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# benchmarks/mcp_sop_search.py
+"""
+Startup and per-call latency of the sop_server MCP tools, measured end to end
+through the stdio transport the way an agent calls them.
+
+Starts the server, times until it answers initialize (the index is opened
+and warmed up before that), then calls sop_search one query at a time and
+sop_search_batch with --batch queries per call. Queries are questions from
+--questions, or the opening of SOP files under ./sops.
+
+    python benchmarks/mcp_sop_search.py --calls 200
+    python benchmarks/mcp_sop_search.py --batch 8 --questions questions.txt
+"""
+import argparse
+import asyncio
+import os
+import random
+import shlex
+import sys
+import time
+
+import numpy as np
+from mcp import ClientSession
+from mcp.client.stdio import StdioServerParameters, stdio_client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample_questions(count: int, rng: random.Random) -> list[str]:
+    paths = [
+        os.path.join(dirpath, name)
+        for dirpath, _, names in os.walk(os.path.join(ROOT, "sops"))
+        for name in names if name.endswith((".md", ".txt"))
+    ]
+    questions = []
+    for path in rng.sample(paths, min(count, len(paths))):
+        with open(path, errors="ignore") as f:
+            text = " ".join(f.read(400).split())
+        if text:
+            questions.append(text[:120])
+    return questions
+
+
+def percentiles(times: list[float]) -> str:
+    return f"p50 {np.percentile(times, 50):7.2f} ms   p95 {np.percentile(times, 95):7.2f} ms   max {max(times):7.2f} ms"
+
+
+async def run(args, questions: list[str]):
+    command = shlex.split(args.command)
+    env = dict(os.environ, SOP_ASSISTANT_CONFIG=args.config)
+    server = StdioServerParameters(command=command[0], args=command[1:], env=env, cwd=ROOT)
+
+    started = time.perf_counter()
+    async with stdio_client(server) as (read, write), ClientSession(read, write) as session:
+        await session.initialize()
+        startup = time.perf_counter() - started
+        print(f"🚀 Server ready in {startup:.2f}s")
+
+        async def call(tool: str, arguments: dict) -> float:
+            t0 = time.perf_counter()
+            result = await session.call_tool(tool, arguments)
+            if result.isError:
+                sys.exit(f"❌ {tool} failed: {result.content}")
+            return (time.perf_counter() - t0) * 1000
+
+        first = await call("sop_search", {"query": questions[0], "k": args.k})
+        print(f"🔎 First sop_search: {first:.2f} ms")
+
+        single = [await call("sop_search", {"query": questions[i % len(questions)], "k": args.k})
+                  for i in range(args.calls)]
+        print(f"🔎 sop_search x{len(single)}:        {percentiles(single)}")
+
+        batches = [questions[i:i + args.batch] for i in range(0, len(questions), args.batch)]
+        batched = [await call("sop_search_batch", {"queries": batches[i % len(batches)], "k": args.k})
+                   for i in range(max(1, args.calls // args.batch))]
+        per_query = [t / args.batch for t in batched]
+        print(f"📦 sop_search_batch ({args.batch}/call): {percentiles(batched)}")
+        print(f"   per query:                {percentiles(per_query)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--command", default=f"{sys.executable} -m mcp_servers.sop_server.server",
+                        help="command that starts the server (stdio)")
+    parser.add_argument("--calls", type=int, default=100, help="sop_search calls to time")
+    parser.add_argument("--batch", type=int, default=8, help="queries per sop_search_batch call")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--questions", help="file with one question per line (instead of SOP openings)")
+    args = parser.parse_args()
+
+    if args.questions:
+        with open(args.questions) as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        questions = sample_questions(max(args.batch, 50), random.Random(0))
+    if not questions:
+        sys.exit("❌ No questions: pass --questions or add SOP files under ./sops")
+    asyncio.run(run(args, questions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# benchmarks/splitter.py
+"""
+Split throughput of the structure-aware SOPSplitter against the plain
+RecursiveCharacterTextSplitter it replaced.
+
+Splits the SOP files under --path (default ./sops), and with --synthetic a
+generated Markdown runbook of that many MB (headings, numbered steps, code
+blocks), and reports MB/s, chunk counts and sizes, how many code blocks
+that would fit in one chunk were cut anyway, and the peak Python memory of
+splitting the largest file read whole vs. streamed from disk.
+
+    python benchmarks/splitter.py
+    python benchmarks/splitter.py --synthetic 200 --chunk-size 500 --chunk-overlap 100
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag.splitter import SOPSplitter  # noqa: E402
+from utils.loaders import list_sop_files, load_sop_file  # noqa: E402
+
+_CODE_BLOCK = re.compile(r"^```.*?^```", re.M | re.S)
+
+WORDS = ("redis memory eviction kafka consumer lag disk pressure node pod restart dns timeout certificate "
+         "expiry postgres vacuum replica failover latency alert dashboard grafana").split()
+
+
+def write_runbook(path: str, megabytes: float, rng: random.Random):
+    """A large exported runbook: sections with prose, numbered steps and shell snippets."""
+    target = int(megabytes * 1024 * 1024)
+    written = 0
+    with open(path, "w") as f:
+        section = 0
+        while written < target:
+            section += 1
+            parts = [f"# Runbook {section}\n\n"]
+            for sub in range(rng.randint(2, 5)):
+                parts.append(f"## {rng.choice(WORDS).title()} {section}.{sub}\n\n")
+                parts.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 90))) + ".\n\n")
+                for step in range(1, rng.randint(3, 7)):
+                    parts.append(f"{step}. " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30))) + ":\n\n")
+                    if rng.random() < 0.5:
+                        # Scripts have blank lines between commented groups of commands
+                        lines = [f"\n# check {rng.choice(WORDS)}" if rng.random() < 0.25 else
+                                 f"kubectl -n {rng.choice(WORDS)} get pods -o wide | grep {rng.choice(WORDS)}"
+                                 for _ in range(rng.randint(2, 8))]
+                        parts.append("```bash\n" + "\n".join(lines) + "\n```\n\n")
+            text = "".join(parts)
+            f.write(text)
+            written += len(text)
+
+
+def cut_code_blocks(text: str, chunks: list[str], chunk_size: int) -> tuple[int, int]:
+    """(code blocks that fit in a chunk, how many of them are not whole in any chunk)"""
+    blocks = [b for b in _CODE_BLOCK.findall(text) if len(b) <= chunk_size]
+    joined = "\x00".join(chunks)
+    return len(blocks), sum(1 for b in blocks if b not in joined)
+
+
+def measure(name: str, split, texts: list[tuple[str, str]], chunk_size: int):
+    total = sum(len(t.encode("utf-8")) for _, t in texts)
+    started = time.perf_counter()
+    chunks = [split(path, text) for path, text in texts]
+    elapsed = time.perf_counter() - started
+    flat = [c for per_file in chunks for c in per_file]
+    blocks = cut = 0
+    for (_, text), per_file in zip(texts, chunks):
+        b, c = cut_code_blocks(text, per_file, chunk_size)
+        blocks, cut = blocks + b, cut + c
+    print(f"{name:<22} {total / elapsed / 1e6:>8.1f} {len(flat):>9} {sum(map(len, flat)) / max(len(flat), 1):>10.0f} "
+          f"{f'{cut}/{blocks}':>14}")
+
+
+def peak_memory(split) -> float:
+    tracemalloc.start()
+    for _ in split():
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default="sops", help="folder of SOP files")
+    parser.add_argument("--synthetic", type=float, default=50, help="MB of generated runbook to add (0 = none)")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    args = parser.parse_args()
+
+    paths = list(list_sop_files({"bench": args.path})) if os.path.isdir(args.path) else []
+    tmp_dir = tempfile.TemporaryDirectory()
+    if args.synthetic:
+        runbook = os.path.join(tmp_dir.name, "runbook.md")
+        write_runbook(runbook, args.synthetic, random.Random(0))
+        paths.append(runbook)
+    if not paths:
+        sys.exit("❌ No SOP files: pass --path or --synthetic")
+
+    texts = [(p, doc.page_content) for p in paths if (doc := load_sop_file(p, "bench")) is not None]
+    print(f"📊 {len(texts)} files, {sum(len(t) for _, t in texts) / 1e6:.1f} MB, "
+          f"chunk_size {args.chunk_size}, chunk_overlap {args.chunk_overlap}\n")
+
+    recursive = RecursiveCharacterTextSplitter(
+        chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap, add_start_index=True,
+    )
+    structure = SOPSplitter(args.chunk_size, args.chunk_overlap)
+
+    print(f"{'splitter':<22} {'MB/s':>8} {'chunks':>9} {'avg chars':>10} {'code blocks cut':>14}")
+    measure("recursive", lambda path, text: recursive.split_text(text), texts, args.chunk_size)
+    measure("structure (in memory)",
+            lambda path, text: [d.page_content for d in structure.split_documents(
+                [Document(page_content=text, metadata={"source": path})])], texts, args.chunk_size)
+    measure("structure (streamed)",
+            lambda path, text: [d.page_content for d in structure.split_file(path, {"source": path})],
+            texts, args.chunk_size)
+
+    largest = max(paths, key=os.path.getsize)
+    print(f"\n🧠 Peak Python memory splitting the largest file ({os.path.getsize(largest) / 1e6:.1f} MB):")
+
+    def read_whole(splitter):
+        def run():
+            return iter(splitter.split_documents([load_sop_file(largest, "bench")]))
+        return run
+
+    print(f"   recursive, file read whole:   {peak_memory(read_whole(recursive)):8.2f} MB")
+    print(f"   structure, file read whole:   {peak_memory(read_whole(structure)):8.2f} MB")
+    print(f"   structure, streamed:          {peak_memory(lambda: structure.split_file(largest, {})):8.2f} MB")
+    tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
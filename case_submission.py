@@ -1,26 +1,27 @@
 import os
 from slugify import slugify
-from langchain.schema import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-# Directory where new SOP case files are stored
+# Directory where new SOP case files are stored (an internal source in config.yaml)
 NEW_SOPS_DIR = "./sops/new-draft"
 os.makedirs(NEW_SOPS_DIR, exist_ok=True)
 
-# Reuse same splitter settings as main RAG logic
-splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-
-def add_single_file_to_db(filepath, db):
-    """Reads a new file, splits it, and adds it to the existing vector DB."""
-    with open(filepath, 'r') as f:
-        content = f.read()
-
-    doc = Document(page_content=content, metadata={"source": filepath})
-    chunks = splitter.split_documents([doc])
-    db.add_documents(chunks)
-    print(f"✅ New document embedded and added to vector DB: {filepath}")
+def queue_case_file(filepath, content, ingest_queue):
+    """
+    Queue a case file to be written and indexed by the ingest queue's worker.
+    The submission is in the queue's write-ahead log once this returns, so it
+    is indexed (and published with its source's partition) even across a
+    restart; the caller does not wait for the embedding.
+    Returns the queue entry ID, or None if the file cannot be queued.
+    """
+    try:
+        entry_id = ingest_queue.submit(filepath, content)
+    except ValueError as e:
+        print(f"⚠️ Case not queued: {e}")
+        return None
+    print(f"📨 Case queued for indexing: {filepath}")
+    return entry_id
 
-def handle_new_case_submission_cli(db):
+def handle_new_case_submission_cli(ingest_queue):
     """Handles case submission via command-line."""
     print("\n🆕 You are adding a new issue/solution to the assistant.")
 
@@ -57,7 +58,7 @@ def handle_new_case_submission_cli(db):
     related_input = input("\n🔗 Enter related SOP name(s) (comma-separated, optional): ").strip()
     related_sops = [s.strip() for s in related_input.split(",") if s.strip()]
 
-    # Step 5: Combine content and write to file
+    # Step 5: Combine content
     content_lines = [
         f"Summary:\n{summary}",
         f"\nResolution:\n{resolution}"
@@ -65,13 +66,5 @@ def handle_new_case_submission_cli(db):
     if related_sops:
         content_lines.append(f"\nRelated SOPs: {', '.join(related_sops)}")
 
-    try:
-        with open(filepath, 'w') as f:
-            f.write("\n".join(content_lines))
-        print(f"\n📁 Case saved to: {filepath}")
-    except Exception as e:
-        print(f"❌ Failed to write file: {e}")
-        return
-
-    # Step 6: Add document to live vector DB
-    add_single_file_to_db(filepath, db)
+    # Step 6: Queue the case; it is written and indexed in the background
+    queue_case_file(filepath, "\n".join(content_lines), ingest_queue)
@@ -1,15 +1,13 @@
 import os
 import streamlit as st
 from slugify import slugify
-from langchain.schema import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 # Set up SOP directory
 NEW_SOPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sops/new-draft")
 os.makedirs(NEW_SOPS_DIR, exist_ok=True)
 
 # Function to handle new case submission UI
-def show_add_case_form(db):
+def show_add_case_form(ingest_queue):
     st.subheader("📥 Submit a New SOP Case")
 
     # Cancel button to exit form (with a unique key)
@@ -59,17 +57,10 @@ def show_add_case_form(db):
             if related:
                 content += f"\n\nRelated SOPs: {related}"
 
-            # Try saving the case to the file
+            # Queue the case; the ingest worker writes and indexes it in the background
             try:
-                with open(filepath, 'w') as f:
-                    f.write(content)
-                st.success(f"✅ Case saved to: {filepath}")
-
-                # Add to vector DB (optional, if `db` is provided)
-                doc = Document(page_content=content, metadata={"source": filepath})
-                splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-                db.add_documents(splitter.split_documents([doc]))
-                st.success("✅ Document added to the vector DB.")
+                entry_id = ingest_queue.submit(filepath, content)
+                st.session_state.setdefault("queued_cases", []).append((f"{filename}.txt", entry_id))
 
                 # Hide form after submission
                 st.session_state["show_add_case"] = False
@@ -81,15 +72,22 @@ def show_add_case_form(db):
                 st.session_state.resolution = ""
                 st.session_state.related = ""
 
+            except ValueError as e:
+                st.warning(f"⚠️ {e}")
             except Exception as e:
-                st.error(f"❌ Could not save file: {e}")
-
-# Example of how to trigger the form (outside of the function)
-if "show_add_case" not in st.session_state:
-    st.session_state["show_add_case"] = False
+                st.error(f"❌ Could not queue case: {e}")
 
-if st.button("➕ Add New Case", key="add_new_case_button"):
-    st.session_state["show_add_case"] = True
 
-if st.session_state["show_add_case"]:
-    show_add_case_form(db)
+def show_case_statuses(ingest_queue):
+    """Queued / indexed status of the cases submitted in this session."""
+    cases = st.session_state.get("queued_cases", [])
+    if not cases:
+        return
+    statuses = ingest_queue.statuses([entry_id for _, entry_id in cases])
+    for filename, entry_id in cases:
+        if statuses[entry_id] == "queued":
+            st.info(f"⏳ {filename}: queued for indexing")
+        elif statuses[entry_id] == "indexed":
+            st.success(f"✅ {filename}: indexed")
+        else:
+            st.warning(f"❔ {filename}: no longer in the ingest log, status unknown")
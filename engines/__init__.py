@@ -1,4 +1,5 @@
-from .base import BaseEngine
+from .base import BaseEngine, EngineError, get_engine_settings
+from .http_engine import HTTPEngine
 from .ollama_engine import OllamaEngine
 from .gemini_engine import GeminiEngine
 from .serpapi_engine import SerpAPIEngine
@@ -6,6 +7,9 @@ from .serpapi_engine import SerpAPIEngine
 
 __all__ = [
     "BaseEngine",
+    "EngineError",
+    "HTTPEngine",
+    "get_engine_settings",
     "OllamaEngine",
     "GeminiEngine",
     "SerpAPIEngine",
@@ -1,11 +1,150 @@
 # engines/base.py
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# Call limits of every engine; overridden by the `engines:` config section
+# and then by the engine's own external_sources entry
+DEFAULT_ENGINE_SETTINGS = {
+    "timeout": 30,          # seconds per request (connect and each read)
+    "deadline": 60,         # seconds for a whole call, retries and waiting for a slot included
+    "max_retries": 2,       # extra attempts after a connection error, timeout, 429 or 5xx
+    "backoff": 0.5,         # first retry delay in seconds, doubled each time (with jitter)
+    "max_concurrency": 4,   # calls in flight per engine; others wait for a slot
+}
+
+
+def get_engine_settings(config: dict, source: dict | None = None) -> dict:
+    """Call limits for one engine: defaults < `engines:` section < its external_sources entry."""
+    settings = dict(DEFAULT_ENGINE_SETTINGS, **((config or {}).get("engines") or {}))
+    settings.update((k, v) for k, v in (source or {}).items() if k in DEFAULT_ENGINE_SETTINGS)
+    return settings
+
+
+class EngineError(RuntimeError):
+    """An engine call failed for good (error not retryable, retries used up, or deadline passed)."""
+
+
 class BaseEngine:
-    """Abstract base class for all external AI engines."""
+    """
+    Abstract base class for all external AI engines.
+
+    Subclasses implement _generate() (and _stream() if the backend can
+    stream); callers use generate() / agenerate() / stream(), which add:
+      - a semaphore per engine, so concurrent queries share a bounded number
+        of connections instead of piling up sockets,
+      - a per-request timeout and an overall deadline per call,
+      - bounded retries with exponential backoff on transient errors.
+    """
 
-    def __init__(self, name: str, api_key: str = None):
+    def __init__(self, name: str, api_key: str = None, **settings):
         self.name = name
         self.api_key = api_key
+        settings = dict(DEFAULT_ENGINE_SETTINGS, **settings)
+        self.timeout = settings["timeout"]
+        self.deadline = settings["deadline"]
+        self.max_retries = settings["max_retries"]
+        self.backoff = settings["backoff"]
+        self.max_concurrency = settings["max_concurrency"]
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
 
-    def generate(self, prompt: str) -> str:
-        """Override in subclasses"""
+    # ------------------------------
+    # Backend calls (override in subclasses)
+    # ------------------------------
+    def _generate(self, prompt: str, timeout: float) -> str:
+        """One attempt; `timeout` is the time left for it in seconds."""
         raise NotImplementedError
+
+    def _stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        """Engines without native streaming yield the whole answer at once."""
+        yield self._generate(prompt, timeout)
+
+    def _retryable(self, error: Exception) -> bool:
+        """True for transient errors worth another attempt."""
+        return isinstance(error, (ConnectionError, TimeoutError))
+
+    def _retry_after(self, error: Exception) -> float | None:
+        """Delay the backend asked for (e.g. a Retry-After header), if any."""
+        return None
+
+    # ------------------------------
+    # Public API
+    # ------------------------------
+    def generate(self, prompt: str, deadline: float | None = None) -> str:
+        """
+        Answer a prompt. Blocks; safe to call from many threads at once.
+        `deadline` (a time.monotonic() value) ends the call before the engine's own deadline.
+        """
+        deadline = self._call_deadline(deadline)
+        with self._slot(deadline):
+            return self._attempt(lambda timeout: self._generate(prompt, timeout), deadline)
+
+    async def agenerate(self, prompt: str) -> str:
+        """generate() for asyncio callers; runs in a worker thread so the event loop never blocks."""
+        return await asyncio.to_thread(self.generate, prompt)
+
+    def stream(self, prompt: str, deadline: float | None = None) -> Iterator[str]:
+        """
+        Yield the answer in pieces as it is generated.
+        Retries only happen before the first piece; the slot is held until the
+        stream is exhausted or closed. `deadline` is as for generate().
+        """
+        deadline = self._call_deadline(deadline)
+        with self._slot(deadline):
+            pieces = self._attempt(lambda timeout: self._first_piece(prompt, timeout), deadline)
+            for piece in pieces:
+                if time.monotonic() > deadline:
+                    raise EngineError(f"{self.name}: answer not finished by its deadline")
+                yield piece
+
+    # ------------------------------
+    # Internals
+    # ------------------------------
+    def _call_deadline(self, deadline: float | None) -> float:
+        own = time.monotonic() + self.deadline
+        return own if deadline is None else min(own, deadline)
+
+    def _first_piece(self, prompt: str, timeout: float) -> Iterator[str]:
+        """Start a stream and wait for its first piece, so that failures to start are retried."""
+        pieces = self._stream(prompt, timeout)
+        for first in pieces:
+            return _prepend(first, pieces)
+        return iter(())
+
+    @contextmanager
+    def _slot(self, deadline: float):
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise EngineError(
+                f"{self.name}: no free slot by its deadline ({self.max_concurrency} calls in flight)"
+            )
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def _attempt(self, call, deadline: float):
+        """Run call(timeout) with retries on transient errors until the deadline."""
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise EngineError(f"{self.name}: no answer by its deadline")
+            try:
+                return call(min(self.timeout, remaining))
+            except Exception as e:
+                if not self._retryable(e) or attempt == self.max_retries:
+                    raise EngineError(f"{self.name}: {e}") from e
+                delay = self._retry_after(e)
+                if delay is None:
+                    delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+                if time.monotonic() + delay >= deadline:
+                    raise EngineError(f"{self.name}: {e} (no time left to retry)") from e
+                print(f"⚠ {self.name}: {e}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+
+def _prepend(first: str, rest: Iterator[str]) -> Iterator[str]:
+    yield first
+    yield from rest
@@ -1,10 +1,13 @@
-import requests
-from .base import BaseEngine
+# engines/gemini_engine.py
+from .http_engine import HTTPEngine
 
-class GeminiEngine(BaseEngine):
-    def generate(self, prompt: str) -> str:
+
+class GeminiEngine(HTTPEngine):
+    def __init__(self, api_key: str, name: str = "gemini", url: str = "https://api.gemini.com/v1/query", **settings):
+        super().__init__(name, api_key, **settings)
+        self.url = url
+
+    def _generate(self, prompt: str, timeout: float) -> str:
         headers = {"Authorization": f"Bearer {self.api_key}"}
-        payload = {"prompt": prompt}
-        response = requests.post("https://api.gemini.com/v1/query", json=payload, headers=headers)
-        data = response.json()
+        data = self._post_json(self.url, {"prompt": prompt}, timeout, headers=headers)
         return data.get("result", "[No response from Gemini]")
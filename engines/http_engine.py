@@ -0,0 +1,44 @@
+# engines/http_engine.py
+import requests
+from requests.adapters import HTTPAdapter
+
+from .base import BaseEngine
+
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class HTTPEngine(BaseEngine):
+    """
+    Base for engines behind an HTTP API.
+    All calls of one engine go through a pooled keep-alive session holding at
+    most max_concurrency connections, the same number as the engine's slots.
+    """
+
+    def __init__(self, name: str, api_key: str = None, **settings):
+        super().__init__(name, api_key, **settings)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_concurrency, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post_json(self, url: str, payload: dict, timeout: float, **kwargs) -> dict:
+        response = self.session.post(url, json=payload, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def _retryable(self, error: Exception) -> bool:
+        if isinstance(error, requests.HTTPError):
+            return error.response is not None and error.response.status_code in RETRY_STATUS
+        return isinstance(error, (requests.ConnectionError, requests.Timeout)) or super()._retryable(error)
+
+    def _retry_after(self, error: Exception) -> float | None:
+        response = getattr(error, "response", None)
+        value = response.headers.get("Retry-After") if response is not None else None
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            # HTTP-date form; fall back to exponential backoff
+            return None
+
+    def close(self):
+        self.session.close()
@@ -1,13 +1,55 @@
 # engines/ollama_engine.py
-from .base import BaseEngine
+import time
+from typing import Iterator
+
+import httpx
+from ollama import ResponseError
 from langchain_ollama import OllamaLLM
 
+from .base import BaseEngine
+from .http_engine import RETRY_STATUS
+
+
 class OllamaEngine(BaseEngine):
-    """Wrapper for Ollama LLM."""
+    """
+    Wrapper for Ollama LLM.
+
+    The Ollama client only takes a timeout per read, so generate() streams
+    the answer and gives up once the attempt's time is used, and stream()
+    relies on the deadline check between pieces. Either way a single stalled
+    read can still last up to `timeout` past that.
+    """
+
+    def __init__(self, name: str, model_name: str = "mistral", base_url: str | None = None, **settings):
+        super().__init__(name, **settings)
+        # The Ollama client keeps one pooled keep-alive connection set; cap it at the engine's slots
+        self.llm = OllamaLLM(
+            model=model_name,
+            base_url=base_url,
+            client_kwargs={
+                "timeout": self.timeout,
+                "limits": httpx.Limits(max_connections=self.max_concurrency),
+            },
+        )
+
+    def _generate(self, prompt: str, timeout: float) -> str:
+        stop_at = time.monotonic() + timeout
+        pieces = self.llm.stream(prompt)
+        answer = []
+        try:
+            for piece in pieces:
+                answer.append(piece)
+                if time.monotonic() > stop_at:
+                    raise TimeoutError(f"answer not finished within {timeout:.1f}s")
+        finally:
+            # Closes the HTTP response, so Ollama stops generating
+            pieces.close()
+        return "".join(answer)
 
-    def __init__(self, name: str, model_name: str = "mistral"):
-        super().__init__(name)
-        self.llm = OllamaLLM(model=model_name)
+    def _stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        yield from self.llm.stream(prompt)
 
-    def generate(self, prompt: str) -> str:
-        return self.llm.invoke(prompt)
+    def _retryable(self, error: Exception) -> bool:
+        if isinstance(error, ResponseError):
+            return error.status_code in RETRY_STATUS
+        return isinstance(error, httpx.TransportError) or super()._retryable(error)
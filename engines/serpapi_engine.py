@@ -1,11 +1,12 @@
-import requests
+# engines/serpapi_engine.py
 from .base import BaseEngine
 
+
 class SerpAPIEngine(BaseEngine):
-    def __init__(self, api_key: str):
-        self.api_key = api_key
+    def __init__(self, api_key: str, name: str = "serpapi", **settings):
+        super().__init__(name, api_key, **settings)
 
-    def invoke(self, text: str) -> str:
+    def _generate(self, prompt: str, timeout: float) -> str:
         # Simple example: search query and summarize
         # For real implementation, you would call SerpAPI, fetch content, etc.
-        return f"[SerpAPI response simulated for query: {text}]"
+        return f"[SerpAPI response simulated for query: {prompt}]"
@@ -1,30 +1,189 @@
 # hybrid_assistant.py
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
 from urllib.parse import quote_plus
+from requests.adapters import HTTPAdapter
 import trafilatura
-from langchain.chains import RetrievalQA
-from langchain_community.vectorstores import FAISS
+from typing import Iterator
+from langchain_core.prompts import PromptTemplate
 
-from engines.base import BaseEngine
+from rag.answer_cache import SemanticAnswerCache
+from rag.passages import pack_passages
+from rag.retriever import HybridRetriever
+from rag.partitions import PartitionedIndex
+from engines.base import BaseEngine, get_engine_settings
 from engines.ollama_engine import OllamaEngine
 from engines.gemini_engine import GeminiEngine
 from engines.serpapi_engine import SerpAPIEngine
 
+# Internal RAG prompt: LangChain's "stuff" question-answering prompt
+RAG_PROMPT = PromptTemplate.from_template(
+    "Use the following pieces of context to answer the question at the end. If you don't know the answer, "
+    "just say that you don't know, don't try to make up an answer.\n\n{context}\n\nQuestion: {question}\n"
+    "Helpful Answer:"
+)
+
 
 class ExternalWebRetriever:
-    """Retrieve and clean text from public web pages."""
+    """
+    Retrieve and clean text from public web pages.
+    Pages are fetched concurrently through one pooled keep-alive session with
+    a per-host connection limit; fetch_many() returns whatever finished before
+    the overall deadline and drops the rest.
+    Extracted text is cached on disk with the page's ETag/Last-Modified. Within
+    `cache_ttl` the cached text is used without any request; after that the
+    page is revalidated with a conditional GET and only re-parsed if it changed.
+    While a site is unreachable or answers 5xx the stale copy is used; a 404
+    or 410 drops it.
+    """
 
-    def fetch_text(self, url: str) -> str | None:
+    def __init__(self, timeout: float = 10, deadline: float = 12, max_workers: int = 8,
+                 per_host_connections: int = 4, cache_dir: str | None = None, cache_ttl: float = 86400,
+                 prewarm: bool = False):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+        self.cache_ttl = cache_ttl
+        self.prewarm_on_start = prewarm
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": "Mozilla/5.0"})
+        # pool_block makes pool_maxsize a hard per-host connection limit
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=per_host_connections, pool_block=True)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-fetch")
+
+    @classmethod
+    def from_config(cls, config: dict) -> "ExternalWebRetriever":
+        """Build from the optional `web:` section of config.yaml."""
+        return cls(**(config.get("web") or {}))
+
+    # ------------------------------
+    # Disk cache
+    # ------------------------------
+    def _cache_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def _read_cache(self, url: str) -> dict | None:
+        if not self.cache_dir:
+            return None
         try:
-            headers = {"User-Agent": "Mozilla/5.0"}
-            resp = requests.get(url, headers=headers, timeout=10)
-            resp.raise_for_status()
-            text = trafilatura.extract(resp.text)
-            return text if text else None
-        except Exception as e:
-            print(f"⚠ Web retrieval failed for {url}: {e}")
+            with open(self._cache_path(url)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
             return None
 
+    def _write_cache(self, entry: dict):
+        if not self.cache_dir:
+            return
+        path = self._cache_path(entry["url"])
+        tmp = f"{path}.tmp-{threading.get_ident()}"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠ Could not cache {entry['url']}: {e}")
+
+    def _drop_cache(self, url: str):
+        if not self.cache_dir:
+            return
+        try:
+            os.remove(self._cache_path(url))
+        except OSError:
+            pass
+
+    def fetch_text(self, url: str) -> str | None:
+        cached = self._read_cache(url)
+        if cached and time.time() - cached.get("fetched_at", 0) < self.cache_ttl:
+            return cached["text"]
+
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            resp = self.session.get(url, headers=headers, timeout=self.timeout)
+            if resp.status_code >= 500:
+                resp.raise_for_status()
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            if not cached:
+                raise
+            # Site down or unreachable: a stale copy is better than nothing
+            print(f"⚠ Web retrieval failed for {url}, using the cached copy: {e}")
+            return cached["text"]
+
+        if resp.status_code == 304 and cached:
+            cached["fetched_at"] = time.time()
+            self._write_cache(cached)
+            return cached["text"]
+        if resp.status_code in (404, 410):
+            # Gone for good: do not serve the old copy again
+            self._drop_cache(url)
+        resp.raise_for_status()
+        text = trafilatura.extract(resp.text) or None
+
+        self._write_cache({
+            "url": url,
+            "text": text,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        })
+        return text
+
+    def prewarm(self, urls: list[str]):
+        """Fetch pages into the cache in the background (e.g. configured URLs at startup)."""
+        def fetch(url):
+            try:
+                self.fetch_text(url)
+            except Exception as e:
+                print(f"⚠ Web retrieval failed for {url}: {e}")
+
+        for url in dict.fromkeys(urls):
+            self.executor.submit(fetch, url)
+
+    def fetch_many(self, urls: list[str], deadline: float | None = None) -> tuple[list[dict], list[str]]:
+        """
+        Fetch several pages concurrently.
+        Args:
+            urls: pages to fetch (duplicates are fetched once)
+            deadline: seconds to wait overall (defaults to self.deadline)
+        Returns:
+            ([{"url", "text"}] in input order, for pages that returned text in time,
+             URLs that failed or were dropped at the deadline)
+        """
+        deadline = self.deadline if deadline is None else deadline
+        urls = list(dict.fromkeys(urls))
+        futures = {url: self.executor.submit(self.fetch_text, url) for url in urls}
+        done, not_done = wait(futures.values(), timeout=deadline)
+
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            print(f"⚠ Dropped {len(not_done)} slow web page(s) after {deadline}s")
+
+        pages, failed = [], []
+        for url, future in futures.items():
+            if future not in done:
+                failed.append(url)
+            elif future.exception() is not None:
+                print(f"⚠ Web retrieval failed for {url}: {future.exception()}")
+                failed.append(url)
+            elif future.result():
+                pages.append({"url": url, "text": future.result()})
+        return pages, failed
+
 
 class HybridSOPAssistant:
     """
@@ -32,33 +191,68 @@ class HybridSOPAssistant:
     1. RAG (internal SOPs only)
     2. Hybrid (internal SOPs + external web)
     3. External (external web only, dynamic search + optional config URLs)
+
+    One assistant serves every session: mode, engine and the SOP sources to
+    search are chosen per call to query() / stream_query(), and the assistant
+    holds no selection state that a call could change under another.
+    Retrieval reads immutable index snapshots, so concurrent queries search in
+    parallel while a writer prepares and publishes the next snapshot.
     """
 
-    def __init__(self, db: FAISS, engines_config: dict, mode: str = "rag"):
-        self.db = db
-        self.retriever = db.as_retriever(search_kwargs={"k": 10})
-        self.web_retriever = ExternalWebRetriever()
-        self.mode = mode.lower()
+    def __init__(self, index: PartitionedIndex, engines_config: dict, mode: str = "rag"):
+        self.index = index
+        self.web_retriever = ExternalWebRetriever.from_config(engines_config)
         self.engines_config = engines_config
 
+        # Query branches (internal RAG / external) run on this pool
+        assistant_config = engines_config.get("assistant") or {}
+        retrieval_config = assistant_config.get("retrieval") or {}
+        self.retriever = HybridRetriever(
+            index=index,
+            k=retrieval_config.get("k", 10),
+            fetch_k=retrieval_config.get("fetch_k", 30),
+            rrf_k=retrieval_config.get("rrf_k", 60),
+            coalesce=retrieval_config.get("coalesce", True),
+        )
+        self.external_token_budget = assistant_config.get("external_token_budget", 2000)
+        self.external_passage_chars = assistant_config.get("external_passage_chars", 800)
+        self.executor = ThreadPoolExecutor(
+            max_workers=assistant_config.get("query_workers", 8), thread_name_prefix="query-branch"
+        )
+
+        # Answers to near-duplicate questions, invalidated when the index changes
+        cache_config = assistant_config.get("answer_cache") or {}
+        self.answer_cache = None
+        if cache_config.get("enabled", True):
+            self.answer_cache = SemanticAnswerCache(
+                index.embeddings,
+                threshold=cache_config.get("threshold", 0.92),
+                max_entries=cache_config.get("max_entries", 500),
+                ttl=cache_config.get("ttl", 86400),
+            )
+
         # Initialize engine instances
         self.engine_instances: dict[str, BaseEngine] = {}
-        self.current_engine: BaseEngine = None
+        self.default_engine: BaseEngine = None
         self._init_engines()
+        # Used when a call does not pick a mode / engine; never changed afterwards
+        self.default_mode = self.resolve_mode(mode)
 
-        # Setup QA with default LLM (internal RAG)
-        default_llm_engine = self.engine_instances.get("ollama") or OllamaEngine(name="default_ollama")
-        self.qa = RetrievalQA.from_chain_type(
-            llm=default_llm_engine.llm,
-            retriever=self.retriever,
-            return_source_documents=True
+        # Internal RAG answers; they go through the engine's limits and retries
+        self.rag_engine = self.engine_instances.get("ollama") or OllamaEngine(
+            name="default_ollama", **get_engine_settings(engines_config)
         )
+        # Branch timeouts; also passed to the branch's engine call as its deadline
+        self.rag_timeout = assistant_config.get("rag_timeout", self.rag_engine.deadline)
+        self.external_timeout = assistant_config.get("external_timeout", self.default_engine.deadline)
 
         # Collect AWS/GCP doc URLs from config
         self.external_config_urls: list[str] = []
         for src in engines_config.get("external_sources", []):
             urls = src.get("urls") or []
             self.external_config_urls.extend(urls)
+        if self.web_retriever.prewarm_on_start:
+            self.web_retriever.prewarm(self.external_config_urls)
 
     def _init_engines(self):
         """Initialize external engines from config."""
@@ -66,58 +260,131 @@ class HybridSOPAssistant:
             name = src.get("name")
             engine_type = src.get("engine")
             api_key = src.get("api_key", None)
+            settings = get_engine_settings(self.engines_config, src)
 
             if engine_type == "ollama":
-                self.engine_instances[name] = OllamaEngine(name=name)
+                self.engine_instances[name] = OllamaEngine(
+                    name=name, model_name=src.get("model", "mistral"), base_url=src.get("base_url"), **settings
+                )
             elif engine_type == "gemini":
-                self.engine_instances[name] = GeminiEngine(api_key)
+                if src.get("url"):
+                    settings["url"] = src["url"]
+                self.engine_instances[name] = GeminiEngine(api_key, name=name, **settings)
             elif engine_type == "serpapi":
-                self.engine_instances[name] = SerpAPIEngine(api_key)
+                self.engine_instances[name] = SerpAPIEngine(api_key, name=name, **settings)
 
         # Set default engine
         if self.engine_instances:
-            self.current_engine = next(iter(self.engine_instances.values()))
+            self.default_engine = next(iter(self.engine_instances.values()))
         else:
             # fallback
-            self.current_engine = OllamaEngine(name="default_ollama")
+            self.default_engine = OllamaEngine(name="default_ollama", **get_engine_settings(self.engines_config))
+
+    def resolve_mode(self, mode: str | None) -> str:
+        """Validate a mode name (case-insensitive); None means the default mode."""
+        if mode is None:
+            return self.default_mode
+        if mode.lower() not in ("rag", "hybrid", "external"):
+            raise ValueError("Mode must be one of: RAG, Hybrid, External")
+        return mode.lower()
 
-    def set_engine(self, name: str):
+    def resolve_engine(self, name: str | None) -> BaseEngine:
+        """Look up a configured engine by name; None means the default engine."""
+        if name is None:
+            return self.default_engine
         if name not in self.engine_instances:
             raise ValueError(f"Engine '{name}' not found")
-        self.current_engine = self.engine_instances[name]
-        print(f"⚙️ Switched engine to: {name}")
+        return self.engine_instances[name]
 
-    def set_mode(self, mode: str):
-        if mode.lower() not in ("rag", "hybrid", "external"):
-            raise ValueError("Mode must be one of: RAG, Hybrid, External")
-        self.mode = mode.lower()
-        print(f"⚙️ Switched mode to: {self.mode}")
-
-    def query(self, user_query: str) -> dict:
-        result_text = ""
-        sources = []
-
-        # --- Internal RAG search ---
-        if self.mode in ("rag", "hybrid"):
-            qa_result = self.qa.invoke({"query": user_query})
-            result_text += qa_result["result"]
-            sources.extend(
-                {"source": doc.metadata.get("source"), "type": "internal"}
-                for doc in qa_result["source_documents"]
-            )
+    def query(self, user_query: str, mode: str | None = None, engine: str | None = None,
+              sop_sources: list[str] | None = None) -> dict:
+        """
+        Answer a question with the given mode and engine (the defaults if None),
+        searching the SOP sources / teams in `sop_sources` (all if None).
+        Safe to call from many threads at once.
+        In hybrid mode the internal RAG and external branches run in parallel,
+        each with its own timeout; if one fails or times out, the other's answer
+        is returned with a note in "warnings".
+        """
+        mode = self.resolve_mode(mode)
+        current_engine = self.resolve_engine(engine)
+        sop_sources = self.index.resolve(sop_sources)
 
-        # --- External / Hybrid search ---
-        if self.mode in ("hybrid", "external"):
-            web_texts = self._fetch_external_texts(user_query, external_only=self.mode=="external")
-            if web_texts:
-                for wt in web_texts:
-                    sources.append({"source": wt["url"], "type": "external"})
+        cached, cache_key = self._cache_lookup(user_query, mode, current_engine, sop_sources)
+        if cached:
+            return cached
 
-                combined_text = "\n\n".join(wt["text"] for wt in web_texts)
-                if self.mode == "external" or web_texts:
-                    result_text += "\n\n" + self.current_engine.invoke(combined_text)
+        started = time.monotonic()
+        rag_ends, external_ends = started + self.rag_timeout, started + self.external_timeout
+        branches = []
+        if mode in ("rag", "hybrid"):
+            branches.append((
+                "internal", self.rag_timeout, lambda: self._query_internal(user_query, sop_sources, rag_ends)
+            ))
+        if mode in ("hybrid", "external"):
+            branches.append((
+                "external", self.external_timeout,
+                lambda: self._query_external(user_query, current_engine, mode == "external", external_ends),
+            ))
 
-        # Deduplicate sources
+        futures = [(name, timeout, self.executor.submit(fn)) for name, timeout, fn in branches]
+
+        parts, sources, warnings, errors = [], [], [], []
+        for name, timeout, future in futures:
+            try:
+                text, branch_sources, branch_warnings = future.result(
+                    timeout=max(0.0, started + timeout - time.monotonic())
+                )
+            except FutureTimeoutError:
+                # The branch's engine call has the same deadline, so its worker is freed shortly after
+                warnings.append(f"{name} search timed out after {timeout}s")
+                errors.append(TimeoutError(warnings[-1]))
+                continue
+            except Exception as e:
+                warnings.append(f"{name} search failed: {e}")
+                errors.append(e)
+                continue
+            if text:
+                parts.append(text)
+            sources.extend(branch_sources)
+            warnings.extend(branch_warnings)
+
+        # Nothing came back at all: surface the error like a single call would
+        if len(errors) == len(futures):
+            raise errors[0]
+
+        result = {"result": "\n\n".join(parts), "sources": self._dedupe_sources(sources), "warnings": warnings}
+        # Degraded answers (a branch failed, timed out or found nothing) are not cached
+        if not warnings:
+            self._cache_store(cache_key, result)
+        return result
+
+    # ------------------------------
+    # Answer cache
+    # ------------------------------
+    def index_version(self) -> str:
+        """Changes whenever a new snapshot is published (by this or any other process)."""
+        return self.index.version()
+
+    def _cache_lookup(self, user_query: str, mode: str, engine: BaseEngine,
+                      sop_sources: list[str]) -> tuple[dict | None, tuple | None]:
+        """Return (cached result, key for _cache_store)."""
+        if self.answer_cache is None:
+            return None, None
+        engine_name = None
+        if mode != "rag":
+            engine_name = next((n for n, e in self.engine_instances.items() if e is engine), None)
+        partition = (mode, engine_name, tuple(sorted(sop_sources)) if mode != "external" else None)
+        version = self.index_version()
+        cached, vector = self.answer_cache.lookup(user_query, partition, version)
+        return cached, (vector, partition, version)
+
+    def _cache_store(self, cache_key: tuple | None, result: dict):
+        if self.answer_cache is not None and cache_key is not None:
+            self.answer_cache.store(*cache_key, result)
+
+    @staticmethod
+    def _dedupe_sources(sources) -> list[dict]:
         seen = set()
         cleaned_sources = []
         for s in sources:
@@ -125,34 +392,225 @@ class HybridSOPAssistant:
             if key not in seen:
                 cleaned_sources.append(s)
                 seen.add(key)
-        sources = cleaned_sources
+        return cleaned_sources
+
+    def _query_internal(self, user_query: str, sop_sources: list[str], ends_at: float) -> tuple[str, list, list]:
+        """
+        Internal RAG branch: retrieval + answer from the default LLM, finished by `ends_at` (time.monotonic()).
+        Returns (text, sources, warnings).
+        """
+        docs = [doc for doc, _ in self.retriever.search([user_query], sources=sop_sources)[0]]
+        answer = self.rag_engine.generate(self._rag_prompt(user_query, docs), deadline=ends_at)
+        return answer, self._internal_sources(docs), []
+
+    @staticmethod
+    def _internal_sources(docs: list) -> list[dict]:
+        """Source files of retrieved chunks, including files holding near-duplicates of them."""
+        return [
+            {"source": source, "type": "internal"}
+            for doc in docs
+            for source in [doc.metadata.get("source")] + doc.metadata.get("also_in", [])
+        ]
+
+    def _query_external(self, user_query: str, engine: BaseEngine, external_only: bool,
+                        ends_at: float) -> tuple[str, list, list]:
+        """External branch: fetch web pages and summarize them with the selected engine, finished by `ends_at`."""
+        combined_text, sources, warnings = self._prepare_external(user_query, external_only, ends_at)
+        if not combined_text:
+            return "", [], warnings
+        return engine.generate(combined_text, deadline=ends_at), sources, warnings
+
+    def _prepare_external(self, user_query: str, external_only: bool, ends_at: float) -> tuple[str, list, list]:
+        """
+        Fetch web pages and pack the passages most relevant to the question, within the token budget.
+        Returns:
+            (prompt text, sources, warnings about pages that could not be used)
+        """
+        deadline = min(self.web_retriever.deadline, max(0.0, ends_at - time.monotonic()))
+        web_texts, failed = self._fetch_external_texts(user_query, external_only=external_only, deadline=deadline)
+        warnings = []
+        if failed:
+            warnings.append(f"external search: {len(failed)} web page(s) failed or timed out")
+        if not web_texts:
+            warnings.append("external search found no usable web pages")
+            return "", [], warnings
+        # Throwaway web passages go to the bare model: through the SOP chunk cache they
+        # would evict chunk vectors, and query threads must not write to it
+        embeddings = getattr(self.index.embeddings, "base", self.index.embeddings)
+        combined_text, urls = pack_passages(
+            user_query, web_texts, embeddings,
+            token_budget=self.external_token_budget, max_chars=self.external_passage_chars,
+        )
+        return combined_text, [{"source": url, "type": "external"} for url in urls], warnings
+
+    @staticmethod
+    def _rag_prompt(user_query: str, docs: list) -> str:
+        """The retrieved chunks and the question, in RAG_PROMPT."""
+        return RAG_PROMPT.format(context="\n\n".join(doc.page_content for doc in docs), question=user_query)
+
+    def stream_query(self, user_query: str, mode: str | None = None, engine: str | None = None,
+                     sop_sources: list[str] | None = None) -> Iterator[dict]:
+        """
+        Streaming variant of query(), tuned for time-to-first-token.
+        Yields events as they become available:
+            {"type": "sources", "sources": [...]}  right after retrieval / web fetch
+            {"type": "token", "text": "..."}       answer pieces as the LLM generates them
+            {"type": "warning", "text": "..."}     a branch failed or timed out
+        In hybrid mode the external branch (web fetch and answer) runs in the
+        background while the internal answer streams; its pieces are buffered
+        and follow the internal answer. Each branch has its own timeout.
+        """
+        mode = self.resolve_mode(mode)
+        current_engine = self.resolve_engine(engine)
+        sop_sources = self.index.resolve(sop_sources)
+
+        cached, cache_key = self._cache_lookup(user_query, mode, current_engine, sop_sources)
+        if cached:
+            yield {"type": "sources", "sources": cached["sources"]}
+            yield {"type": "token", "text": cached["result"]}
+            return
+
+        # Collect what is streamed so a complete answer can be cached
+        answer, sources, warnings = [], [], []
+        for event in self._stream_answer(user_query, mode, current_engine, sop_sources):
+            if event["type"] == "token":
+                answer.append(event["text"])
+            elif event["type"] == "sources":
+                sources.extend(event["sources"])
+            else:
+                warnings.append(event["text"])
+            yield event
+
+        if not warnings:
+            self._cache_store(cache_key, {
+                "result": "".join(answer), "sources": self._dedupe_sources(sources), "warnings": [],
+            })
+
+    def _stream_answer(self, user_query: str, mode: str, current_engine: BaseEngine,
+                       sop_sources: list[str]) -> Iterator[dict]:
+        started = time.monotonic()
+        internal = external = None
+        if mode in ("hybrid", "external"):
+            external = self._background(self._external_events(
+                user_query, current_engine, mode == "external", started + self.external_timeout
+            ))
+        if mode in ("rag", "hybrid"):
+            internal = self._background(self._internal_events(user_query, sop_sources, started + self.rag_timeout))
+
+        try:
+            produced = False
+            if internal is not None:
+                try:
+                    for event in self._drain(*internal, started + self.rag_timeout):
+                        produced = produced or event["type"] == "token"
+                        yield event
+                except TimeoutError:
+                    message = f"internal search timed out after {self.rag_timeout}s"
+                    if external is None:
+                        raise TimeoutError(message) from None
+                    yield {"type": "warning", "text": message}
+                except Exception as e:
+                    if external is None:
+                        raise
+                    yield {"type": "warning", "text": f"internal search failed: {e}"}
+
+            if external is not None:
+                try:
+                    for event in self._drain(*external, started + self.external_timeout):
+                        if event["type"] == "token" and produced:
+                            yield {"type": "token", "text": "\n\n"}
+                            produced = False
+                        yield event
+                except TimeoutError:
+                    yield {"type": "warning", "text": f"external search timed out after {self.external_timeout}s"}
+                except Exception as e:
+                    yield {"type": "warning", "text": f"external search failed: {e}"}
+        finally:
+            # Stops branches still running when the caller stops reading, or after a timeout
+            for branch in (internal, external):
+                if branch is not None:
+                    branch[1].set()
+
+    def _internal_events(self, user_query: str, sop_sources: list[str], ends_at: float) -> Iterator[dict]:
+        docs = [doc for doc, _ in self.retriever.search([user_query], sources=sop_sources)[0]]
+        yield {"type": "sources", "sources": self._dedupe_sources(self._internal_sources(docs))}
+        for token in self.rag_engine.stream(self._rag_prompt(user_query, docs), deadline=ends_at):
+            yield {"type": "token", "text": token}
 
-        return {"result": result_text, "sources": sources}
+    def _external_events(self, user_query: str, engine: BaseEngine, external_only: bool,
+                         ends_at: float) -> Iterator[dict]:
+        combined_text, sources, warnings = self._prepare_external(user_query, external_only, ends_at)
+        for warning in warnings:
+            yield {"type": "warning", "text": warning}
+        if not combined_text:
+            return
+        yield {"type": "sources", "sources": sources}
+        for token in engine.stream(combined_text, deadline=ends_at):
+            yield {"type": "token", "text": token}
 
-    def _fetch_external_texts(self, query: str, external_only: bool = False) -> list[dict]:
+    def _background(self, events: Iterator[dict]) -> tuple[queue.Queue, threading.Event]:
         """
-        Fetch text from external sources:
+        Run an event generator on the query pool, buffering its events.
+        Returns (queue of events, ending with None; event that stops the generator).
+        """
+        buffered, stop = queue.Queue(), threading.Event()
+
+        def run():
+            try:
+                for event in events:
+                    if stop.is_set():
+                        break
+                    buffered.put(event)
+            except Exception as e:
+                buffered.put({"type": "error", "error": e})
+            finally:
+                # Closing the generator ends its engine stream and frees the engine slot
+                events.close()
+                buffered.put(None)
+
+        self.executor.submit(run)
+        return buffered, stop
+
+    @staticmethod
+    def _drain(buffered: queue.Queue, stop: threading.Event, deadline: float) -> Iterator[dict]:
+        """
+        Yield the buffered events of a branch. Events already buffered are
+        delivered even after the deadline; raises TimeoutError when the
+        deadline passes while waiting for the next one.
+        """
+        while True:
+            try:
+                event = buffered.get_nowait()
+            except queue.Empty:
+                try:
+                    event = buffered.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    stop.set()
+                    raise TimeoutError from None
+            if event is None:
+                return
+            if event["type"] == "error":
+                raise event["error"]
+            yield event
+
+    def _fetch_external_texts(self, query: str, external_only: bool = False,
+                              deadline: float | None = None) -> tuple[list[dict], list[str]]:
+        """
+        Fetch text from external sources (see ExternalWebRetriever.fetch_many):
         - If external_only=True: ignore internal URLs, only dynamic search
         - Else: use config URLs + dynamic search
         """
-        results = []
+        urls = []
 
         # Use config URLs unless in pure external mode
-        if not external_only and self.external_config_urls:
-            for url in self.external_config_urls:
-                text = self.web_retriever.fetch_text(url)
-                if text:
-                    results.append({"url": url, "text": text})
+        if not external_only:
+            urls.extend(self.external_config_urls)
 
         # Dynamic search URLs (Wikipedia, StackOverflow, AWS/GCP docs)
-        dynamic_urls = [
+        urls.extend([
             f"https://en.wikipedia.org/wiki/{quote_plus(query).replace('+','_')}",
             f"https://stackoverflow.com/search?q={quote_plus(query)}"
-        ]
+        ])
         # Add more dynamic doc URLs if needed, e.g., AWS/GCP RDS or Redis docs
-        for url in dynamic_urls:
-            text = self.web_retriever.fetch_text(url)
-            if text:
-                results.append({"url": url, "text": text})
 
-        return results
+        return self.web_retriever.fetch_many(urls, deadline=deadline)
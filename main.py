@@ -1,11 +1,10 @@
 # main.py
 import os
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import FastEmbedEmbeddings
-from langchain_community.vectorstores import FAISS
 
 from utils.config_loader import load_config, setup_internal_sources
-from utils.loaders import load_sop_files_from_config
+from rag.partitions import load_partitions
+from rag.index_sync import sync_partitions, format_changes, start_background_sync
+from rag.ingest_queue import start_ingest_queue
 from case_submission import handle_new_case_submission_cli
 from hybrid_assistant import HybridSOPAssistant
 
@@ -16,27 +15,21 @@ config = load_config("config.yaml")
 internal_sources = config.get("internal_sources", [])
 local_paths = setup_internal_sources(internal_sources)
 
-print("📂 Loading SOP documents...")
-docs = load_sop_files_from_config(local_paths)
-if not docs:
+print("📂 Loading SOP index...")
+index = load_partitions(local_paths, config)
+if index is None:
     print("⚠️ No SOP documents loaded. Make sure your internal sources exist.")
     exit(1)
-print(f"✅ {len(docs)} documents loaded from internal sources.")
-
-# ------------------------------
-# Split documents & create FAISS DB
-# ------------------------------
-splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-chunks = splitter.split_documents(docs)
-
-print("🧠 Creating vector database...")
-embeddings = FastEmbedEmbeddings()
-db = FAISS.from_documents(chunks, embeddings)
+start_background_sync(index, local_paths, config)
+ingest_queue = start_ingest_queue(index, local_paths, config)
 
 # ------------------------------
 # Initialize Assistant
 # ------------------------------
-assistant = HybridSOPAssistant(db=db, engines_config=config)
+assistant = HybridSOPAssistant(index=index, engines_config=config)
+
+# This session's choices, passed with every query (None = all SOP sources)
+mode, engine, sop_sources = assistant.default_mode, None, None
 
 # ------------------------------
 # Chat loop
@@ -45,6 +38,8 @@ print("🤖 SOP Assistant ready. Type your question below.")
 print("   Type 'add case' to add a new issue/solution.")
 print("   Type 'mode' to switch between RAG / Hybrid / External.")
 print("   Type 'engine' to switch external engine (Gemini / SerpAPI / Ollama).")
+print("   Type 'sources' to choose which SOP sources / teams to search.")
+print("   Type 'sync' to re-index changed SOP files.")
 print("   Type 'help' for commands.")
 print("   Type 'exit' to quit.")
 
@@ -64,11 +59,20 @@ while True:
         print("   - 'add case' to add a new issue/solution")
         print("   - 'mode' to switch between RAG / Hybrid / External")
         print("   - 'engine' to switch external engine")
+        print("   - 'sources' to choose which SOP sources / teams to search")
+        print("   - 'sync' to re-index added/changed/removed SOP files")
         print("   - 'exit' to quit")
         continue
 
     if cmd == "add case":
-        handle_new_case_submission_cli(db)
+        handle_new_case_submission_cli(ingest_queue)
+        continue
+
+    if cmd == "sync":
+        try:
+            print(format_changes(sync_partitions(index, local_paths, config)))
+        except Exception as e:
+            print(f"⚠ Sync failed: {e}")
         continue
 
     if cmd == "mode":
@@ -78,18 +82,27 @@ while True:
                 print("⚠ Mode cannot be empty.")
                 continue
             try:
-                assistant.set_mode(new_mode)
-
-                # --- External mode URL choice ---
-                if new_mode.lower() == "external":
-                    answer = input("Do you want to include configured URLs in the search? [yes]/no: ").strip().lower()
-                    assistant.use_config_urls = (answer != "no")
-
+                mode = assistant.resolve_mode(new_mode)
+                print(f"⚙️ Switched mode to: {mode}")
                 break
             except ValueError as e:
                 print(f"⚠ {e}")
         continue
 
+    if cmd == "sources":
+        print("Available sources:", ", ".join(index.names))
+        if index.teams:
+            print("Teams:", ", ".join(index.teams))
+        choice = input("Enter sources / teams to search (comma-separated, empty = all): ").strip()
+        selected = [s.strip() for s in choice.split(",") if s.strip()] or None
+        try:
+            index.resolve(selected)
+            sop_sources = selected
+            print(f"⚙️ Searching: {', '.join(selected) if selected else 'all sources'}")
+        except ValueError as e:
+            print(f"⚠ {e}")
+        continue
+
     if cmd == "engine":
         engine_names = list(assistant.engine_instances.keys())
         if not engine_names:
@@ -99,20 +112,31 @@ while True:
         new_engine = input("Enter engine name: ").strip()
         if new_engine:
             try:
-                assistant.set_engine(new_engine)
+                assistant.resolve_engine(new_engine)
+                engine = new_engine
+                print(f"⚙️ Switched engine to: {engine}")
             except ValueError as e:
                 print(f"⚠ {e}")
         continue
 
-    # Query the assistant
+    # Query the assistant, printing the answer as it is generated
+    print("\n🤖 Assistant:")
+    sources, warnings = [], []
     try:
-        result = assistant.query(user_input)
+        for event in assistant.stream_query(user_input, mode=mode, engine=engine, sop_sources=sop_sources):
+            if event["type"] == "token":
+                print(event["text"], end="", flush=True)
+            elif event["type"] == "sources":
+                sources.extend(event["sources"])
+            elif event["type"] == "warning":
+                warnings.append(event["text"])
     except Exception as e:
-        print(f"⚠ Error during query: {e}")
+        print(f"\n⚠ Error during query: {e}")
         continue
+    print()
 
-    print("\n🤖 Assistant:\n", result.get("result", ""))
-    sources = result.get("sources", [])
+    for warning in warnings:
+        print(f"⚠ {warning}")
     if sources:
         print("\n📎 Sources:")
         for src in sources:
@@ -1,12 +1,48 @@
-from mcp.server.fastmcp import FastMCP
-from .tools import search_sop
+import asyncio
+
+from mcp.server.fastmcp import FastMCP, Context
+from .tools import SEARCH_K, search_sop, search_sop_batch, stream_sop_answer, format_sources, warm_up
 
 mcp = FastMCP("sop-server")
 
 @mcp.tool()
-def sop_search(query: str) -> str:
-    """Search SOP documentation"""
-    return search_sop(query)
+async def sop_search(query: str, k: int = SEARCH_K, sources: list[str] | None = None) -> str:
+    """Search SOP documentation: the k most relevant SOP chunks with their source files, best first.
+    `sources` limits the search to these SOP sources / teams (default: all).
+    Fast retrieval only (no LLM), so it is fine to call many times."""
+    return await asyncio.to_thread(search_sop, query, k, sources)
+
+@mcp.tool()
+async def sop_search_batch(queries: list[str], k: int = SEARCH_K, sources: list[str] | None = None) -> str:
+    """sop_search for several queries in one call (embedded together); results are grouped per query."""
+    return await asyncio.to_thread(search_sop_batch, queries, k, sources)
+
+@mcp.tool()
+async def sop_ask(question: str, ctx: Context, mode: str = "rag") -> str:
+    """Answer a question from the SOPs (mode: rag / hybrid / external).
+    Sources and answer tokens are streamed as log messages while the answer is generated."""
+    events = stream_sop_answer(question, mode)
+    answer, sources = [], []
+    while True:
+        # The generator blocks on retrieval and the LLM, so step it in a worker thread
+        event = await asyncio.to_thread(next, events, None)
+        if event is None:
+            break
+        if event["type"] == "token":
+            answer.append(event["text"])
+            await ctx.info(event["text"])
+        elif event["type"] == "sources":
+            sources.extend(event["sources"])
+            await ctx.info("Sources:\n" + format_sources(event["sources"]))
+        elif event["type"] == "warning":
+            await ctx.warning(event["text"])
+
+    result = "".join(answer)
+    if sources:
+        result += "\n\nSources:\n" + format_sources(sources)
+    return result
 
 if __name__ == "__main__":
+    # Open the index before accepting calls, so the first sop_search is as fast as the rest
+    warm_up()
     mcp.run()
@@ -1,3 +1,156 @@
-def search_sop(query: str) -> str:
-    # TODO integrate with rag.qa_engine
-    return f"SOP search placeholder for: {query}"
+import contextlib
+import os
+import sys
+import threading
+import time
+
+from utils.config_loader import load_config, setup_internal_sources
+from rag.retriever import HybridRetriever
+from rag.partitions import PartitionedIndex, load_partitions
+from hybrid_assistant import HybridSOPAssistant
+
+CONFIG_PATH = os.environ.get("SOP_ASSISTANT_CONFIG", "config.yaml")
+SEARCH_K = 5
+MAX_BATCH = 32
+
+_index: PartitionedIndex | None = None
+_retriever: HybridRetriever | None = None
+_assistant = None
+_lock = threading.Lock()
+_stdout_lock = threading.Lock()
+_stdout_users = 0
+_real_stdout = None
+
+
+def _log(message: str):
+    # stdout carries the MCP stdio transport
+    print(message, file=sys.stderr, flush=True)
+
+
+@contextlib.contextmanager
+def _prints_to_stderr():
+    """
+    Send prints of the index, engines and assistant to stderr while tool code
+    runs, so they never mix with the transport's messages on stdout. Counted
+    across threads: stdout is restored when the last concurrent user leaves.
+    """
+    global _stdout_users, _real_stdout
+    with _stdout_lock:
+        if _stdout_users == 0:
+            _real_stdout, sys.stdout = sys.stdout, sys.stderr
+        _stdout_users += 1
+    try:
+        yield
+    finally:
+        with _stdout_lock:
+            _stdout_users -= 1
+            if _stdout_users == 0:
+                sys.stdout = _real_stdout
+
+
+def get_retriever() -> HybridRetriever:
+    """Open the persisted index (memory-mapped) once per server process."""
+    global _index, _retriever
+    with _lock, _prints_to_stderr():
+        if _retriever is None:
+            config = load_config(CONFIG_PATH)
+            local_paths = setup_internal_sources(config.get("internal_sources", []), interactive=False)
+            index = load_partitions(local_paths, config)
+            if index is None:
+                raise RuntimeError("No SOP documents are indexed.")
+            retrieval = (config.get("assistant") or {}).get("retrieval") or {}
+            _index, _retriever = index, HybridRetriever(
+                index=index,
+                k=SEARCH_K,
+                fetch_k=retrieval.get("fetch_k", 30),
+                rrf_k=retrieval.get("rrf_k", 60),
+            )
+    return _retriever
+
+
+def get_assistant() -> HybridSOPAssistant:
+    """Load the engines once per server process, on the same index as sop_search."""
+    global _assistant
+    get_retriever()
+    with _lock, _prints_to_stderr():
+        if _assistant is None:
+            _assistant = HybridSOPAssistant(index=_index, engines_config=load_config(CONFIG_PATH))
+    return _assistant
+
+
+def warm_up() -> float:
+    """
+    Load the index and run one search so the embedding model, the BM25 indexes
+    and the hot pages of the memory-mapped files are ready before the first
+    tool call (as many partitions as fit under the memory cap stay open).
+    Returns:
+        seconds taken
+    """
+    started = time.perf_counter()
+    retriever = get_retriever()
+    with _prints_to_stderr():
+        retriever.search(["warm up"])
+    elapsed = time.perf_counter() - started
+    chunks = sum(db.index.ntotal for _, db in retriever.index.current())
+    _log(f"🔥 SOP index ready in {elapsed:.2f}s ({chunks} chunks in {len(retriever.index.names)} sources)")
+    return elapsed
+
+
+def search_sop(query: str, k: int = SEARCH_K, sources: list[str] | None = None) -> str:
+    """Ranked SOP chunks for a query (hybrid dense + BM25 retrieval, no LLM)."""
+    return search_sop_batch([query], k, sources)
+
+
+def search_sop_batch(queries: list[str], k: int = SEARCH_K, sources: list[str] | None = None) -> str:
+    """search_sop for several queries, embedded in one pass against one snapshot per source."""
+    queries = [q.strip() for q in queries if q and q.strip()]
+    if not queries:
+        return "No query given."
+    if len(queries) > MAX_BATCH:
+        return f"At most {MAX_BATCH} queries per call."
+    k = max(1, min(int(k), 50))
+
+    started = time.perf_counter()
+    try:
+        retriever = get_retriever()
+        with _prints_to_stderr():
+            results = retriever.search(queries, k, sources or None)
+    except ValueError as e:
+        # Also raised while opening the index (e.g. an unknown index type), before _index is set
+        if _index is None:
+            return f"{e}."
+        return f"{e}. Available sources: {', '.join(_index.names)}"
+    _log(f"🔎 sop_search: {len(queries)} queries in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    if len(queries) == 1:
+        return format_hits(results[0])
+    return "\n\n".join(f"## {query}\n\n{format_hits(hits)}" for query, hits in zip(queries, results))
+
+
+def format_hits(hits: list) -> str:
+    if not hits:
+        return "No matching SOP chunks."
+    return "\n\n".join(
+        f"{rank}. [{doc.metadata.get('source_type', 'internal')}] {doc.metadata.get('source')} "
+        + (f"> {doc.metadata['headings']} " if doc.metadata.get("headings") else "")
+        + f"(score {score:.4f})"
+        + (f"\n   also in: {', '.join(doc.metadata['also_in'])}" if doc.metadata.get("also_in") else "")
+        + f"\n{doc.page_content.strip()}"
+        for rank, (doc, score) in enumerate(hits, start=1)
+    )
+
+
+def stream_sop_answer(question: str, mode: str = "rag"):
+    """Yield HybridSOPAssistant.stream_query events for a question."""
+    events = get_assistant().stream_query(question, mode=mode)
+    while True:
+        # Only while the generator runs: the caller awaits the transport between events
+        with _prints_to_stderr():
+            event = next(events, None)
+        if event is None:
+            return
+        yield event
+
+
+def format_sources(sources: list) -> str:
+    return "\n".join(f"- [{s.get('type')}] {s.get('source')}" for s in sources)
@@ -0,0 +1,231 @@
+# rag/ann_index.py
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from rag.compact_docstore import CompactDocstore
+from rag.exact_vectors import ExactVectors
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+QUANTIZATION_TYPES = ("none", "sq8", "pq")
+
+DEFAULT_INDEX_SETTINGS = {
+    "type": "flat",
+    "hnsw": {
+        "m": 32,                # graph neighbours per node
+        "ef_construction": 200,
+        "ef_search": 64,
+    },
+    "ivfpq": {
+        "nlist": 1024,          # coarse clusters (capped by the training sample)
+        "m": 48,                # PQ sub-quantizers (rounded down to a divisor of the dimension)
+        "nbits": 8,             # bits per sub-quantizer code
+        "nprobe": 16,           # clusters visited per query
+        "train_size": 50_000,   # vectors buffered to train the quantizers
+    },
+    # Vector codes of flat / HNSW indexes (IVF-PQ is always product-quantized)
+    "quantization": {
+        "type": "none",         # none (float32) | sq8 (int8 scalar) | pq (product)
+        "pq_m": 48,
+        "pq_nbits": 8,
+        "train_size": 50_000,
+        "rescore": True,        # re-rank candidates with exact vectors from the snapshot's float file
+        "rescore_factor": 4,    # candidates fetched per result when re-scoring
+    },
+}
+
+# Keys that only affect search and can change without rebuilding
+SEARCH_KEYS = {"ef_search", "nprobe", "rescore", "rescore_factor"}
+
+
+def get_index_settings(config: dict) -> dict:
+    """Return the `index` config section merged over the defaults."""
+    section = (config or {}).get("index") or {}
+    settings = {"type": section.get("type", DEFAULT_INDEX_SETTINGS["type"]).lower()}
+    if settings["type"] not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{settings['type']}', expected one of {', '.join(INDEX_TYPES)}")
+    for kind in ("hnsw", "ivfpq", "quantization"):
+        settings[kind] = dict(DEFAULT_INDEX_SETTINGS[kind], **(section.get(kind) or {}))
+    if settings["quantization"]["type"] not in QUANTIZATION_TYPES:
+        raise ValueError(
+            f"Unknown quantization '{settings['quantization']['type']}', expected one of {', '.join(QUANTIZATION_TYPES)}"
+        )
+    return settings
+
+
+def index_signature(settings: dict) -> dict:
+    """Build parameters of the configured index; a change means the index has to be rebuilt."""
+    kind = settings["type"]
+    signature = {"type": kind}
+    signature.update((k, v) for k, v in settings.get(kind, {}).items() if k not in SEARCH_KEYS)
+    if quantization(settings) != "none":
+        signature["quantization"] = {
+            k: v for k, v in settings["quantization"].items() if k not in SEARCH_KEYS
+        }
+    return signature
+
+
+def quantization(settings: dict) -> str:
+    """Vector code type of flat / HNSW indexes; IVF-PQ has its own."""
+    return "none" if settings["type"] == "ivfpq" else settings["quantization"]["type"]
+
+
+def is_lossy(settings: dict) -> bool:
+    """True if the index does not hold exact vectors, so exact copies are kept for re-scoring."""
+    return settings["type"] == "ivfpq" or quantization(settings) != "none"
+
+
+def needs_training(settings: dict) -> bool:
+    return is_lossy(settings)
+
+
+def train_size(settings: dict) -> int:
+    if settings["type"] == "ivfpq":
+        return settings["ivfpq"]["train_size"]
+    return settings["quantization"]["train_size"] if needs_training(settings) else 0
+
+
+def _pq_subquantizers(dim: int, m: int) -> int:
+    """Largest divisor of `dim` that is <= m (PQ splits vectors into equal sub-vectors)."""
+    m = max(1, min(m, dim))
+    while dim % m:
+        m -= 1
+    return m
+
+
+def create_index(dim: int, settings: dict, train_vectors: np.ndarray | None = None) -> faiss.Index:
+    """
+    Empty FAISS index of the configured type and vector codes, trained on
+    `train_vectors` if it needs to be. With too few vectors to train a product
+    quantizer, IVF-PQ falls back to flat and PQ codes to int8.
+    """
+    kind = settings["type"]
+    n = 0 if train_vectors is None else len(train_vectors)
+
+    if kind == "ivfpq":
+        params = settings["ivfpq"]
+        if n < 2 ** params["nbits"]:
+            print(f"⚠️ Only {n} vectors to train IVF-PQ (need >= {2 ** params['nbits']}), using a flat index")
+            return faiss.IndexFlatL2(dim)
+        # ~39 training points per cluster is the minimum k-means is happy with
+        nlist = max(1, min(params["nlist"], n // 39))
+        m = _pq_subquantizers(dim, params["m"])
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, m, params["nbits"])
+        index.train(np.ascontiguousarray(train_vectors, dtype=np.float32))
+        configure_search(index, settings)
+        return index
+
+    codes = quantization(settings)
+    q = settings["quantization"]
+    if codes == "pq" and n < 2 ** q["pq_nbits"]:
+        print(f"⚠️ Only {n} vectors to train PQ codes (need >= {2 ** q['pq_nbits']}), using int8 codes")
+        codes = "sq8"
+
+    if kind == "hnsw":
+        params = settings["hnsw"]
+        if codes == "sq8":
+            index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, params["m"])
+        elif codes == "pq":
+            index = faiss.IndexHNSWPQ(dim, _pq_subquantizers(dim, q["pq_m"]), params["m"], q["pq_nbits"])
+        else:
+            index = faiss.IndexHNSWFlat(dim, params["m"])
+        index.hnsw.efConstruction = params["ef_construction"]
+    elif codes == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    elif codes == "pq":
+        index = faiss.IndexPQ(dim, _pq_subquantizers(dim, q["pq_m"]), q["pq_nbits"])
+    else:
+        index = faiss.IndexFlatL2(dim)
+
+    if not index.is_trained:
+        index.train(np.ascontiguousarray(train_vectors, dtype=np.float32))
+    configure_search(index, settings)
+    return index
+
+
+def configure_search(index: faiss.Index, settings: dict):
+    """Apply search-time parameters (HNSW efSearch, IVF nprobe) to a built or loaded index."""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = settings["hnsw"]["ef_search"]
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(settings["ivfpq"]["nprobe"], index.nlist)
+
+
+def new_store(embeddings, settings: dict, dim: int, train_vectors: np.ndarray | None = None) -> FAISS:
+    """Empty LangChain FAISS store backed by the configured index type."""
+    db = FAISS(
+        embedding_function=embeddings,
+        index=create_index(dim, settings, train_vectors),
+        docstore=CompactDocstore(),
+        index_to_docstore_id={},
+    )
+    db.exact_vectors = None
+    if is_lossy(settings):
+        db.exact_vectors = ExactVectors(dim)
+        db.exact_vectors.configure(settings["quantization"])
+    return db
+
+
+def search_scored(db: FAISS, vector: np.ndarray, k: int) -> list[tuple[str, float]]:
+    """
+    The k nearest chunks to a (1 x dim) query vector as [(docstore ID, squared L2 distance)].
+    On a lossy index with re-scoring enabled, k * rescore_factor candidates
+    are fetched and re-ranked by exact distance.
+    """
+    exact = getattr(db, "exact_vectors", None)
+    rescore = exact is not None and exact.rescore
+    distances, positions = db.index.search(vector, k * exact.rescore_factor if rescore else k)
+    hits = [(db.index_to_docstore_id[p], float(d)) for d, p in zip(distances[0], positions[0]) if p != -1]
+    if rescore:
+        hits = exact.rerank(vector[0], [chunk_id for chunk_id, _ in hits])[:k]
+    return hits
+
+
+def search_ids(db: FAISS, vector: np.ndarray, k: int) -> list[str]:
+    """Docstore IDs of the k nearest chunks to a (1 x dim) query vector."""
+    return [chunk_id for chunk_id, _ in search_scored(db, vector, k)]
+
+
+def delete_vectors(db: FAISS, ids: list[str]):
+    """
+    Remove chunks from the FAISS index and docstore.
+    Flat indexes compact their storage on remove_ids(), so positions stay
+    0..n-1 as LangChain's index_to_docstore_id expects. HNSW graphs cannot
+    remove nodes, and IVF lists keep the old positions of the remaining
+    vectors as labels, so those two are rebuilt from the remaining vectors
+    (re-added without retraining; slow on large corpora that churn a lot).
+    """
+    if not isinstance(db.index, (faiss.IndexHNSW, faiss.IndexIVF)):
+        db.delete(ids)
+        return
+
+    ids = set(ids)
+    keep = [pos for pos in sorted(db.index_to_docstore_id) if db.index_to_docstore_id[pos] not in ids]
+    keep_ids = [db.index_to_docstore_id[pos] for pos in keep]
+    exact = getattr(db, "exact_vectors", None)
+    if exact is not None:
+        vectors = exact.get(keep_ids)
+    else:
+        vectors = db.index.reconstruct_n(0, db.index.ntotal)[keep]
+
+    # A reset clone keeps the parameters and trained quantizers, without the graph / list contents
+    index = faiss.clone_index(db.index)
+    index.reset()
+    if keep:
+        index.add(vectors)
+    db.docstore.delete(list(ids & set(db.index_to_docstore_id.values())))
+    db.index_to_docstore_id = dict(enumerate(keep_ids))
+    db.index = index
+
+
+def describe_index(index: faiss.Index) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        codes = {"IndexHNSWSQ": ", int8", "IndexHNSWPQ": ", PQ"}.get(type(index).__name__, "")
+        return f"HNSW (M={index.hnsw.nb_neighbors(1)}, efSearch={index.hnsw.efSearch}{codes})"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return f"IVF-PQ (nlist={index.nlist}, m={index.pq.M}, nbits={index.pq.nbits}, nprobe={index.nprobe})"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "flat (int8)"
+    if isinstance(index, faiss.IndexPQ):
+        return f"flat (PQ m={index.pq.M}, nbits={index.pq.nbits})"
+    return "flat"
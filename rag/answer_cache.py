@@ -0,0 +1,86 @@
+# rag/answer_cache.py
+import copy
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """
+    Cache of assistant answers looked up by query-embedding similarity.
+
+    Entries are partitioned by (mode, engine) and tagged with the index
+    version they were answered from; a lookup with a different version
+    clears the cache. Eviction is LRU beyond `max_entries` plus a TTL.
+    """
+
+    def __init__(self, embeddings, threshold: float = 0.92, max_entries: int = 500, ttl: float = 86400):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[int, dict] = OrderedDict()
+        self._ids = itertools.count()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _embed(self, query: str) -> np.ndarray:
+        vec = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _check_version(self, version):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def lookup(self, query: str, partition: tuple, version) -> tuple[dict | None, np.ndarray]:
+        """
+        Find a cached answer for a similar query.
+        Returns:
+            (cached result or None, query vector to pass to store())
+        """
+        vec = self._embed(query)
+        now = time.time()
+        with self._lock:
+            self._check_version(version)
+            for key in [k for k, e in self._entries.items() if now - e["created"] > self.ttl]:
+                del self._entries[key]
+
+            candidates = [(k, e) for k, e in self._entries.items() if e["partition"] == partition]
+            if candidates:
+                scores = np.stack([e["vector"] for _, e in candidates]) @ vec
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key, entry = candidates[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    # A copy: callers may change the result they get (e.g. add warnings)
+                    return copy.deepcopy(entry["result"]), vec
+            self.misses += 1
+            return None, vec
+
+    def store(self, vector: np.ndarray, partition: tuple, version, result: dict):
+        with self._lock:
+            self._check_version(version)
+            self._entries[next(self._ids)] = {
+                "partition": partition,
+                "vector": vector,
+                "result": result,
+                "created": time.time(),
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
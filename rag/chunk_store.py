@@ -0,0 +1,27 @@
+# rag/chunk_store.py
+from langchain_community.vectorstores import FAISS
+
+from rag.ann_index import delete_vectors
+from rag.lexical_index import lexical_index
+
+
+def add_chunks(db: FAISS, texts: list[str], vectors, metadatas: list[dict], ids: list[str]):
+    """Add embedded chunks to the FAISS index and docstore, the BM25 index and the exact vectors."""
+    lexical = lexical_index(db)
+    db.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+    lexical.add(ids, texts)
+    exact = getattr(db, "exact_vectors", None)
+    if exact is not None:
+        exact.add(ids, vectors)
+
+
+def delete_chunks(db: FAISS, ids: list[str]):
+    """Remove chunks from everything add_chunks writes to, and their near-duplicate signatures."""
+    delete_vectors(db, ids)
+    lexical_index(db).delete(ids)
+    exact = getattr(db, "exact_vectors", None)
+    if exact is not None:
+        exact.delete(ids)
+    dedup = getattr(db, "dedup_index", None)
+    if dedup is not None:
+        dedup.delete(ids)
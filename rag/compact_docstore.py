@@ -0,0 +1,339 @@
+# rag/compact_docstore.py
+import json
+import os
+
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+from rag.rwlock import ReadWriteLock
+from rag.splitter import HEADINGS_KEY
+
+DOCSTORE_DIR = "docstore"
+
+# Metadata shared by all chunks of a file; anything else is kept per chunk
+FILE_KEYS = ("source", "source_type")
+# Only used to find the overlap with the previous chunk, not stored
+OFFSET_KEY = "start_index"
+# Position of the chunk in its file; only used to tell neighbours apart, not stored
+ORDINAL_KEY = "chunk_no"
+# Written between text ranges that do not continue each other
+GAP = b"\n"
+
+
+class CompactDocstore(Docstore, AddableMixin):
+    """
+    Docstore that keeps chunk text as byte ranges of one UTF-8 blob.
+
+    Consecutive chunks of a file overlap (chunk_overlap); when the splitter
+    records `start_index`, the overlapping text is stored once and both
+    chunks point into it. Per-file metadata is stored once per file, and
+    each distinct heading path once, referenced by ID from the chunk records.
+    Chunks that follow each other in a file get touching or overlapping
+    ranges, and search_merged() joins such hits into one passage.
+
+    A saved docstore is a few flat files read with memory maps:
+        blob.bin      chunk text
+        ids.npy       chunk IDs, sorted (looked up by binary search)
+        records.npy   (file id, start, end, heading id) per ID
+        files.json    per-file metadata
+        headings.json heading paths (ID 0 = none)
+        extra.json    other per-chunk metadata (ad hoc keys; normally empty)
+    Chunks added after loading live in an in-memory overlay until the next save.
+    Text is only decoded for the chunks actually looked up. Lookups share a
+    read lock and run in parallel; adds and deletes take it exclusively.
+    """
+
+    RECORD = np.dtype([("file", "<u4"), ("start", "<u8"), ("end", "<u8"), ("heading", "<u4")])
+
+    def __init__(self):
+        self._files: list[dict] = []
+        self._file_ids: dict[tuple, int] = {}
+        self._headings: list[str] = [""]
+        self._heading_ids: dict[str, int] = {"": 0}
+        self._extra: dict[str, dict] = {}
+
+        # Saved part (memory-mapped)
+        self._blob = np.empty(0, dtype=np.uint8)
+        self._ids = np.empty(0, dtype="S1")
+        self._records = np.empty(0, dtype=self.RECORD)
+
+        # Added since load/save: text in `_buffer` at offsets after the saved blob
+        self._buffer = bytearray()
+        self._added: dict[str, tuple[int, int, int, int]] = {}
+        self._deleted: set[str] = set()
+        self._tail: dict[int, tuple[int, str, int, int | None]] = {}
+        self._lock = ReadWriteLock()
+
+    def __len__(self):
+        return len(self._ids) - len(self._deleted) + len(self._added)
+
+    # ------------------------------
+    # Docstore API
+    # ------------------------------
+    def add(self, texts: dict[str, Document]) -> None:
+        with self._lock.write():
+            existing = [i for i in texts if self._find(i) is not None]
+            if existing:
+                raise ValueError(f"Tried to add ids that already exist: {existing}")
+            for chunk_id, doc in texts.items():
+                self._add(chunk_id, doc)
+
+    def _add(self, chunk_id: str, doc: Document):
+        metadata = dict(doc.metadata)
+        start_index = metadata.pop(OFFSET_KEY, None)
+        chunk_no = metadata.pop(ORDINAL_KEY, None)
+        file_meta = {k: metadata.pop(k) for k in FILE_KEYS if k in metadata}
+        key = tuple(sorted(file_meta.items()))
+        file_id = self._file_ids.get(key)
+        if file_id is None:
+            file_id = self._file_ids[key] = len(self._files)
+            self._files.append(file_meta)
+        heading = metadata.pop(HEADINGS_KEY, "") or ""
+        heading_id = self._heading_ids.get(heading)
+        if heading_id is None:
+            heading_id = self._heading_ids[heading] = len(self._headings)
+            self._headings.append(heading)
+        if metadata:
+            self._extra[chunk_id] = metadata
+
+        text = doc.page_content
+        base = len(self._blob)
+        tail = self._tail.get(file_id)
+        # A chunk in between was not stored (e.g. a near-duplicate): keep the ranges apart
+        if tail is not None and chunk_no is not None and tail[3] is not None and chunk_no != tail[3] + 1:
+            self._buffer += GAP
+            tail = None
+        overlap = 0
+        # The overlap can only be shared while the previous chunk's text is still at the end of the buffer
+        # (another file's chunk may have been added in between)
+        if tail is not None and start_index is not None and tail[2] == base + len(self._buffer):
+            prev_start, prev_text, prev_end, _ = tail
+            shift = start_index - prev_start
+            if 0 <= shift < len(prev_text) and prev_text[shift:] == text[:len(prev_text) - shift]:
+                overlap = len(prev_text) - shift
+
+        if overlap:
+            start = prev_end - len(text[:overlap].encode("utf-8"))
+            self._buffer += text[overlap:].encode("utf-8")
+        else:
+            start = base + len(self._buffer)
+            self._buffer += text.encode("utf-8")
+        end = base + len(self._buffer)
+
+        self._added[chunk_id] = (file_id, start, end, heading_id)
+        if start_index is not None:
+            self._tail[file_id] = (start_index, text, end, chunk_no)
+        else:
+            self._tail.pop(file_id, None)
+
+    def delete(self, ids: list) -> None:
+        with self._lock.write():
+            for chunk_id in ids:
+                if self._added.pop(chunk_id, None) is None and self._saved_row(chunk_id) is not None:
+                    self._deleted.add(chunk_id)
+                self._extra.pop(chunk_id, None)
+
+    def search(self, search: str) -> str | Document:
+        with self._lock.read():
+            record = self._find(search)
+            if record is None:
+                return f"ID {search} not found."
+            file_id, start, end, heading_id = record
+            return Document(
+                id=search, page_content=self._text(start, end), metadata=self._metadata(search, file_id, heading_id)
+            )
+
+    def ids_for_source(self, source: str) -> list[str]:
+        """IDs of all chunks whose metadata `source` is the given path."""
+        with self._lock.read():
+            file_ids = [i for i, meta in enumerate(self._files) if meta.get("source") == source]
+            rows = np.flatnonzero(np.isin(self._records["file"], file_ids))
+            ids = [i.decode() for i in self._ids[rows] if i.decode() not in self._deleted]
+            ids += [i for i, record in self._added.items() if record[0] in file_ids]
+            return ids
+
+    def search_merged(self, ids: list[str]) -> list[tuple[Document, list[int]]]:
+        """
+        Look up chunks, joining those of the same file whose text overlaps or
+        directly continues into one Document that covers their union once.
+        Returns:
+            [(document, positions in `ids` it covers)], ordered by first position;
+            IDs that are not found are left out
+        """
+        with self._lock.read():
+            found, headings = [], {}
+            for position, chunk_id in enumerate(ids):
+                record = self._find(chunk_id)
+                if record is not None:
+                    found.append((record[:3], position, chunk_id))
+                    headings[position] = record[3]
+
+            # Runs of ranges per file, in text order. Overlapping ranges are one
+            # piece of text; a touching one starts a new piece, since the
+            # whitespace the splitter dropped between the chunks is not stored.
+            runs = []
+            for (file_id, start, end), position, chunk_id in sorted(found):
+                run = runs[-1] if runs else None
+                if run is not None and run["file"] == file_id and start <= run["pieces"][-1][1]:
+                    if start < run["pieces"][-1][1]:
+                        run["pieces"][-1][1] = max(run["pieces"][-1][1], end)
+                    else:
+                        run["pieces"].append([start, end])
+                    run["positions"].append(position)
+                else:
+                    runs.append({"file": file_id, "pieces": [[start, end]], "positions": [position]})
+
+            merged = []
+            for run in runs:
+                positions = sorted(run["positions"])
+                first = ids[positions[0]]
+                metadata = self._metadata(first, run["file"], headings[positions[0]])
+                text = "\n".join(self._text(start, end) for start, end in run["pieces"])
+                merged.append((Document(id=first, page_content=text, metadata=metadata), positions))
+            return sorted(merged, key=lambda item: item[1][0])
+
+    # ------------------------------
+    # Internals
+    # ------------------------------
+    def _saved_row(self, chunk_id: str) -> int | None:
+        key = chunk_id.encode("utf-8")
+        row = int(np.searchsorted(self._ids, key))
+        if row < len(self._ids) and self._ids[row] == key:
+            return row
+        return None
+
+    def _metadata(self, chunk_id: str, file_id: int, heading_id: int) -> dict:
+        metadata = dict(self._files[file_id])
+        if heading_id:
+            metadata[HEADINGS_KEY] = self._headings[heading_id]
+        metadata.update(self._extra.get(chunk_id, {}))
+        return metadata
+
+    def _find(self, chunk_id: str) -> tuple[int, int, int, int] | None:
+        record = self._added.get(chunk_id)
+        if record is not None:
+            return record
+        if chunk_id in self._deleted:
+            return None
+        row = self._saved_row(chunk_id)
+        if row is None:
+            return None
+        r = self._records[row]
+        return int(r["file"]), int(r["start"]), int(r["end"]), int(r["heading"])
+
+    def _text(self, start: int, end: int) -> str:
+        base = len(self._blob)
+        if end <= base:
+            return self._blob[start:end].tobytes().decode("utf-8")
+        if start >= base:
+            return self._buffer[start - base:end - base].decode("utf-8")
+        return (self._blob[start:].tobytes() + self._buffer[:end - base]).decode("utf-8")
+
+    def _live(self) -> tuple[list[str], np.ndarray]:
+        saved = [i.decode() for i in self._ids]
+        ids = [i for i in saved if i not in self._deleted] + list(self._added)
+        records = np.empty(len(ids), dtype=self.RECORD)
+        keep = np.array([i not in self._deleted for i in saved], dtype=bool)
+        n_saved = int(keep.sum())
+        records[:n_saved] = self._records[keep]
+        for row, record in enumerate(self._added.values(), start=n_saved):
+            records[row] = record
+        return ids, records
+
+    # ------------------------------
+    # Persistence
+    # ------------------------------
+    def write(self, directory: str):
+        """
+        Write the live chunks to `directory`/docstore. Ranges of deleted chunks
+        are dropped; overlapping ranges stay shared, and separate ones stay
+        apart so chunks only touch when they follow each other in their file.
+        """
+        path = os.path.join(directory, DOCSTORE_DIR)
+        os.makedirs(path, exist_ok=True)
+        with self._lock.read():
+            ids, records = self._live()
+
+            # Merge the live byte ranges into segments and copy those into the new blob
+            order = np.argsort(records["start"], kind="stable")
+            starts, ends = records["start"][order], records["end"][order]
+            reach = np.maximum.accumulate(ends) if len(ends) else ends
+            new_segment = np.ones(len(order), dtype=bool)
+            new_segment[1:] = starts[1:] > reach[:-1]
+            seg_no = np.cumsum(new_segment) - 1
+            seg_start = starts[new_segment]
+            seg_end = np.maximum.reduceat(ends, np.flatnonzero(new_segment)) if len(ends) else ends
+            seg_length = seg_end - seg_start + len(GAP)
+            seg_offset = np.concatenate([[0], np.cumsum(seg_length)[:-1]]).astype(np.uint64)
+
+            with open(os.path.join(path, "blob.bin"), "wb") as f:
+                for n, (s, e) in enumerate(zip(seg_start, seg_end)):
+                    f.write((GAP if n else b"") + self._bytes(int(s), int(e)))
+
+            moved = np.empty_like(records)
+            moved["file"] = records["file"][order]
+            # Only the heading paths still in use are written, renumbered (0 stays "none")
+            used = np.union1d([0], records["heading"]).astype(np.uint32)
+            moved["heading"] = np.searchsorted(used, records["heading"][order])
+            moved["start"] = seg_offset[seg_no] + (starts - seg_start[seg_no])
+            moved["end"] = moved["start"] + (ends - starts)
+            moved_ids = np.array([ids[i].encode("utf-8") for i in order], dtype="S") if ids else np.empty(0, "S1")
+
+            by_id = np.argsort(moved_ids, kind="stable")
+            np.save(os.path.join(path, "ids.npy"), moved_ids[by_id])
+            np.save(os.path.join(path, "records.npy"), moved[by_id])
+            with open(os.path.join(path, "files.json"), "w") as f:
+                json.dump(self._files, f)
+            with open(os.path.join(path, "headings.json"), "w") as f:
+                json.dump([self._headings[i] for i in used], f)
+            with open(os.path.join(path, "extra.json"), "w") as f:
+                json.dump(self._extra, f)
+
+    def _bytes(self, start: int, end: int) -> bytes:
+        base = len(self._blob)
+        if end <= base:
+            return self._blob[start:end].tobytes()
+        if start >= base:
+            return bytes(self._buffer[start - base:end - base])
+        return self._blob[start:].tobytes() + bytes(self._buffer[:end - base])
+
+    def attach(self, directory: str):
+        """Switch to the memory-mapped files saved in `directory` and drop the overlay."""
+        path = os.path.join(directory, DOCSTORE_DIR)
+        blob_path = os.path.join(path, "blob.bin")
+        blob = (
+            np.memmap(blob_path, dtype=np.uint8, mode="r") if os.path.getsize(blob_path)
+            else np.empty(0, dtype=np.uint8)
+        )
+        ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        records = np.load(os.path.join(path, "records.npy"), mmap_mode="r")
+        with open(os.path.join(path, "files.json")) as f:
+            files = json.load(f)
+        with open(os.path.join(path, "headings.json")) as f:
+            headings = json.load(f)
+        with open(os.path.join(path, "extra.json")) as f:
+            extra = json.load(f)
+        with self._lock.write():
+            self._blob, self._ids, self._records = blob, ids, records
+            self._files = files
+            self._file_ids = {tuple(sorted(meta.items())): i for i, meta in enumerate(files)}
+            self._headings, self._heading_ids = headings, {h: i for i, h in enumerate(headings)}
+            self._extra = extra
+            self._buffer = bytearray()
+            self._added, self._deleted, self._tail = {}, set(), {}
+
+    @classmethod
+    def load(cls, directory: str) -> "CompactDocstore | None":
+        if not os.path.isdir(os.path.join(directory, DOCSTORE_DIR)):
+            return None
+        docstore = cls()
+        docstore.attach(directory)
+        return docstore
+
+    @classmethod
+    def from_documents(cls, docs: dict[str, Document]) -> "CompactDocstore":
+        """Convert another docstore's {id: Document} (e.g. InMemoryDocstore._dict)."""
+        docstore = cls()
+        docstore.add(docs)
+        return docstore
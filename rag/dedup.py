@@ -0,0 +1,181 @@
+# rag/dedup.py
+import os
+import pickle
+import re
+import zlib
+
+import numpy as np
+
+from rag.rwlock import ReadWriteLock
+
+DEDUP_FILE = "dedup.pkl"
+
+# Mersenne prime for the (a * x + b) mod p hash family; keeps a * x within uint64
+_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r"\w+")
+
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures of a store's chunks, to catch near-duplicate chunks at ingestion.
+
+    A chunk's signature holds, for each of `num_perm` hash functions, the
+    minimum hash over its word shingles; the share of equal positions in two
+    signatures estimates the Jaccard similarity of the chunks' shingle sets.
+    Signatures are cut into `bands` for LSH, so a lookup only compares against
+    chunks that share at least one band.
+
+    A chunk that matches a stored one at `threshold` or above is not stored
+    again: the stored chunk records the other file in `refs` instead.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, bands: int = 16, shingle_size: int = 5):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        # Fixed seed: signatures are saved with the snapshot and compared across runs
+        rng = np.random.default_rng(0x5EED)
+        self._a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+        self.signatures: dict[str, bytes] = {}
+        self.refs: dict[str, list[str]] = {}
+        self._buckets: dict[bytes, list[str]] | None = None
+        self._lock = ReadWriteLock()
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_buckets"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = ReadWriteLock()
+
+    # ------------------------------
+    # Signatures
+    # ------------------------------
+    def signature(self, text: str) -> np.ndarray | None:
+        """MinHash signature of a chunk text, or None if it has no words."""
+        words = _WORD_RE.findall(text.lower())
+        if not words:
+            return None
+        size = min(self.shingle_size, len(words))
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        hashed = (np.outer(hashes % _PRIME, self._a) + self._b) % _PRIME
+        return hashed.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [bytes([band]) + rows.tobytes() for band, rows in enumerate(signature.reshape(self.bands, -1))]
+
+    def _index(self, chunk_id: str, signature: np.ndarray):
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, []).append(chunk_id)
+
+    def _ensure_buckets(self):
+        # Only writers look chunks up; readers of a snapshot never build the buckets
+        if self._buckets is None:
+            self._buckets = {}
+            for chunk_id, signature in self.signatures.items():
+                self._index(chunk_id, np.frombuffer(signature, dtype=np.uint32))
+
+    # ------------------------------
+    # Lookups and updates
+    # ------------------------------
+    def find(self, signature: np.ndarray) -> str | None:
+        """ID of the stored chunk most similar to `signature`, if it reaches the threshold."""
+        with self._lock.write():
+            self._ensure_buckets()
+            candidates = list({c for key in self._band_keys(signature) for c in self._buckets.get(key, ())})
+            if not candidates:
+                return None
+            stored = np.frombuffer(b"".join(self.signatures[c] for c in candidates), dtype=np.uint32)
+            similarity = (stored.reshape(len(candidates), -1) == signature).mean(axis=1)
+            best = int(similarity.argmax())
+            return candidates[best] if similarity[best] >= self.threshold else None
+
+    def add(self, chunk_id: str, signature: np.ndarray):
+        with self._lock.write():
+            self._ensure_buckets()
+            self.signatures[chunk_id] = signature.tobytes()
+            self._index(chunk_id, signature)
+
+    def add_ref(self, chunk_id: str, source: str):
+        """Record that `source` has a near-duplicate of the stored chunk."""
+        with self._lock.write():
+            sources = self.refs.setdefault(chunk_id, [])
+            if source not in sources:
+                sources.append(source)
+
+    def delete(self, ids: list[str]):
+        with self._lock.write():
+            for chunk_id in ids:
+                signature = self.signatures.pop(chunk_id, None)
+                self.refs.pop(chunk_id, None)
+                if signature is None or self._buckets is None:
+                    continue
+                for key in self._band_keys(np.frombuffer(signature, dtype=np.uint32)):
+                    bucket = self._buckets.get(key)
+                    if bucket is not None and chunk_id in bucket:
+                        bucket.remove(chunk_id)
+                        if not bucket:
+                            del self._buckets[key]
+
+    def drop_refs(self, sources: list[str]):
+        """Forget the references of files that are removed or about to be re-split."""
+        sources = set(sources)
+        with self._lock.write():
+            for chunk_id in list(self.refs):
+                kept = [s for s in self.refs[chunk_id] if s not in sources]
+                if kept:
+                    self.refs[chunk_id] = kept
+                else:
+                    del self.refs[chunk_id]
+
+    def references(self, ids: list[str]) -> list[str]:
+        """Other files holding near-duplicates of any of the given chunks."""
+        with self._lock.read():
+            return list(dict.fromkeys(s for chunk_id in ids for s in self.refs.get(chunk_id, ())))
+
+    # ------------------------------
+    # Building and persistence
+    # ------------------------------
+    @classmethod
+    def from_docstore(cls, db, threshold: float) -> "NearDuplicateIndex":
+        """Signatures of the chunks already in a store (their references are unknown)."""
+        index = cls(threshold)
+        for chunk_id in db.index_to_docstore_id.values():
+            signature = index.signature(db.docstore.search(chunk_id).page_content)
+            if signature is not None:
+                index.add(chunk_id, signature)
+        return index
+
+    def save(self, directory: str):
+        with self._lock.read(), open(os.path.join(directory, DEDUP_FILE), "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, directory: str) -> "NearDuplicateIndex | None":
+        path = os.path.join(directory, DEDUP_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def dedup_index(db, threshold: float) -> NearDuplicateIndex | None:
+    """
+    The near-duplicate index kept alongside a FAISS store (None when
+    deduplication is off), built from its docstore if the store has none yet.
+    """
+    if not threshold:
+        return None
+    index = getattr(db, "dedup_index", None)
+    if index is None:
+        index = db.dedup_index = NearDuplicateIndex.from_docstore(db, threshold)
+    return index
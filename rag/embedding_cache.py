@@ -0,0 +1,194 @@
+# rag/embedding_cache.py
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from rag.file_lock import file_lock
+
+KEY_BYTES = 16
+META_FILE = "meta.json"
+LOCK_FILE = "cache.lock"
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-addressed, on-disk cache in front of an Embeddings model.
+
+    Document vectors are keyed by a hash of (model name, chunk text), so a chunk
+    is embedded once no matter which file, folder or chunking run produced it.
+    Storage is a fixed number of slots in memory-mapped arrays:
+        vectors.f32  capacity x dim float32
+        keys.bin     capacity x 16-byte text hash (all zeros = empty slot)
+        ticks.u64    capacity last-use counters, for LRU eviction
+    Queries are not cached, they go straight to the wrapped model.
+    Several processes may share a cache: writes hold a file lock and clear a
+    slot's key before overwriting its vector, and every hit re-checks the
+    on-disk key after copying the vector, so a slot reused by another process
+    is treated as a miss.
+    """
+
+    def __init__(self, base: Embeddings, model_name: str, cache_dir: str, max_entries: int = 200_000):
+        self.base = base
+        self.model_name = model_name
+        self.capacity = max_entries
+        self.path = os.path.join(cache_dir, model_name.replace("/", "__"))
+        self._lock = threading.Lock()
+        self._slots: dict[bytes, int] = {}
+        self._free: list[int] = []
+        self._vectors = self._keys = self._ticks = None
+        self._tick = 0
+        self.hits = self.misses = self.evictions = 0
+        self._open()
+
+    # ------------------------------
+    # Storage
+    # ------------------------------
+    def _files(self):
+        return (
+            os.path.join(self.path, "vectors.f32"),
+            os.path.join(self.path, "keys.bin"),
+            os.path.join(self.path, "ticks.u64"),
+        )
+
+    def _open(self):
+        try:
+            with open(os.path.join(self.path, META_FILE)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return
+        if meta.get("model") != self.model_name or meta.get("capacity") != self.capacity:
+            print(f"⚠️ Embedding cache at {self.path} has other settings, starting a new one.")
+            return
+        self._map(meta["dim"], mode="r+")
+        used = np.flatnonzero(self._keys.any(axis=1))
+        self._slots = {self._keys[i].tobytes(): int(i) for i in used}
+        self._free = np.flatnonzero(~self._keys.any(axis=1))[::-1].tolist()
+        self._tick = int(self._ticks.max()) if len(used) else 0
+
+    def _map(self, dim: int, mode: str):
+        vectors, keys, ticks = self._files()
+        self._vectors = np.memmap(vectors, dtype=np.float32, mode=mode, shape=(self.capacity, dim))
+        self._keys = np.memmap(keys, dtype=np.uint8, mode=mode, shape=(self.capacity, KEY_BYTES))
+        self._ticks = np.memmap(ticks, dtype=np.uint64, mode=mode, shape=(self.capacity,))
+
+    def _create(self, dim: int):
+        os.makedirs(self.path, exist_ok=True)
+        self._map(dim, mode="w+")
+        meta = {"model": self.model_name, "dim": dim, "capacity": self.capacity}
+        tmp = os.path.join(self.path, f"{META_FILE}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, META_FILE))
+        self._slots = {}
+        self._free = list(range(self.capacity - 1, -1, -1))
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).digest()[:KEY_BYTES]
+
+    def _free_slots(self, n: int) -> list:
+        """Return up to n writable slots, evicting the least recently used entries if full."""
+        slots = []
+        while self._free and len(slots) < n:
+            slot = self._free.pop()
+            # Skip slots another process has filled since we listed them
+            if not self._keys[slot].any():
+                slots.append(slot)
+        need = n - len(slots)
+        if need:
+            # Slots just taken from the free list still have tick 0, skip them
+            taken = set(slots)
+            oldest = np.argpartition(self._ticks, n - 1)[:n]
+            victims = [int(i) for i in oldest if int(i) not in taken][:need]
+            for slot in victims:
+                self._slots.pop(self._keys[slot].tobytes(), None)
+            self.evictions += len(victims)
+            slots.extend(victims)
+        return slots
+
+    # ------------------------------
+    # Embeddings API
+    # ------------------------------
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self._key(t) for t in texts]
+        results: list = [None] * len(texts)
+        missing: dict[bytes, list] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                slot = self._slots.get(key)
+                if slot is not None:
+                    vector = self._vectors[slot].tolist()
+                    # Checked after the copy: another process may have been rewriting the slot
+                    if self._keys[slot].tobytes() == key:
+                        self._tick += 1
+                        self._ticks[slot] = self._tick
+                        results[i] = vector
+                        self.hits += 1
+                        continue
+                missing.setdefault(key, []).append(i)
+            self.misses += sum(len(v) for v in missing.values())
+
+        if not missing:
+            return results
+
+        # Embed each distinct missing text once, outside the lock
+        miss_keys = list(missing)
+        vectors = self.base.embed_documents([texts[missing[k][0]] for k in miss_keys])
+        for key, vector in zip(miss_keys, vectors):
+            for i in missing[key]:
+                results[i] = vector
+
+        os.makedirs(self.path, exist_ok=True)
+        with file_lock(os.path.join(self.path, LOCK_FILE), self._lock):
+            if self._vectors is None:
+                # Another process may have created the cache since we started
+                self._open()
+            if self._vectors is None:
+                self._create(len(vectors[0]))
+            self._tick = max(self._tick, int(self._ticks.max()))
+            store = miss_keys[-self.capacity:]
+            arr = np.asarray(vectors[-len(store):], dtype=np.float32)
+            for slot, key, vector in zip(self._free_slots(len(store)), store, arr):
+                self._tick += 1
+                # Key last: a reader never pairs this key with a half-written or old vector
+                self._keys[slot] = 0
+                self._vectors[slot] = vector
+                self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                self._ticks[slot] = self._tick
+                self._slots[key] = slot
+            self.flush()
+
+        return results
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.base.embed_query(text)
+
+    def flush(self):
+        for arr in (self._vectors, self._keys, self._ticks):
+            if arr is not None:
+                arr.flush()
+
+    # ------------------------------
+    # Stats
+    # ------------------------------
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._slots),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def format_stats(self) -> str:
+        s = self.stats()
+        return (
+            f"🗃️ Embedding cache: {s['hit_rate']:.0%} hit rate ({s['hits']} hits, {s['misses']} misses), "
+            f"{s['entries']}/{s['capacity']} entries, {s['evictions']} evicted"
+        )
@@ -0,0 +1,87 @@
+# rag/exact_vectors.py
+import os
+
+import numpy as np
+
+from rag.rwlock import ReadWriteLock
+
+VECTORS_FILE = "vectors.f32"
+
+
+class ExactVectors:
+    """
+    Full-precision copies of the chunk vectors of a quantized index, for re-scoring.
+
+    Vectors saved with a snapshot are read from a memory-mapped float32 file
+    (row i = FAISS position i at save time), so they cost page cache rather
+    than process memory. Vectors added since the last save are kept in RAM
+    until the next snapshot is written.
+    """
+
+    def __init__(self, dim: int, rescore: bool = True, rescore_factor: int = 4):
+        self.dim = dim
+        self.rescore = rescore
+        self.rescore_factor = rescore_factor
+        self._mmap: np.ndarray | None = None
+        self._rows: dict[str, int] = {}
+        self._added: dict[str, np.ndarray] = {}
+        self._lock = ReadWriteLock()
+
+    def configure(self, quantization: dict):
+        self.rescore = quantization["rescore"]
+        self.rescore_factor = max(1, quantization["rescore_factor"])
+
+    def add(self, ids: list[str], vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock.write():
+            for chunk_id, vector in zip(ids, vectors):
+                self._rows.pop(chunk_id, None)
+                self._added[chunk_id] = vector
+
+    def delete(self, ids: list[str]):
+        with self._lock.write():
+            for chunk_id in ids:
+                self._rows.pop(chunk_id, None)
+                self._added.pop(chunk_id, None)
+
+    def get(self, ids: list[str]) -> np.ndarray:
+        """Vectors for the given chunk IDs (all must be present)."""
+        with self._lock.read():
+            out = np.empty((len(ids), self.dim), dtype=np.float32)
+            for i, chunk_id in enumerate(ids):
+                row = self._rows.get(chunk_id)
+                out[i] = self._mmap[row] if row is not None else self._added[chunk_id]
+            return out
+
+    def rerank(self, query: np.ndarray, ids: list[str]) -> list[tuple[str, float]]:
+        """Order candidate IDs by exact (squared) L2 distance to the query, as [(id, distance)]."""
+        if not ids:
+            return []
+        distances = ((self.get(ids) - query) ** 2).sum(axis=1)
+        return [(ids[i], float(distances[i])) for i in np.argsort(distances, kind="stable")]
+
+    # ------------------------------
+    # Persistence
+    # ------------------------------
+    def write(self, directory: str, order: list[str], rows_per_write: int = 4096):
+        """Write the vectors of `order` (FAISS positions 0..n-1) to the snapshot directory."""
+        with open(os.path.join(directory, VECTORS_FILE), "wb") as f:
+            for start in range(0, len(order), rows_per_write):
+                f.write(self.get(order[start:start + rows_per_write]).tobytes())
+
+    def attach(self, directory: str, order: list[str]):
+        """Switch to the memory-mapped file of a saved snapshot and drop the in-RAM vectors."""
+        path = os.path.join(directory, VECTORS_FILE)
+        mmap = np.memmap(path, dtype=np.float32, mode="r", shape=(len(order), self.dim)) if order else None
+        with self._lock.write():
+            self._mmap = mmap
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(order)}
+            self._added = {}
+
+    @classmethod
+    def load(cls, directory: str, order: list[str], dim: int) -> "ExactVectors | None":
+        if not os.path.exists(os.path.join(directory, VECTORS_FILE)):
+            return None
+        vectors = cls(dim)
+        vectors.attach(directory, order)
+        return vectors
@@ -0,0 +1,50 @@
+# rag/file_lock.py
+import os
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not on POSIX: only threads of one process are serialized
+    fcntl = None
+
+
+@contextmanager
+def file_lock(lock_path: str, thread_lock):
+    """
+    Hold `thread_lock` (threads of this process) and an exclusive flock on
+    `lock_path` (other processes sharing the file).
+    """
+    with thread_lock, open(lock_path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def fsync_dir(path: str):
+    """Persist a directory entry (a created or renamed file); a no-op where directories cannot be opened."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_file_atomic(path: str, data: str):
+    """Replace a file with `data` so readers and a crash see either the old or the new content."""
+    tmp = f"{path}.tmp-{uuid.uuid4().hex}"
+    with open(tmp, "w") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    fsync_dir(os.path.dirname(path) or ".")
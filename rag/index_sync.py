@@ -0,0 +1,135 @@
+# rag/index_sync.py
+import threading
+
+from utils.config_loader import repo_changes
+from rag.partitions import PartitionedIndex, partition_config
+from rag.vector_store import (
+    LiveIndex,
+    diff_manifests,
+    get_store_settings,
+    load_or_build_index,
+    load_snapshot,
+    read_manifest,
+    save_snapshot,
+    scan_manifest,
+    settings_match,
+    update_index,
+    writer_lock,
+)
+
+
+def sync_index(live: LiveIndex, local_paths: dict, config: dict) -> dict | None:
+    """
+    Incrementally re-index the internal sources and publish a new snapshot.
+    Only added, modified and removed files are touched; repo-backed sources
+    with a `sync:` interval are pulled first and diffed by commit.
+    The update is applied to a private, writable copy of the published
+    snapshot under the writer lock (so it always starts from the latest one,
+    whichever process wrote it); `live`, if open, then switches to the new snapshot.
+    Args:
+        live: LiveIndex returned by load_or_build_index
+        local_paths: dict {source_name: local_path}
+        config: full application config
+    Returns:
+        dict with the added / modified / removed file paths, or None if a
+        full rebuild is needed (no snapshot, or index settings changed).
+    """
+    settings = get_store_settings(config)
+
+    with writer_lock(settings["path"]):
+        stored = read_manifest(settings["path"])
+        # Repo-backed sources: fast-forward if due and re-check only the files
+        # changed since the indexed commit
+        commits, changed_paths = repo_changes(
+            config.get("internal_sources", []), local_paths, stored, pull=True
+        )
+        manifest = scan_manifest(local_paths, settings, stored, changed_paths, commits)
+        if not settings_match(stored, manifest):
+            print("⚠️ No compatible index snapshot to sync; restart to rebuild the index.")
+            return None
+
+        added, modified, removed = diff_manifests(stored, manifest)
+        changes = {"added": added, "modified": modified, "removed": removed}
+        if any(changes.values()) or manifest["commits"] != stored.get("commits", {}):
+            db = load_snapshot(settings["path"], live.embeddings, settings["index"])
+            update_index(db, stored, manifest, settings)
+            save_snapshot(db, manifest, settings["path"])
+
+    # A closed partition opens the new snapshot when it is next queried
+    if live.db is not None:
+        live.refresh()
+    return changes
+
+
+def sync_partitions(index: PartitionedIndex, local_paths: dict, config: dict,
+                    sources: list[str] | None = None) -> dict | None:
+    """
+    sync_index for each selected partition (all by default). A partition
+    without a snapshot yet (e.g. a source that was empty at startup) is built.
+    Returns:
+        the added / modified / removed file paths of all partitions together,
+        or None if a partition needs a full rebuild
+    """
+    total = {"added": [], "modified": [], "removed": []}
+    rebuild = False
+    for name in index.resolve(sources):
+        live = index.partitions[name]
+        paths = {name: local_paths[name]}
+        partition = partition_config(config, name)
+        if read_manifest(live.store_path) is None:
+            load_or_build_index(paths, partition, index.embeddings, open_index=False)
+            total["added"].extend((read_manifest(live.store_path) or {"files": {}})["files"])
+            continue
+        changes = sync_index(live, paths, partition)
+        if changes is None:
+            rebuild = True
+            continue
+        for key, files in changes.items():
+            total[key].extend(files)
+    return None if rebuild else total
+
+
+def format_changes(changes: dict | None) -> str:
+    if changes is None:
+        return "⚠️ Sync skipped."
+    if not any(changes.values()):
+        return "✅ Index is up to date."
+    return (
+        f"✅ Re-indexed {len(changes['added'])} added, {len(changes['modified'])} modified, "
+        f"{len(changes['removed'])} removed files."
+    )
+
+
+class BackgroundSync(threading.Thread):
+    """Daemon thread that runs sync_partitions every `interval` seconds."""
+
+    def __init__(self, index: PartitionedIndex, local_paths: dict, config: dict, interval: float):
+        super().__init__(name="index-sync", daemon=True)
+        self.index = index
+        self.local_paths = local_paths
+        self.config = config
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                changes = sync_partitions(self.index, self.local_paths, self.config)
+                if changes and any(changes.values()):
+                    print(f"\n🔄 Background sync: {format_changes(changes)}")
+            except Exception as e:
+                print(f"\n⚠️ Background sync failed: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_background_sync(index: PartitionedIndex, local_paths: dict, config: dict) -> BackgroundSync | None:
+    """Start periodic sync if `vector_store.sync_interval` (seconds) is set."""
+    interval = get_store_settings(config).get("sync_interval") or 0
+    if interval <= 0:
+        return None
+    worker = BackgroundSync(index, local_paths, config, interval)
+    worker.start()
+    print(f"🔄 Background index sync every {interval}s")
+    return worker
@@ -0,0 +1,242 @@
+# rag/ingest.py
+import queue
+import threading
+import time
+import uuid
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from rag.ann_index import needs_training, new_store, train_size
+from rag.chunk_store import add_chunks
+from rag.compact_docstore import ORDINAL_KEY
+from rag.dedup import NearDuplicateIndex
+from rag.lexical_index import BM25Index
+from utils.loaders import iter_sop_documents
+
+_DONE = object()
+
+
+class _Stage(threading.Thread):
+    """Pipeline stage: runs `target`, and on failure records the error and unblocks the consumer."""
+
+    def __init__(self, name: str, target, out_queue: queue.Queue, stop: threading.Event):
+        super().__init__(name=name, daemon=True)
+        self._target_fn = target
+        self.out_queue = out_queue
+        self.stop = stop
+        self.error = None
+
+    def put(self, item):
+        # Bounded put that gives up when a downstream stage has failed
+        while not self.stop.is_set():
+            try:
+                self.out_queue.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self):
+        try:
+            self._target_fn(self)
+        except BaseException as e:
+            self.error = e
+            self.stop.set()
+        finally:
+            self.put(_DONE)
+
+
+def _get(in_queue: queue.Queue, stop: threading.Event):
+    while True:
+        try:
+            return in_queue.get(timeout=0.2)
+        except queue.Empty:
+            if stop.is_set():
+                return _DONE
+
+
+def run_ingest_pipeline(
+    paths: list,
+    manifest: dict,
+    splitter,
+    embeddings,
+    db: FAISS | None = None,
+    batch_size: int = 256,
+    queue_size: int = 4,
+    load_workers: int = 8,
+    index_settings: dict | None = None,
+    dedup: NearDuplicateIndex | None = None,
+    stream_min_bytes: int = 4 << 20,
+) -> tuple[FAISS | None, dict]:
+    """
+    Load -> split -> embed in batches -> add to the index (FAISS and BM25), with the stages
+    running concurrently over bounded queues so memory stays flat.
+    Each file's chunk IDs are recorded in `manifest["files"][path]["chunk_ids"]`.
+    With `dedup`, a chunk that nearly duplicates one already stored (or seen
+    earlier in this run) is not embedded; the file references the stored
+    chunk in `shared_ids` instead.
+    Files of at least `stream_min_bytes` are split straight from disk in one
+    pass when the splitter supports it (split_file), instead of being read
+    whole by the loader threads.
+    Args:
+        paths: files to ingest (keys of manifest["files"])
+        manifest: index manifest, updated in place
+        splitter: text splitter with split_documents() (and optionally split_file())
+        embeddings: LangChain Embeddings used for documents
+        db: index to add to; a new one is created if None
+        batch_size: chunks per embedding call
+        queue_size: max batches buffered between stages
+        load_workers: threads reading files
+        index_settings: ANN index type for a new db (see rag.ann_index.get_index_settings)
+        dedup: near-duplicate index of `db` (for a new db, one to attach to it), or None
+        stream_min_bytes: size from which files are streamed
+    Returns:
+        (db, stats) - db is None if there was nothing to index
+    """
+    files = {}
+    for path in paths:
+        manifest["files"][path]["chunk_ids"] = []
+        manifest["files"][path]["shared_ids"] = []
+        files[path] = manifest["files"][path]["source_type"]
+
+    stop = threading.Event()
+    split_queue = queue.Queue(maxsize=queue_size)
+    embed_queue = queue.Queue(maxsize=queue_size)
+    stats = {"files": 0, "chunks": 0, "duplicates": 0, "batches": 0, "embed_seconds": 0.0}
+    started = time.time()
+
+    streamed = {
+        path: source_type for path, source_type in files.items()
+        if hasattr(splitter, "split_file") and manifest["files"][path].get("size", 0) >= stream_min_bytes
+    }
+
+    def split_files():
+        """(path, chunks) per file: small files read by the loader threads, large ones streamed."""
+        loaded = {path: source_type for path, source_type in files.items() if path not in streamed}
+        for doc in iter_sop_documents(loaded, load_workers):
+            yield doc.metadata["source"], splitter.split_documents([doc])
+        for path, source_type in streamed.items():
+            yield path, _stream_file(splitter, path, source_type)
+
+    def load_and_split(stage: _Stage):
+        texts, metadatas, ids = [], [], []
+        for source, chunks in split_files():
+            if stop.is_set():
+                return
+            chunk_ids, shared_ids = [], []
+            stats["files"] += 1
+
+            for chunk_no, chunk in enumerate(chunks):
+                chunk_id = uuid.uuid4().hex
+                if dedup is not None:
+                    signature = dedup.signature(chunk.page_content)
+                    original = dedup.find(signature) if signature is not None else None
+                    if original is not None:
+                        if original not in chunk_ids:
+                            dedup.add_ref(original, source)
+                        shared_ids.append(original)
+                        stats["duplicates"] += 1
+                        continue
+                    if signature is not None:
+                        dedup.add(chunk_id, signature)
+                chunk.metadata[ORDINAL_KEY] = chunk_no
+                chunk_ids.append(chunk_id)
+                texts.append(chunk.page_content)
+                metadatas.append(chunk.metadata)
+                ids.append(chunk_id)
+                if len(texts) >= batch_size:
+                    if not stage.put((texts, metadatas, ids)):
+                        return
+                    texts, metadatas, ids = [], [], []
+            manifest["files"][source]["chunk_ids"] = chunk_ids
+            manifest["files"][source]["shared_ids"] = shared_ids
+        if texts:
+            stage.put((texts, metadatas, ids))
+
+    def embed(stage: _Stage):
+        while True:
+            batch = _get(split_queue, stop)
+            if batch is _DONE:
+                return
+            texts, metadatas, ids = batch
+            t0 = time.time()
+            vectors = embeddings.embed_documents(texts)
+            stats["embed_seconds"] += time.time() - t0
+            if not stage.put((texts, vectors, metadatas, ids)):
+                return
+
+    stages = [
+        _Stage("ingest-split", load_and_split, split_queue, stop),
+        _Stage("ingest-embed", embed, embed_queue, stop),
+    ]
+    for stage in stages:
+        stage.start()
+
+    def add_batch(texts, vectors, metadatas, ids):
+        add_chunks(db, texts, vectors, metadatas, ids)
+        stats["chunks"] += len(texts)
+        stats["batches"] += 1
+
+    # Index stage runs on the calling thread. A new index that needs training
+    # (IVF-PQ) buffers the first `train_size` vectors to train it on.
+    index_settings = index_settings or {"type": "flat"}
+    pending, buffered = [], 0
+    try:
+        while True:
+            batch = _get(embed_queue, stop)
+            if batch is _DONE:
+                break
+            if db is not None:
+                add_batch(*batch)
+                continue
+            pending.append(batch)
+            buffered += len(batch[0])
+            if buffered >= train_size(index_settings):
+                db = _create_store(pending, embeddings, index_settings, dedup)
+                for item in pending:
+                    add_batch(*item)
+                pending = []
+
+        if pending and not stop.is_set():
+            db = _create_store(pending, embeddings, index_settings, dedup)
+            for item in pending:
+                add_batch(*item)
+    finally:
+        stop.set()
+        for stage in stages:
+            stage.join()
+
+    for stage in stages:
+        if stage.error:
+            raise stage.error
+
+    stats["seconds"] = time.time() - started
+    stats["chunks_per_sec"] = stats["chunks"] / stats["seconds"] if stats["seconds"] else 0.0
+    return db, stats
+
+
+def _stream_file(splitter, path: str, source_type: str):
+    try:
+        yield from splitter.split_file(path, {"source": path, "source_type": source_type})
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"⚠️  Could not read {path} (indexed up to there): {e}")
+
+
+def _create_store(batches: list, embeddings, index_settings: dict, dedup: NearDuplicateIndex | None) -> FAISS:
+    vectors = np.asarray([v for _, batch_vectors, _, _ in batches for v in batch_vectors], dtype=np.float32)
+    db = new_store(embeddings, index_settings, vectors.shape[1], vectors if needs_training(index_settings) else None)
+    db.lexical_index = BM25Index()
+    db.dedup_index = dedup
+    return db
+
+
+def format_stats(stats: dict) -> str:
+    text = (
+        f"⚡ Indexed {stats['chunks']} chunks from {stats['files']} files in {stats['seconds']:.1f}s "
+        f"({stats['chunks_per_sec']:.1f} chunks/sec, {stats['batches']} batches, "
+        f"{stats['embed_seconds']:.1f}s embedding)"
+    )
+    if stats["duplicates"]:
+        text += f"\n♻️ {stats['duplicates']} near-duplicate chunks referenced instead of stored again"
+    return text
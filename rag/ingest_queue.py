@@ -0,0 +1,219 @@
+# rag/ingest_queue.py
+import json
+import os
+import threading
+import time
+import uuid
+
+from rag.file_lock import file_lock, fsync_dir, write_file_atomic
+from rag.index_sync import format_changes, sync_partitions
+from rag.partitions import PartitionedIndex
+from rag.vector_store import get_store_settings
+
+WAL_FILE = "ingest-wal.jsonl"
+WAL_LOCK_FILE = "ingest-wal.lock"
+# Records of indexed entries are kept this long for status() before compaction drops them
+KEEP_DONE_SECONDS = 3600
+
+
+class IngestQueue:
+    """
+    Durable queue of submitted SOP files (new cases), indexed by a background worker.
+
+    submit() appends the file's path and text to a write-ahead log under the
+    index store, fsyncs it and returns right away. The worker writes queued
+    files into their internal source and syncs the affected partitions once
+    per batch, so a burst of submissions is split and embedded together and
+    published as one snapshot per source; then it logs the entries as
+    indexed. Entries without that record are replayed when the queue starts
+    again, so a submission survives a crash at any point after submit().
+
+    Records (JSON lines):
+        {"op": "submit", "id", "path", "text", "at"}
+        {"op": "indexed", "id", "at"}
+    """
+
+    def __init__(self, index: PartitionedIndex, local_paths: dict, config: dict):
+        settings = get_store_settings(config)
+        self.index = index
+        self.local_paths = local_paths
+        self.config = config
+        self.wal_path = os.path.join(settings["path"], WAL_FILE)
+        self.lock_path = os.path.join(settings["path"], WAL_LOCK_FILE)
+        self.batch_window = settings["ingest_batch_window"]
+        self.max_batch = settings["ingest_max_batch"]
+        self.retry_interval = settings["ingest_retry_interval"]
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._worker: threading.Thread | None = None
+        os.makedirs(settings["path"], exist_ok=True)
+
+    # ------------------------------
+    # Write-ahead log
+    # ------------------------------
+    def _locked(self):
+        """Serialize log access: threads of this process, and other processes sharing the store."""
+        return file_lock(self.lock_path, self._lock)
+
+    def _append(self, records: list[dict]):
+        with self._locked():
+            created = not os.path.exists(self.wal_path)
+            with open(self.wal_path, "a") as f:
+                f.write("".join(json.dumps(r) + "\n" for r in records))
+                f.flush()
+                os.fsync(f.fileno())
+            if created:
+                fsync_dir(os.path.dirname(self.wal_path))
+
+    def _read(self) -> list[dict]:
+        try:
+            with open(self.wal_path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # torn last line of an append cut short by a crash
+        return records
+
+    def _state(self) -> tuple[dict[str, dict], set[str]]:
+        """(submitted entries by ID, IDs already indexed)"""
+        entries, done = {}, set()
+        for record in self._read():
+            if record.get("op") == "submit":
+                entries[record["id"]] = record
+            elif record.get("op") == "indexed":
+                done.add(record["id"])
+        return entries, done
+
+    def _compact(self):
+        """Rewrite the log without entries indexed more than KEEP_DONE_SECONDS ago."""
+        cutoff = time.time() - KEEP_DONE_SECONDS
+        with self._locked():
+            records = self._read()
+            old = {r["id"] for r in records if r.get("op") == "indexed" and r["at"] < cutoff}
+            if not old:
+                return
+            write_file_atomic(self.wal_path, "".join(json.dumps(r) + "\n" for r in records if r["id"] not in old))
+
+    # ------------------------------
+    # Submitting
+    # ------------------------------
+    def source_of(self, path: str) -> str | None:
+        """Internal source a file path belongs to, if any."""
+        path = os.path.abspath(path)
+        for name, root in self.local_paths.items():
+            root = os.path.abspath(root)
+            if os.path.commonpath([path, root]) == root:
+                return name
+        return None
+
+    def submit(self, path: str, text: str) -> str:
+        """
+        Queue a file to be written and indexed.
+        Args:
+            path: file path inside an internal source
+            text: file content
+        Returns:
+            entry ID, to ask status() about
+        Raises:
+            ValueError: the path is outside the internal sources, or already queued
+        """
+        if self.source_of(path) is None:
+            raise ValueError(f"{os.path.dirname(path)} is not an internal source in config.yaml")
+        path = os.path.abspath(path)
+        entries, done = self._state()
+        if any(e["path"] == path and i not in done for i, e in entries.items()):
+            raise ValueError(f"{path} is already queued")
+
+        entry_id = uuid.uuid4().hex
+        self._append([{"op": "submit", "id": entry_id, "path": path, "text": text, "at": time.time()}])
+        self._wake.set()
+        return entry_id
+
+    def status(self, entry_id: str) -> str:
+        """'queued', 'indexed', or 'unknown' (never submitted, or dropped from the log long after indexing)."""
+        return self.statuses([entry_id])[entry_id]
+
+    def statuses(self, entry_ids: list[str]) -> dict[str, str]:
+        """status() of several entries, reading the log once."""
+        entries, done = self._state()
+        return {
+            entry_id: "indexed" if entry_id in done else "queued" if entry_id in entries else "unknown"
+            for entry_id in entry_ids
+        }
+
+    def pending(self) -> list[dict]:
+        """Submitted entries not indexed yet, oldest first."""
+        entries, done = self._state()
+        return [e for i, e in entries.items() if i not in done]
+
+    # ------------------------------
+    # Worker
+    # ------------------------------
+    def process(self) -> int:
+        """
+        Write and index up to `max_batch` pending entries.
+        Returns:
+            number of entries indexed
+        """
+        batch = self.pending()[:self.max_batch]
+        if not batch:
+            return 0
+
+        sources = []
+        for entry in batch:
+            os.makedirs(os.path.dirname(entry["path"]), exist_ok=True)
+            write_file_atomic(entry["path"], entry["text"])
+            source = self.source_of(entry["path"])
+            if source is not None and source not in sources:
+                sources.append(source)
+
+        changes = sync_partitions(self.index, self.local_paths, self.config, sources)
+        if changes is None:
+            raise RuntimeError("a queued file's source needs a full rebuild")
+        self._append([{"op": "indexed", "id": e["id"], "at": time.time()} for e in batch])
+        print(f"📨 Indexed {len(batch)} queued file(s): {format_changes(changes)}")
+        return len(batch)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                if not self.pending():
+                    self._compact()
+                    # Also polls for entries queued by other processes sharing the store
+                    self._wake.wait(self.retry_interval)
+                    self._wake.clear()
+                    continue
+                # Let a burst of submissions arrive, then embed them together
+                self._stop_event.wait(self.batch_window)
+                while self.process() == self.max_batch:
+                    pass
+            except Exception as e:
+                print(f"\n⚠️ Indexing queued files failed, retrying in {self.retry_interval}s: {e}")
+                self._stop_event.wait(self.retry_interval)
+
+    def start(self):
+        """Start the worker; entries left over from a previous run are replayed first."""
+        leftover = len(self.pending())
+        if leftover:
+            print(f"📨 Replaying {leftover} queued file(s) not indexed before the last shutdown")
+        self._worker = threading.Thread(target=self._run, name="ingest-queue", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join()
+
+
+def start_ingest_queue(index: PartitionedIndex, local_paths: dict, config: dict) -> IngestQueue:
+    """Create the ingest queue of the index store and start its worker."""
+    ingest_queue = IngestQueue(index, local_paths, config)
+    ingest_queue.start()
+    return ingest_queue
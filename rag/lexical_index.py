@@ -0,0 +1,226 @@
+# rag/lexical_index.py
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+
+import numpy as np
+
+from rag.rwlock import ReadWriteLock
+
+LEXICAL_FILE = "lexical.pkl"
+
+_build_lock = threading.Lock()
+
+# Identifiers like evicted_keys, --maxmemory-policy, OOMKilled, 0x80070005 or
+# kube-system/coredns stay one token; their parts are indexed as well.
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._:/-][a-z0-9]+|_+[a-z0-9]+)*")
+_JOINER_RE = re.compile(r"[._:/-]+|_+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how if in is it of on or that the this to was what when "
+    "where which with".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token not in STOPWORDS:
+            tokens.append(token)
+        parts = _JOINER_RE.split(token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """
+    In-memory BM25 inverted index over chunk texts, keyed by FAISS docstore IDs.
+
+    Each chunk gets an append-only slot; a term's postings are two compact
+    arrays (slots, term frequencies) scored with numpy at query time.
+    Deleting a chunk only clears its slot, and the postings are compacted
+    once a quarter of the slots are dead. Searches share a read lock, so
+    concurrent queries only wait for an add or delete in progress.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: list[str | None] = []
+        self.slots: dict[str, int] = {}
+        self.lengths = array("I")
+        self.alive = array("B")
+        self.postings: dict[str, tuple[array, array]] = {}
+        self.total_length = 0
+        self._lock = ReadWriteLock()
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = ReadWriteLock()
+
+    # ------------------------------
+    # Updates
+    # ------------------------------
+    def add(self, ids: list[str], texts: list[str]):
+        with self._lock.write():
+            for chunk_id, text in zip(ids, texts):
+                if chunk_id in self.slots:
+                    self._delete(chunk_id)
+                slot = len(self.ids)
+                self.ids.append(chunk_id)
+                self.slots[chunk_id] = slot
+
+                counts: dict[str, int] = {}
+                for token in tokenize(text):
+                    counts[token] = counts.get(token, 0) + 1
+                for term, tf in counts.items():
+                    postings = self.postings.get(term)
+                    if postings is None:
+                        postings = self.postings[term] = (array("I"), array("H"))
+                    postings[0].append(slot)
+                    postings[1].append(min(tf, 0xFFFF))
+
+                length = sum(counts.values())
+                self.lengths.append(length)
+                self.alive.append(1)
+                self.total_length += length
+
+    def delete(self, ids: list[str]):
+        with self._lock.write():
+            for chunk_id in ids:
+                self._delete(chunk_id)
+            if len(self.ids) > 1000 and len(self.slots) < 0.75 * len(self.ids):
+                self._compact()
+
+    def _delete(self, chunk_id: str):
+        slot = self.slots.pop(chunk_id, None)
+        if slot is None:
+            return
+        self.ids[slot] = None
+        self.alive[slot] = 0
+        self.total_length -= self.lengths[slot]
+
+    def _compact(self):
+        """Renumber live slots densely and drop postings of deleted chunks."""
+        alive = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+        remap = np.cumsum(alive, dtype=np.int64) - 1
+        postings = {}
+        for term, (slots, tfs) in self.postings.items():
+            slots = np.frombuffer(slots, dtype=np.uint32)
+            keep = alive[slots]
+            if keep.any():
+                postings[term] = (
+                    array("I", remap[slots[keep]].astype(np.uint32).tobytes()),
+                    array("H", np.frombuffer(tfs, dtype=np.uint16)[keep].tobytes()),
+                )
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32)[alive]
+        self.ids = [i for i in self.ids if i is not None]
+        self.slots = {chunk_id: slot for slot, chunk_id in enumerate(self.ids)}
+        self.lengths = array("I", lengths.tobytes())
+        self.alive = array("B", [1]) * len(self.ids)
+        self.postings = postings
+
+    # ------------------------------
+    # Search
+    # ------------------------------
+    def search(self, query: str, k: int = 10) -> list[tuple[str, float]]:
+        """
+        Top-k chunks for the query by BM25 score.
+        Returns:
+            [(chunk_id, score)], best first; chunks with no query term are left out
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock.read():
+            # Scored in a helper so its zero-copy views are released before a writer can resize the arrays
+            hits, scores = self._scores(terms)
+            if len(hits) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                hits, scores = hits[top], scores[top]
+            order = np.argsort(-scores, kind="stable")
+            return [(self.ids[hits[i]], float(scores[i])) for i in order]
+
+    def _scores(self, terms: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """BM25 scores of the live chunks containing any term, as (slots, scores)."""
+        n_docs = len(self.slots)
+        matched = [self.postings[t] for t in terms if t in self.postings]
+        if not n_docs or not matched:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        avg_length = self.total_length / n_docs or 1.0
+        alive = np.frombuffer(self.alive, dtype=np.uint8).view(bool)
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32)
+
+        all_slots, all_scores = [], []
+        for slot_array, tf_array in matched:
+            slots = np.frombuffer(slot_array, dtype=np.uint32)
+            live = alive[slots]
+            slots = slots[live]
+            if not len(slots):
+                continue
+            tfs = np.frombuffer(tf_array, dtype=np.uint16)[live].astype(np.float32)
+            df = len(slots)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[slots] / avg_length)
+            all_slots.append(slots)
+            all_scores.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+
+        if not all_slots:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        slots = np.concatenate(all_slots)
+        scores = np.concatenate(all_scores)
+        if len(all_slots) == 1:
+            return slots.astype(np.int64), scores
+        # Sum per chunk: dense accumulator for common terms, sort-based for rare ones
+        if len(slots) > len(self.ids) // 8:
+            dense = np.bincount(slots, weights=scores, minlength=len(self.ids))
+            hits = np.flatnonzero(dense)
+            return hits, dense[hits].astype(np.float32)
+        hits, inverse = np.unique(slots, return_inverse=True)
+        return hits.astype(np.int64), np.bincount(inverse, weights=scores).astype(np.float32)
+
+    # ------------------------------
+    # Building and persistence
+    # ------------------------------
+    @classmethod
+    def from_docstore(cls, db) -> "BM25Index":
+        index = cls()
+        ids = list(db.index_to_docstore_id.values())
+        index.add(ids, [db.docstore.search(i).page_content for i in ids])
+        return index
+
+    def save(self, directory: str):
+        with self._lock.read(), open(os.path.join(directory, LEXICAL_FILE), "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, directory: str) -> "BM25Index | None":
+        path = os.path.join(directory, LEXICAL_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def lexical_index(db) -> BM25Index:
+    """The BM25 index kept alongside a FAISS store, built from its docstore the first time it is needed."""
+    index = getattr(db, "lexical_index", None)
+    if index is None:
+        with _build_lock:
+            index = getattr(db, "lexical_index", None)
+            if index is None:
+                index = BM25Index.from_docstore(db)
+                db.lexical_index = index
+    return index
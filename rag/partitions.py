@@ -0,0 +1,161 @@
+# rag/partitions.py
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from langchain_community.vectorstores import FAISS
+
+from rag.vector_store import CURRENT_FILE, LiveIndex, get_embeddings, get_store_settings, load_or_build_index
+
+PARTITIONS_DIR = "partitions"
+
+
+def partition_path(store_path: str, name: str) -> str:
+    """Store directory of one source's sub-index."""
+    return os.path.join(store_path, PARTITIONS_DIR, re.sub(r"[^A-Za-z0-9_.-]", "_", name))
+
+
+def partition_config(config: dict, name: str) -> dict:
+    """The config as seen by one partition: only its internal source, and its own store path."""
+    store_path = get_store_settings(config)["path"]
+    partition = dict(config)
+    partition["internal_sources"] = [s for s in config.get("internal_sources", []) if s["name"] == name]
+    partition["vector_store"] = dict(config.get("vector_store") or {}, path=partition_path(store_path, name))
+    return partition
+
+
+class PartitionedIndex:
+    """
+    One sub-index per internal source (the `source_type` of its chunks), each
+    a LiveIndex with its own snapshots under <store>/partitions/<source>.
+
+    A query searches only the partitions it selects, by source name or by the
+    `team` the sources belong to in config.yaml, and merges their hits.
+    Partitions are opened on first use and the least recently used ones are
+    closed when the open snapshots exceed `memory_cap_mb` (0 = no cap).
+    """
+
+    def __init__(self, store_path: str, embeddings, index_settings: dict, sources: list[dict],
+                 memory_cap_mb: float = 0):
+        self.store_path = store_path
+        self.embeddings = embeddings
+        self.memory_cap = memory_cap_mb * 1024 * 1024
+        self.partitions = {
+            src["name"]: LiveIndex(partition_path(store_path, src["name"]), embeddings, index_settings)
+            for src in sources
+        }
+        self.teams: dict[str, list[str]] = {}
+        for src in sources:
+            if src.get("team"):
+                self.teams.setdefault(src["team"], []).append(src["name"])
+        self._open: OrderedDict[str, tuple[str | None, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.partitions)
+
+    def resolve(self, sources: list[str] | None = None) -> list[str]:
+        """Partition names for a selection of source and/or team names (None = all)."""
+        if not sources:
+            return self.names
+        names = []
+        for source in sources:
+            if source in self.partitions:
+                names.append(source)
+            elif source in self.teams:
+                names.extend(self.teams[source])
+            else:
+                raise ValueError(f"Unknown SOP source or team '{source}'")
+        return list(dict.fromkeys(names))
+
+    def current(self, sources: list[str] | None = None) -> list[tuple[str, FAISS]]:
+        """(partition name, db) of the selected partitions that have an index, opening them as needed."""
+        dbs = []
+        for name in self.resolve(sources):
+            live = self.partitions[name]
+            _, db = live.current()
+            if db is not None:
+                dbs.append((name, db))
+                self._touch(name, live)
+        return dbs
+
+    def version(self) -> str:
+        """Changes whenever any partition publishes a new snapshot; does not open anything."""
+        versions = []
+        for name, live in self.partitions.items():
+            try:
+                with open(os.path.join(live.store_path, CURRENT_FILE)) as f:
+                    versions.append(f"{name}={f.read().strip()}")
+            except OSError:
+                versions.append(f"{name}=-")
+        return ",".join(versions)
+
+    def adopt(self, name: str, live: LiveIndex):
+        """Use the LiveIndex returned by load_or_build_index (it may serve an unpublished index)."""
+        if live.db is not None:
+            self.partitions[name] = live
+            self._touch(name, live)
+
+    def _touch(self, name: str, live: LiveIndex):
+        """Mark a partition as just used and close the least recently used ones beyond the cap."""
+        with self._lock:
+            # Sized again whenever the partition has switched to a new snapshot
+            if name not in self._open or self._open[name][0] != live.snapshot:
+                self._open[name] = (live.snapshot, live.footprint())
+            self._open.move_to_end(name)
+            if not self.memory_cap:
+                return
+            for other in list(self._open):
+                if self._open_bytes() <= self.memory_cap or other == name:
+                    break
+                if self.partitions[other].close():
+                    del self._open[other]
+                    print(f"💤 Closed SOP partition '{other}' (least recently used)")
+
+    def _open_bytes(self) -> int:
+        return sum(size for _, size in self._open.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "partitions": len(self.partitions),
+                "open": list(self._open),
+                "open_mb": round(self._open_bytes() / 1e6, 1),
+            }
+
+
+def partitioned_index(config: dict, embeddings=None, sources: list[str] | None = None) -> PartitionedIndex:
+    """PartitionedIndex over the configured internal sources (or the named ones), without building anything."""
+    settings = get_store_settings(config)
+    return PartitionedIndex(
+        settings["path"],
+        embeddings or get_embeddings(settings),
+        settings["index"],
+        [s for s in config.get("internal_sources", []) if sources is None or s["name"] in sources],
+        memory_cap_mb=settings["partition_memory_mb"] or 0,
+    )
+
+
+def load_partitions(local_paths: dict, config: dict) -> PartitionedIndex | None:
+    """
+    Return the partitioned index of the internal sources.
+    Each source's sub-index is brought up to date first (see
+    load_or_build_index), one after the other; none is opened until a query needs it.
+    Args:
+        local_paths: dict {source_name: local_path}
+        config: full application config
+    Returns:
+        PartitionedIndex, or None if there are no SOP documents.
+    """
+    index = partitioned_index(config, sources=list(local_paths))
+    found = False
+    for name in index.names:
+        print(f"📂 SOP source '{name}'...")
+        live = load_or_build_index({name: local_paths[name]}, partition_config(config, name), index.embeddings,
+                                   open_index=False)
+        if live is not None:
+            found = True
+            index.adopt(name, live)
+    return index if found else None
@@ -0,0 +1,97 @@
+# rag/passages.py
+import re
+
+import numpy as np
+
+# Rough chars-per-token ratio for English text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_passages(text: str, max_chars: int = 800) -> list[str]:
+    """
+    Split page text into passages of at most `max_chars`.
+    Paragraphs are kept whole when they fit, short neighbours are merged and
+    oversized ones are cut at sentence boundaries.
+    """
+    passages = []
+    current = ""
+
+    for para in re.split(r"\n\s*\n", text):
+        para = para.strip()
+        if not para:
+            continue
+        pieces = [para] if len(para) <= max_chars else _split_long(para, max_chars)
+        for piece in pieces:
+            if current and len(current) + len(piece) + 2 > max_chars:
+                passages.append(current)
+                current = ""
+            current = f"{current}\n\n{piece}" if current else piece
+
+    if current:
+        passages.append(current)
+    return passages
+
+
+def _split_long(para: str, max_chars: int) -> list[str]:
+    pieces, current = [], ""
+    for sentence in re.split(r"(?<=[.!?])\s+", para):
+        while len(sentence) > max_chars:
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def pack_passages(query: str, web_texts: list[dict], embeddings, token_budget: int = 2000,
+                  max_chars: int = 800) -> tuple[str, list[str]]:
+    """
+    Pick the passages of the fetched pages most relevant to the query that fit a token budget.
+    Passages are scored by cosine similarity to the query with the same
+    embedding model as the SOP index, taken best-first while they fit, and
+    emitted in page order so each page's text still reads in sequence.
+    Args:
+        query: user question
+        web_texts: [{"url", "text"}] from ExternalWebRetriever.fetch_many
+        embeddings: LangChain Embeddings (the FAISS store's model, without its on-disk cache)
+        token_budget: max estimated tokens of packed text
+        max_chars: passage size
+    Returns:
+        (packed text, URLs that contributed passages)
+    """
+    candidates = [
+        (page_no, passage_no, wt["url"], passage)
+        for page_no, wt in enumerate(web_texts)
+        for passage_no, passage in enumerate(split_passages(wt["text"], max_chars))
+    ]
+    if not candidates:
+        return "", []
+
+    query_vec = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+    passage_vecs = np.asarray(embeddings.embed_documents([c[3] for c in candidates]), dtype=np.float32)
+    norms = np.linalg.norm(passage_vecs, axis=1) * (np.linalg.norm(query_vec) or 1.0)
+    scores = passage_vecs @ query_vec / np.where(norms == 0, 1.0, norms)
+
+    chosen, used = [], 0
+    for i in np.argsort(-scores):
+        cost = estimate_tokens(candidates[i][3])
+        if used + cost > token_budget:
+            continue
+        chosen.append(candidates[i])
+        used += cost
+
+    chosen.sort(key=lambda c: (c[0], c[1]))
+    urls = list(dict.fromkeys(c[2] for c in chosen))
+    blocks = []
+    for url in urls:
+        text = "\n\n".join(c[3] for c in chosen if c[2] == url)
+        blocks.append(f"Source: {url}\n{text}")
+    return "\n\n".join(blocks), urls
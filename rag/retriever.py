@@ -0,0 +1,119 @@
+# rag/retriever.py
+import faiss
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from rag.ann_index import search_scored
+from rag.lexical_index import lexical_index
+from rag.partitions import PartitionedIndex
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[tuple[str, float]]:
+    """
+    Merge ranked ID lists with reciprocal rank fusion: score(d) = sum(1 / (k + rank)).
+    Returns:
+        [(id, score)], best first; ties keep the order in which IDs were first seen
+    """
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def embed_queries(embeddings, queries: list[str]) -> np.ndarray:
+    """Embed several queries, in one model pass when the embeddings are FastEmbed (cached or not)."""
+    base = getattr(embeddings, "base", embeddings)
+    model = getattr(base, "model", None)
+    if hasattr(model, "query_embed"):
+        return np.asarray(list(model.query_embed(queries, batch_size=base.batch_size)), dtype=np.float32)
+    return np.asarray([embeddings.embed_query(q) for q in queries], dtype=np.float32).reshape(len(queries), -1)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Dense FAISS search and BM25 lexical search over the same chunks, merged with RRF.
+    The lexical side catches exact tokens (error codes, CLI flags, metric
+    names) that embedding similarity tends to miss.
+
+    Only the selected source partitions are searched. Their dense hits are
+    merged by distance and their BM25 hits by score before the fusion, so a
+    query over several sources ranks like one over a single index.
+
+    With `coalesce`, hits that overlap or follow each other in the same file
+    are returned as one passage (at the rank of the best of them), so the
+    prompt carries their text once. Files holding near-duplicates of a hit
+    that was stored only once are listed in its metadata under "also_in".
+    """
+
+    index: PartitionedIndex
+    k: int = 10
+    fetch_k: int = 30
+    rrf_k: int = 60
+    coalesce: bool = True
+
+    def search(self, queries: list[str], k: int | None = None,
+               sources: list[str] | None = None) -> list[list[tuple[Document, float]]]:
+        """
+        Top chunks for each query, embedded together and searched on one
+        snapshot per partition (even if a new one is published meanwhile).
+        No LLM is involved.
+        Args:
+            queries: questions to search for
+            k: results per query (default self.k)
+            sources: source and/or team names to search (None = all)
+        Returns:
+            per query, [(chunk, RRF score)] best first, adjacent chunks merged (see coalesce)
+        """
+        parts = self.index.current(sources)
+        if not queries or not parts:
+            return [[] for _ in queries]
+        vectors = embed_queries(self.index.embeddings, queries)
+        if any(getattr(db, "_normalize_L2", False) for _, db in parts):
+            faiss.normalize_L2(vectors)
+
+        results = []
+        for query, vector in zip(queries, vectors):
+            dense, sparse, owner = [], [], {}
+            for _, db in parts:
+                hits = search_scored(db, vector[None, :], self.fetch_k)
+                matches = lexical_index(db).search(query, self.fetch_k)
+                dense.extend(hits)
+                sparse.extend(matches)
+                owner.update((chunk_id, db) for chunk_id, _ in hits + matches)
+            dense = [chunk_id for chunk_id, _ in sorted(dense, key=lambda hit: hit[1])[:self.fetch_k]]
+            sparse = [chunk_id for chunk_id, _ in sorted(sparse, key=lambda hit: -hit[1])[:self.fetch_k]]
+
+            fused = reciprocal_rank_fusion([dense, sparse], self.rrf_k)[:k or self.k]
+            results.append(self._resolve(fused, owner))
+        return results
+
+    def _resolve(self, fused: list[tuple[str, float]], owner: dict) -> list[tuple[Document, float]]:
+        """Documents for fused (id, score) hits, best first."""
+        groups = {}
+        for position, (chunk_id, _) in enumerate(fused):
+            groups.setdefault(id(owner[chunk_id]), (owner[chunk_id], []))[1].append(position)
+
+        hits = []
+        for db, positions in groups.values():
+            ids = [fused[p][0] for p in positions]
+            if self.coalesce and hasattr(db.docstore, "search_merged"):
+                found = [(doc, [positions[i] for i in members]) for doc, members in db.docstore.search_merged(ids)]
+            else:
+                found = [(db.docstore.search(chunk_id), [p]) for chunk_id, p in zip(ids, positions)]
+            dedup = getattr(db, "dedup_index", None)
+            for doc, members in found:
+                if not isinstance(doc, Document):
+                    continue
+                if dedup is not None:
+                    also_in = dedup.references([fused[p][0] for p in members])
+                    also_in = [source for source in also_in if source != doc.metadata.get("source")]
+                    if also_in:
+                        doc.metadata["also_in"] = also_in
+                hits.append((min(members), doc, fused[min(members)][1]))
+        return [(doc, score) for _, doc, score in sorted(hits, key=lambda hit: hit[0])]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        return [doc for doc, _ in self.search([query])[0]]
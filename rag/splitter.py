@@ -0,0 +1,201 @@
+# rag/splitter.py
+import io
+import os
+import re
+from typing import Iterable, Iterator
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+# Chunk metadata: heading path of the section the chunk starts in, e.g. "Redis > Memory full"
+HEADINGS_KEY = "headings"
+HEADING_SEPARATOR = " > "
+
+_MD_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_ADOC_HEADING = re.compile(r"^(={1,6})\s+(.+?)\s*$")
+# Case files and plain-text runbooks label their sections ("Summary:", "Resolution:")
+_TXT_HEADING = re.compile(r"^([A-Z][\w /()-]{0,40}):\s*$")
+_MD_FENCE = re.compile(r"^\s{0,3}(`{3,}|~{3,})")
+# AsciiDoc listing / literal / passthrough / example / sidebar blocks
+_ADOC_DELIMITER = re.compile(r"^(-{4,}|\.{4,}|\+{4,}|={4,}|\*{4,})\s*$")
+_MD_ITEM = re.compile(r"^\s*(\d+[.)]|[-*+])\s+\S")
+_ADOC_ITEM = re.compile(r"^\s*(\d+\.|\.{1,5}|\*{1,5}|-)\s+\S")
+
+
+class SOPSplitter:
+    """
+    Structure-aware splitter for Markdown, AsciiDoc and plain-text SOPs.
+
+    Works in one pass over the lines of a file, holding at most one chunk:
+    a heading starts a new chunk (unless the current one is still shorter
+    than `min_chunk`), and a full chunk is cut at the last block boundary
+    in it (heading, paragraph, list item / numbered step, code block), so
+    steps and code blocks stay whole whenever they fit in `chunk_size`.
+    Only a block longer than that is cut between lines, with up to
+    `chunk_overlap` characters of its last lines repeated in the next chunk.
+
+    Chunks are exact substrings of the file; their metadata gets the
+    `start_index` and the heading path (`headings`) they start under.
+    """
+
+    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 100, min_chunk: int | None = None):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.min_chunk = chunk_size // 5 if min_chunk is None else min_chunk
+        # For single lines longer than a chunk
+        self._line_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=[". ", " ", ""],
+            keep_separator="end", add_start_index=True,
+        )
+
+    # ------------------------------
+    # Entry points
+    # ------------------------------
+    def split_file(self, path: str, metadata: dict) -> Iterator[Document]:
+        """Stream the chunks of a file without reading it into memory."""
+        with open(path, "r", encoding="utf-8") as f:
+            yield from self.split_lines(f, metadata, _file_format(path))
+
+    def split_documents(self, docs: Iterable[Document]) -> list[Document]:
+        """Same interface as LangChain text splitters, for documents already in memory."""
+        return [
+            chunk
+            for doc in docs
+            for chunk in self.split_lines(
+                io.StringIO(doc.page_content), doc.metadata, _file_format(doc.metadata.get("source", ""))
+            )
+        ]
+
+    def split_text(self, text: str) -> list[str]:
+        return [chunk.page_content for chunk in self.split_lines(io.StringIO(text), {})]
+
+    # ------------------------------
+    # Streaming pass
+    # ------------------------------
+    def split_lines(self, lines: Iterable[str], metadata: dict, file_format: str = "md") -> Iterator[Document]:
+        """
+        Chunks of a file given as an iterable of lines (with their line endings).
+        Args:
+            lines: e.g. an open text file
+            metadata: copied into every chunk
+            file_format: "md", "adoc" or "txt" (which heading / block syntax to follow)
+        """
+        heading_re = {"adoc": _ADOC_HEADING, "txt": _TXT_HEADING}.get(file_format, _MD_HEADING)
+        item_re = _ADOC_ITEM if file_format == "adoc" else _MD_ITEM
+
+        # Lines of the chunk being filled: (offset in file, text, starts a block, heading path)
+        current: list[tuple[int, str, bool, str]] = []
+        size = 0
+        headings: list[tuple[int, str]] = []
+        path = ""
+        fence = None
+        after_blank = True
+        offset = 0
+
+        for line in lines:
+            stripped = line.strip()
+            starts_block = False
+            if fence is not None:
+                # Inside a code block: no boundaries until it closes
+                if stripped.startswith(fence) and not stripped[len(fence):].strip():
+                    fence = None
+            elif not stripped:
+                pass
+            else:
+                heading = heading_re.match(line) if file_format != "txt" or after_blank else None
+                if heading and file_format == "txt":
+                    level, title = 1, heading.group(1)
+                elif heading:
+                    level, title = len(heading.group(1)), heading.group(2)
+                if heading:
+                    while headings and headings[-1][0] >= level:
+                        headings.pop()
+                    headings.append((level, title))
+                    path = HEADING_SEPARATOR.join(title for _, title in headings)
+                    # A new section starts a new chunk, unless the current one is tiny
+                    if size >= self.min_chunk:
+                        yield from self._emit(current, metadata)
+                        current, size = [], 0
+                    starts_block = True
+                else:
+                    opened = _fence_opener(line, file_format)
+                    if opened:
+                        fence = opened
+                    starts_block = after_blank or bool(opened) or bool(item_re.match(line))
+            after_blank = not stripped and fence is None
+
+            if len(line) > self.chunk_size:
+                yield from self._emit(current, metadata)
+                current, size = [], 0
+                yield from self._split_long_line(line, offset, path, metadata)
+            else:
+                if starts_block and size + len(line) > self.chunk_size:
+                    yield from self._emit(current, metadata)
+                    current, size = [], 0
+                # The line continues a block: move the block into the next chunk with it
+                while current and size + len(line) > self.chunk_size:
+                    current, size = yield from self._cut(current, len(line), metadata)
+                current.append((offset, line, starts_block, path))
+                size += len(line)
+            offset += len(line)
+
+        yield from self._emit(current, metadata)
+
+    def _cut(self, current: list, incoming: int, metadata: dict):
+        """
+        Emit the full chunk up to its last block boundary, before a line of
+        `incoming` characters is added. Returns the lines (and their size)
+        carried into the next chunk.
+        """
+        for i in range(len(current) - 1, 0, -1):
+            if current[i][2]:
+                yield from self._emit(current[:i], metadata)
+                rest = current[i:]
+                return rest, sum(len(line) for _, line, _, _ in rest)
+
+        # One block fills the chunk: cut between its lines and repeat the last ones
+        yield from self._emit(current, metadata)
+        carried, carried_size = [], 0
+        for entry in reversed(current[1:]):
+            grown = carried_size + len(entry[1])
+            if grown > self.chunk_overlap or grown + incoming > self.chunk_size:
+                break
+            carried.insert(0, (entry[0], entry[1], False, entry[3]))
+            carried_size += len(entry[1])
+        return carried, carried_size
+
+    def _emit(self, current: list, metadata: dict) -> Iterator[Document]:
+        if not current:
+            return
+        text = "".join(line for _, line, _, _ in current)
+        content = text.strip()
+        if not content:
+            return
+        chunk_metadata = dict(metadata, start_index=current[0][0] + len(text) - len(text.lstrip()))
+        if current[0][3]:
+            chunk_metadata[HEADINGS_KEY] = current[0][3]
+        yield Document(page_content=content, metadata=chunk_metadata)
+
+    def _split_long_line(self, line: str, offset: int, path: str, metadata: dict) -> Iterator[Document]:
+        extra = {HEADINGS_KEY: path} if path else {}
+        for piece in self._line_splitter.create_documents([line]):
+            yield Document(
+                page_content=piece.page_content,
+                metadata=dict(metadata, start_index=offset + piece.metadata["start_index"], **extra),
+            )
+
+
+def _file_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".asciidoc", ".adoc"):
+        return "adoc"
+    return "txt" if ext == ".txt" else "md"
+
+
+def _fence_opener(line: str, file_format: str) -> str | None:
+    """The closing delimiter if the line opens a code / literal block."""
+    if file_format == "adoc":
+        match = _ADOC_DELIMITER.match(line)
+        return match.group(1) if match else None
+    match = _MD_FENCE.match(line)
+    return match.group(1) if match else None
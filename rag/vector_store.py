@@ -0,0 +1,623 @@
+# rag/vector_store.py
+import hashlib
+import json
+import os
+import shutil
+import time
+import threading
+import uuid
+from contextlib import contextmanager
+
+import faiss
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.embeddings import FastEmbedEmbeddings
+from langchain_community.vectorstores import FAISS
+
+from rag.ann_index import configure_search, describe_index, get_index_settings, index_signature
+from rag.chunk_store import delete_chunks
+from rag.compact_docstore import CompactDocstore
+from rag.dedup import NearDuplicateIndex, dedup_index
+from rag.embedding_cache import CachedEmbeddings
+from rag.exact_vectors import ExactVectors
+from rag.file_lock import file_lock, fsync_dir, write_file_atomic
+from rag.ingest import format_stats, run_ingest_pipeline
+from rag.lexical_index import BM25Index, lexical_index
+from rag.splitter import SOPSplitter
+from utils.config_loader import repo_changes
+from utils.loaders import DEFAULT_IGNORE, DEFAULT_WORKERS, is_sop_file, list_sop_files
+
+MANIFEST_VERSION = 3
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+INDEX_FILE = "index.faiss"
+INDEX_IDS_FILE = "index_ids.npy"
+SNAPSHOTS_DIR = "snapshots"
+LOCK_FILE = "LOCK"
+KEEP_SNAPSHOTS = 2
+
+# Writers of this process; other processes are kept out by flock in writer_lock
+_write_lock = threading.RLock()
+
+DEFAULT_SETTINGS = {
+    "path": "./data/index",
+    "embedding_model": "BAAI/bge-small-en-v1.5",
+    "chunk_size": 500,
+    "chunk_overlap": 100,
+    "splitter": "structure",
+    "stream_split_mb": 4,
+    "load_workers": DEFAULT_WORKERS,
+    "embed_batch_size": 256,
+    "embed_threads": None,
+    "embed_parallel": None,
+    "pipeline_queue": 4,
+    "embedding_cache": "./data/embedding-cache",
+    "embedding_cache_max_entries": 200_000,
+    "ignore": list(DEFAULT_IGNORE),
+    "partition_memory_mb": 2048,
+    "dedup_threshold": 0.9,
+    "ingest_batch_window": 2.0,
+    "ingest_max_batch": 64,
+    "ingest_retry_interval": 30,
+}
+
+
+def get_store_settings(config: dict) -> dict:
+    """Return the `vector_store` config section merged over the defaults."""
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update((config or {}).get("vector_store") or {})
+    settings["path"] = os.path.expanduser(settings["path"])
+    settings["index"] = get_index_settings(config)
+    return settings
+
+
+def get_embeddings(settings: dict):
+    """FastEmbed model for the configured settings, behind the on-disk embedding cache if enabled."""
+    embeddings = FastEmbedEmbeddings(
+        model_name=settings["embedding_model"],
+        batch_size=settings["embed_batch_size"],
+        threads=settings["embed_threads"],
+        parallel=settings["embed_parallel"],
+    )
+    if not settings.get("embedding_cache"):
+        return embeddings
+    return CachedEmbeddings(
+        embeddings,
+        settings["embedding_model"],
+        os.path.expanduser(settings["embedding_cache"]),
+        max_entries=settings["embedding_cache_max_entries"],
+    )
+
+
+def print_ingest_stats(stats: dict, embeddings):
+    print(format_stats(stats))
+    if isinstance(embeddings, CachedEmbeddings):
+        print(embeddings.format_stats())
+
+
+def pipeline_options(settings: dict) -> dict:
+    """Keyword arguments for run_ingest_pipeline from the vector store settings."""
+    return {
+        "batch_size": settings["embed_batch_size"],
+        "queue_size": settings["pipeline_queue"],
+        "load_workers": settings["load_workers"],
+        "index_settings": settings["index"],
+        "stream_min_bytes": int(settings["stream_split_mb"] * 1024 * 1024),
+    }
+
+
+def get_splitter(settings: dict) -> SOPSplitter | RecursiveCharacterTextSplitter:
+    """
+    The chunker for every SOP file: the structure-aware SOPSplitter, or with
+    `splitter: recursive` the plain character splitter used before it.
+    """
+    if settings["splitter"] == "structure":
+        return SOPSplitter(settings["chunk_size"], settings["chunk_overlap"])
+    # start_index lets the docstore store the overlap between chunks once
+    return RecursiveCharacterTextSplitter(
+        chunk_size=settings["chunk_size"],
+        chunk_overlap=settings["chunk_overlap"],
+        add_start_index=True,
+    )
+
+
+# ------------------------------
+# Manifest
+# ------------------------------
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def scan_manifest(
+    local_paths: dict,
+    settings: dict,
+    previous: dict | None = None,
+    changed_paths: dict | None = None,
+    commits: dict | None = None,
+) -> dict:
+    """
+    Describe the current state of the internal sources.
+    Files whose size and mtime match the previous manifest reuse its hash,
+    so only touched files are read.
+    Args:
+        local_paths: dict {source_name: local_path}
+        settings: vector store settings (see get_store_settings)
+        previous: last saved manifest, if any
+        changed_paths: {source_name: [paths]} for git-backed sources whose diff
+            against the indexed commit is known; those folders are not walked,
+            only the listed paths are re-checked
+        commits: {source_name: HEAD sha} to record as the indexed commits
+    Returns:
+        Manifest dict (files with content hash + chunker/embedding settings)
+    """
+    old_files = (previous or {}).get("files", {})
+    changed_paths = changed_paths or {}
+    files = {}
+
+    walk_paths = {name: path for name, path in local_paths.items() if name not in changed_paths}
+    candidates = list_sop_files(walk_paths, settings["ignore"])
+    for name, paths in changed_paths.items():
+        for path, old in old_files.items():
+            if old["source_type"] == name:
+                files[path] = dict(old)
+        for path in paths:
+            files.pop(path, None)
+            if os.path.isfile(path) and is_sop_file(os.path.relpath(path, local_paths[name]), settings["ignore"]):
+                candidates[path] = name
+
+    for path, source_type in candidates.items():
+        stat = os.stat(path)
+        old = old_files.get(path)
+        if old and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime:
+            sha = old["sha256"]
+        else:
+            sha = file_sha256(path)
+        files[path] = {
+            "sha256": sha,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "source_type": source_type,
+        }
+
+    return {
+        "version": MANIFEST_VERSION,
+        "embedding_model": settings["embedding_model"],
+        "chunk_size": settings["chunk_size"],
+        "chunk_overlap": settings["chunk_overlap"],
+        "splitter": settings["splitter"],
+        "dedup_threshold": settings["dedup_threshold"] or 0,
+        "index": index_signature(settings["index"]),
+        "commits": commits or {},
+        "files": files,
+    }
+
+
+def sources_fingerprint(local_paths: dict, settings: dict) -> str:
+    """
+    Cheap fingerprint of the internal sources (paths, sizes, mtimes).
+    Only stats files, so it is fast enough to call on every UI rerun.
+    """
+    h = hashlib.sha256()
+    for path, source_type in list_sop_files(local_paths, settings["ignore"]).items():
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        h.update(f"{path}|{source_type}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def settings_match(stored: dict | None, current: dict) -> bool:
+    """True if a stored snapshot was built with the current manifest format and index settings."""
+    if not stored:
+        return False
+    # Snapshots from before index types were configurable are flat
+    if stored.get("index", {"type": "flat"}) != current.get("index"):
+        return False
+    # Snapshots from before deduplication hold every near-duplicate chunk
+    if stored.get("dedup_threshold", 0) != current.get("dedup_threshold", 0):
+        return False
+    if stored.get("splitter", "recursive") != current.get("splitter"):
+        return False
+    return all(
+        stored.get(key) == current.get(key)
+        for key in ("version", "embedding_model", "chunk_size", "chunk_overlap")
+    )
+
+
+def diff_manifests(stored: dict, current: dict) -> tuple[list, list, list]:
+    """
+    Compare file entries of two manifests.
+    Returns:
+        (added, modified, removed) lists of file paths
+    """
+    old_files = stored.get("files", {})
+    new_files = current["files"]
+    added = [p for p in new_files if p not in old_files]
+    removed = [p for p in old_files if p not in new_files]
+    modified = [
+        p for p, f in new_files.items()
+        if p in old_files and (
+            old_files[p]["sha256"] != f["sha256"] or old_files[p]["source_type"] != f["source_type"]
+        )
+    ]
+    return added, modified, removed
+
+
+# ------------------------------
+# Snapshot store
+# ------------------------------
+def current_snapshot_dir(store_path: str) -> str | None:
+    """Return the directory of the published snapshot, or None if there is none."""
+    try:
+        with open(os.path.join(store_path, CURRENT_FILE)) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    snapshot_dir = os.path.join(store_path, SNAPSHOTS_DIR, name)
+    return snapshot_dir if name and os.path.isdir(snapshot_dir) else None
+
+
+def read_manifest(store_path: str) -> dict | None:
+    snapshot_dir = current_snapshot_dir(store_path)
+    if not snapshot_dir:
+        return None
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_snapshot(db: FAISS, manifest: dict, store_path: str) -> str:
+    """
+    Persist the index, docstore and manifest as a new snapshot.
+    The snapshot is fully written and fsynced under a temporary name, renamed
+    into place, and only then published by atomically replacing CURRENT.
+    A crash at any point leaves the previous snapshot untouched.
+    Returns:
+        Path of the new snapshot directory.
+    """
+    snapshots = os.path.join(store_path, SNAPSHOTS_DIR)
+    os.makedirs(snapshots, exist_ok=True)
+
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    tmp_dir = os.path.join(snapshots, f".tmp-{name}")
+    os.makedirs(tmp_dir)
+    order = [db.index_to_docstore_id[i] for i in range(db.index.ntotal)]
+    faiss.write_index(db.index, os.path.join(tmp_dir, INDEX_FILE))
+    np.save(os.path.join(tmp_dir, INDEX_IDS_FILE), np.array([i.encode("utf-8") for i in order], dtype="S"))
+    db.docstore.write(tmp_dir)
+    lexical_index(db).save(tmp_dir)
+    dedup = getattr(db, "dedup_index", None)
+    if dedup is not None:
+        dedup.save(tmp_dir)
+    exact = getattr(db, "exact_vectors", None)
+    if exact is not None:
+        exact.write(tmp_dir, order)
+    manifest = dict(manifest, created_at=time.time())
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f)
+
+    for root, _, filenames in os.walk(tmp_dir):
+        for filename in filenames:
+            with open(os.path.join(root, filename), "rb") as f:
+                os.fsync(f.fileno())
+        fsync_dir(root)
+
+    snapshot_dir = os.path.join(snapshots, name)
+    os.rename(tmp_dir, snapshot_dir)
+    fsync_dir(snapshots)
+    write_file_atomic(os.path.join(store_path, CURRENT_FILE), name)
+    # Serve the saved text and vectors from the new snapshot's files from now on
+    db.docstore.attach(snapshot_dir)
+    if exact is not None:
+        exact.attach(snapshot_dir, order)
+
+    _prune_snapshots(store_path, keep=name)
+    return snapshot_dir
+
+
+def _prune_snapshots(store_path: str, keep: str):
+    """Drop leftovers of interrupted saves and all but the newest snapshots."""
+    snapshots = os.path.join(store_path, SNAPSHOTS_DIR)
+    names = sorted(os.listdir(snapshots))
+    older = [n for n in names if not n.startswith(".") and n != keep]
+    stale = older[:max(len(older) - (KEEP_SNAPSHOTS - 1), 0)]
+    # A .tmp- dir younger than an hour may belong to a save still in progress
+    cutoff = time.time() - 3600
+    stale += [
+        n for n in names
+        if n.startswith(".tmp-") and os.path.getmtime(os.path.join(snapshots, n)) < cutoff
+    ]
+    for n in stale:
+        shutil.rmtree(os.path.join(snapshots, n), ignore_errors=True)
+
+
+def open_snapshot(snapshot_dir: str, embeddings, index_settings: dict | None = None, mmap: bool = False) -> FAISS:
+    """
+    Open a saved snapshot.
+    Args:
+        snapshot_dir: snapshot directory
+        embeddings: query/document embeddings for the store
+        index_settings: applies search-time parameters (see rag.ann_index)
+        mmap: memory-map the FAISS index read-only, for serving. Such an index
+            must never be modified; writers open their own copy with mmap=False.
+    """
+    docstore = CompactDocstore.load(snapshot_dir)
+    if docstore is not None:
+        index = _read_index(os.path.join(snapshot_dir, INDEX_FILE), mmap)
+        order = [i.decode("utf-8") for i in np.load(os.path.join(snapshot_dir, INDEX_IDS_FILE))]
+        db = FAISS(embeddings, index, docstore, dict(enumerate(order)))
+    else:
+        # Snapshots from before the compact docstore: a pickled InMemoryDocstore.
+        # They are written by us on our own volume, so unpickling them is safe.
+        db = FAISS.load_local(snapshot_dir, embeddings, allow_dangerous_deserialization=True)
+        db.docstore = CompactDocstore.from_documents(db.docstore._dict)
+        order = [db.index_to_docstore_id[i] for i in range(db.index.ntotal)]
+    db.exact_vectors = ExactVectors.load(snapshot_dir, order, db.index.d)
+    if index_settings:
+        configure_search(db.index, index_settings)
+        if db.exact_vectors is not None:
+            db.exact_vectors.configure(index_settings["quantization"])
+    # Snapshots saved before the lexical index existed get it rebuilt on first use
+    db.lexical_index = BM25Index.load(snapshot_dir)
+    db.dedup_index = NearDuplicateIndex.load(snapshot_dir)
+    return db
+
+
+def _read_index(path: str, mmap: bool) -> faiss.Index:
+    if mmap:
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+        except (AttributeError, RuntimeError):
+            pass  # faiss build or index type without mmap support
+    return faiss.read_index(path)
+
+
+def load_snapshot(store_path: str, embeddings, index_settings: dict | None = None, mmap: bool = False) -> FAISS | None:
+    """Open the current snapshot of the store (see open_snapshot), or None if there is none."""
+    snapshot_dir = current_snapshot_dir(store_path)
+    if not snapshot_dir:
+        return None
+    return open_snapshot(snapshot_dir, embeddings, index_settings, mmap)
+
+
+@contextmanager
+def writer_lock(store_path: str):
+    """
+    Serialize snapshot writers: threads of this process, and other processes
+    sharing the store (flock on LOCK). Readers never take it.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    with file_lock(os.path.join(store_path, LOCK_FILE), _write_lock):
+        yield
+
+
+class LiveIndex:
+    """
+    The published snapshot this process answers queries from.
+
+    Snapshots are opened read-only and memory-mapped, so every process on a
+    node serving the same store shares the page cache. refresh() picks up a
+    snapshot published by any writer and switches to it with one assignment;
+    a query that already holds the previous `db` finishes on it.
+    """
+
+    def __init__(self, store_path: str, embeddings, index_settings: dict | None = None):
+        self.store_path = store_path
+        self.embeddings = embeddings
+        self.index_settings = index_settings
+        self._current: tuple[str | None, FAISS | None] = (None, None)
+        self._lock = threading.Lock()
+
+    @property
+    def db(self) -> FAISS | None:
+        return self._current[1]
+
+    @property
+    def snapshot(self) -> str | None:
+        return self._current[0]
+
+    def current(self) -> tuple[str | None, FAISS | None]:
+        """Refresh, then return (snapshot name, db) as one consistent pair."""
+        self.refresh()
+        return self._current
+
+    def serve(self, db: FAISS):
+        """Serve an index that could not be published (kept until a snapshot appears)."""
+        self._current = (None, db)
+
+    def close(self) -> bool:
+        """
+        Drop the open snapshot (it is reopened by the next current()); queries
+        still holding its `db` finish on it. An index served from memory is kept,
+        as it could not be reopened. Returns True if it was dropped.
+        """
+        with self._lock:
+            if self.snapshot is None:
+                return False
+            self._current = (None, None)
+        return True
+
+    def footprint(self) -> int:
+        """Bytes of the open snapshot's files: roughly what it occupies once its pages are hot."""
+        if self.snapshot is None:
+            return 0
+        total = 0
+        for dirpath, _, names in os.walk(os.path.join(self.store_path, SNAPSHOTS_DIR, self.snapshot)):
+            total += sum(os.path.getsize(os.path.join(dirpath, name)) for name in names)
+        return total
+
+    def refresh(self) -> bool:
+        """Switch to the published snapshot if it changed. Returns True on a switch."""
+        try:
+            with open(os.path.join(self.store_path, CURRENT_FILE)) as f:
+                name = f.read().strip()
+        except OSError:
+            return False
+        if not name or name == self.snapshot:
+            return False
+
+        with self._lock:
+            if name == self.snapshot:
+                return False
+            try:
+                db = open_snapshot(
+                    os.path.join(self.store_path, SNAPSHOTS_DIR, name),
+                    self.embeddings, self.index_settings, mmap=True,
+                )
+            except Exception as e:
+                # e.g. pruned while we were opening it; keep serving the old one
+                print(f"⚠️ Could not open index snapshot {name}: {e}")
+                return False
+            self._current = (name, db)
+        return True
+
+
+# ------------------------------
+# Building and updating the index
+# ------------------------------
+def build_index(manifest: dict, settings: dict, embeddings=None) -> FAISS | None:
+    """Load, split and embed every file in the manifest into a new FAISS index."""
+    embeddings = embeddings or get_embeddings(settings)
+    print(f"🧠 Creating vector database from {len(manifest['files'])} SOP files...")
+    db, stats = run_ingest_pipeline(
+        list(manifest["files"]), manifest, get_splitter(settings),
+        embeddings, dedup=new_dedup_index(settings), **pipeline_options(settings),
+    )
+    print_ingest_stats(stats, embeddings)
+    return db
+
+
+def new_dedup_index(settings: dict) -> NearDuplicateIndex | None:
+    """Near-duplicate index for a new store, or None if `dedup_threshold` is 0."""
+    return NearDuplicateIndex(settings["dedup_threshold"]) if settings["dedup_threshold"] else None
+
+
+def update_index(db: FAISS, stored: dict, manifest: dict, settings: dict) -> dict:
+    """
+    Bring a loaded index in line with the current manifest.
+    Chunks of removed and modified files are deleted by ID, and only added
+    and modified files are split and embedded again, along with unchanged
+    files that referenced one of the deleted chunks as a near-duplicate.
+    Returns:
+        dict with the added / modified / removed file paths
+    """
+    added, modified, removed = diff_manifests(stored, manifest)
+
+    # Files sharing a chunk of a changed file lose it with that file (and so on)
+    resplit = []
+    owned = {i for path in modified + removed for i in stored["files"][path].get("chunk_ids", [])}
+    while owned:
+        more = [
+            path for path in manifest["files"]
+            if path not in added and path not in modified and path not in resplit
+            and owned.intersection(stored["files"][path].get("shared_ids", []))
+        ]
+        resplit += more
+        owned = {i for path in more for i in stored["files"][path].get("chunk_ids", [])}
+
+    # Unchanged files keep their chunk IDs
+    for path, entry in manifest["files"].items():
+        if path not in added and path not in modified and path not in resplit:
+            entry["chunk_ids"] = stored["files"][path].get("chunk_ids", [])
+            entry["shared_ids"] = stored["files"][path].get("shared_ids", [])
+
+    stale_ids = [
+        chunk_id
+        for path in modified + removed + resplit
+        for chunk_id in stored["files"][path].get("chunk_ids", [])
+    ]
+    known_ids = set(db.index_to_docstore_id.values())
+    stale_ids = [i for i in stale_ids if i in known_ids]
+    if stale_ids:
+        delete_chunks(db, stale_ids)
+    dedup = dedup_index(db, settings["dedup_threshold"])
+    if dedup is not None:
+        dedup.drop_refs(modified + removed + resplit)
+
+    if added or modified or resplit:
+        _, stats = run_ingest_pipeline(
+            added + modified + resplit, manifest, get_splitter(settings),
+            db.embeddings, db=db, dedup=dedup, **pipeline_options(settings),
+        )
+        print_ingest_stats(stats, db.embeddings)
+
+    return {"added": added, "modified": modified, "removed": removed}
+
+
+def load_or_build_index(local_paths: dict, config: dict, embeddings=None, open_index: bool = True) -> LiveIndex | None:
+    """
+    Return the live index for the internal sources.
+    If the published snapshot is up to date it is just opened (memory-mapped),
+    which takes about a second. Otherwise, under the writer lock, the files
+    that changed since it was saved are re-embedded, or everything is when
+    there is no usable snapshot or the chunking/embedding settings changed,
+    and a new snapshot is published. Other processes starting at the same
+    time wait for that and then open it.
+    Args:
+        local_paths: dict {source_name: local_path}
+        config: full application config
+        embeddings: embedding model to share (loaded from the settings if None)
+        open_index: False to only bring the published snapshot up to date;
+            the LiveIndex opens it on first use
+    Returns:
+        LiveIndex, or None if there are no SOP documents.
+    """
+    settings = get_store_settings(config)
+    store_path = settings["path"]
+    embeddings = embeddings or get_embeddings(settings)
+    live = LiveIndex(store_path, embeddings, settings["index"])
+
+    with writer_lock(store_path):
+        stored = read_manifest(store_path)
+        commits, changed_paths = repo_changes(config.get("internal_sources", []), local_paths, stored)
+        manifest = scan_manifest(local_paths, settings, stored, changed_paths, commits)
+        if not manifest["files"]:
+            return None
+
+        db = None
+        if settings_match(stored, manifest):
+            if not any(diff_manifests(stored, manifest)) and manifest["commits"] == stored.get("commits", {}):
+                if not open_index and current_snapshot_dir(store_path):
+                    return live
+                if live.refresh():
+                    print(f"💾 Opened {describe_index(live.db.index)} index snapshot "
+                          f"({len(stored['files'])} files) from {store_path}")
+                    return live
+            try:
+                db = load_snapshot(store_path, embeddings, settings["index"])
+            except Exception as e:
+                print(f"⚠️ Could not load index snapshot, rebuilding: {e}")
+        elif stored:
+            print("🔄 Index settings changed, rebuilding index...")
+
+        if db is not None:
+            print(f"💾 Loaded {describe_index(db.index)} index snapshot ({len(stored['files'])} files) from {store_path}")
+            changes = update_index(db, stored, manifest, settings)
+            print(
+                f"🔄 Re-indexed {len(changes['added'])} added, {len(changes['modified'])} modified, "
+                f"{len(changes['removed'])} removed files"
+            )
+        else:
+            db = build_index(manifest, settings, embeddings)
+            if db is None:
+                return None
+
+        try:
+            save_snapshot(db, manifest, store_path)
+            print(f"💾 Index snapshot saved to {store_path}")
+        except OSError as e:
+            print(f"⚠️ Could not save index snapshot, serving it from memory: {e}")
+            live.serve(db)
+            return live
+
+    # Serve the published snapshot memory-mapped; the private copy built above is dropped
+    if open_index:
+        live.refresh()
+    return live
@@ -0,0 +1,53 @@
+# tests/test_ann_index.py
+import uuid
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag.ann_index import get_index_settings, new_store, search_ids
+from rag.chunk_store import add_chunks, delete_chunks
+
+DIM = 32
+
+INDEX_CONFIGS = {
+    "flat": {"type": "flat"},
+    "flat-sq8": {"type": "flat", "quantization": {"type": "sq8"}},
+    "flat-pq": {"type": "flat", "quantization": {"type": "pq", "pq_m": 8}},
+    "hnsw": {"type": "hnsw", "hnsw": {"m": 8, "ef_construction": 40}},
+    "hnsw-sq8": {"type": "hnsw", "hnsw": {"m": 8, "ef_construction": 40}, "quantization": {"type": "sq8"}},
+    "ivfpq": {"type": "ivfpq", "ivfpq": {"nlist": 16, "m": 8, "nprobe": 16}},
+}
+
+
+def _build(index_config: dict, vectors: np.ndarray):
+    settings = get_index_settings({"index": index_config})
+    db = new_store(DeterministicFakeEmbedding(size=DIM), settings, DIM, vectors)
+    ids = [uuid.uuid4().hex for _ in vectors]
+    add_chunks(db, [f"chunk {i}" for i in range(len(ids))], vectors, [{} for _ in ids], ids)
+    return db, ids
+
+
+@pytest.mark.parametrize("name", INDEX_CONFIGS)
+def test_search_after_delete(name):
+    rng = np.random.default_rng(0)
+    vectors = rng.random((2000, DIM), dtype=np.float32)
+    db, ids = _build(INDEX_CONFIGS[name], vectors)
+
+    delete_chunks(db, ids[:1000])
+    kept = set(ids[1000:])
+    assert db.index.ntotal == len(db.index_to_docstore_id) == 1000
+
+    for row in (1000, 1500, 1999):
+        hits = search_ids(db, vectors[row:row + 1], 10)
+        assert len(hits) == 10
+        assert set(hits) <= kept
+        assert ids[row] in hits
+
+    # Positions of vectors added after a delete must not collide with remaining ones
+    new_vectors = rng.random((100, DIM), dtype=np.float32)
+    new_ids = [uuid.uuid4().hex for _ in new_vectors]
+    add_chunks(db, ["new"] * 100, new_vectors, [{} for _ in new_ids], new_ids)
+    assert db.index.ntotal == len(db.index_to_docstore_id) == 1100
+    assert new_ids[0] in search_ids(db, new_vectors[:1], 10)
+    assert ids[1500] in search_ids(db, vectors[1500:1501], 10)
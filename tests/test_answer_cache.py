@@ -0,0 +1,96 @@
+# tests/test_answer_cache.py
+import time
+
+from langchain_core.embeddings import Embeddings
+
+from rag.answer_cache import SemanticAnswerCache
+
+
+class WordEmbeddings(Embeddings):
+    """Bag of words over a fixed vocabulary, so similar questions get similar vectors."""
+
+    VOCAB = ["redis", "memory", "full", "kafka", "lag", "restart", "how", "to", "fix", "the"]
+
+    def embed_query(self, text: str) -> list[float]:
+        words = text.lower().split()
+        return [float(words.count(w)) for w in self.VOCAB]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(t) for t in texts]
+
+
+def _cache(**kwargs) -> SemanticAnswerCache:
+    return SemanticAnswerCache(WordEmbeddings(), **dict({"threshold": 0.9}, **kwargs))
+
+
+def _answer(text: str) -> dict:
+    return {"result": text, "sources": [{"source": "redis.md", "type": "internal"}], "warnings": []}
+
+
+def test_similar_query_hits_and_different_query_misses():
+    cache = _cache()
+    _, vector = cache.lookup("how to fix redis memory full", ("rag", None), "v1")
+    cache.store(vector, ("rag", None), "v1", _answer("raise maxmemory"))
+
+    hit, _ = cache.lookup("how to fix the redis memory full", ("rag", None), "v1")
+    assert hit["result"] == "raise maxmemory"
+    miss, _ = cache.lookup("kafka lag", ("rag", None), "v1")
+    assert miss is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_threshold():
+    query = "how to fix redis memory full"
+    near = "how to fix redis memory full restart"
+    cache = _cache()
+    vector = cache._embed(query)
+    similarity = float(vector @ cache._embed(near))
+    assert similarity < 0.95
+
+    strict, loose = _cache(threshold=similarity + 0.01), _cache(threshold=similarity - 0.01)
+    for c in (strict, loose):
+        c.store(vector, ("rag", None), "v1", _answer("a"))
+    assert strict.lookup(near, ("rag", None), "v1")[0] is None
+    assert loose.lookup(near, ("rag", None), "v1")[0] is not None
+
+
+def test_partitioned_by_mode_and_engine():
+    cache = _cache()
+    _, vector = cache.lookup("redis memory full", ("hybrid", "gemini"), "v1")
+    cache.store(vector, ("hybrid", "gemini"), "v1", _answer("gemini answer"))
+
+    assert cache.lookup("redis memory full", ("hybrid", "serpapi"), "v1")[0] is None
+    assert cache.lookup("redis memory full", ("rag", None), "v1")[0] is None
+    assert cache.lookup("redis memory full", ("hybrid", "gemini"), "v1")[0]["result"] == "gemini answer"
+
+
+def test_new_index_version_clears():
+    cache = _cache()
+    _, vector = cache.lookup("redis memory full", ("rag", None), "v1")
+    cache.store(vector, ("rag", None), "v1", _answer("old"))
+
+    assert cache.lookup("redis memory full", ("rag", None), "v2")[0] is None
+    assert cache.stats()["entries"] == 0
+    # Going back to the old version does not bring the entry back
+    assert cache.lookup("redis memory full", ("rag", None), "v1")[0] is None
+
+
+def test_ttl_expires(monkeypatch):
+    cache = _cache(ttl=10)
+    _, vector = cache.lookup("redis memory full", ("rag", None), "v1")
+    cache.store(vector, ("rag", None), "v1", _answer("a"))
+    now = time.time()
+    monkeypatch.setattr("rag.answer_cache.time.time", lambda: now + 11)
+    assert cache.lookup("redis memory full", ("rag", None), "v1")[0] is None
+
+
+def test_lookup_returns_a_copy():
+    cache = _cache()
+    _, vector = cache.lookup("redis memory full", ("rag", None), "v1")
+    cache.store(vector, ("rag", None), "v1", _answer("a"))
+
+    hit, _ = cache.lookup("redis memory full", ("rag", None), "v1")
+    hit["warnings"].append("changed by a caller")
+    hit["sources"].clear()
+    again, _ = cache.lookup("redis memory full", ("rag", None), "v1")
+    assert again["warnings"] == [] and again["sources"] == [{"source": "redis.md", "type": "internal"}]
@@ -0,0 +1,89 @@
+# tests/test_compact_docstore.py
+from langchain_core.documents import Document
+
+from rag.compact_docstore import CompactDocstore
+
+TEXT_A = "Restart the redis pod. Check memory usage. Flush the cache if it is full."
+TEXT_B = "Kafka consumer lag grows. Scale the consumers. Watch the lag dashboard."
+
+
+def _chunks(source: str, text: str, size: int = 30, overlap: int = 10, skip=()) -> dict[str, Document]:
+    """Fixed-size overlapping chunks with the metadata the ingest pipeline sets."""
+    chunks = {}
+    for chunk_no, start in enumerate(range(0, len(text) - overlap, size - overlap)):
+        if chunk_no not in skip:
+            chunks[f"{source}-{chunk_no}"] = Document(
+                page_content=text[start:start + size],
+                metadata={"source": source, "start_index": start, "chunk_no": chunk_no, "headings": "Runbook"},
+            )
+    return chunks
+
+
+def _assert_round_trip(docstore: CompactDocstore, chunks: dict[str, Document]):
+    for chunk_id, doc in chunks.items():
+        found = docstore.search(chunk_id)
+        assert found.page_content == doc.page_content
+        assert found.metadata == {"source": doc.metadata["source"], "headings": "Runbook"}
+
+
+def test_add_stores_overlap_once():
+    chunks = _chunks("a.md", TEXT_A)
+    docstore = CompactDocstore.from_documents(chunks)
+    _assert_round_trip(docstore, chunks)
+    assert len(docstore) == len(chunks)
+    assert len(docstore._buffer) == len(TEXT_A)
+
+
+def test_interleaved_files_keep_their_text():
+    a, b = _chunks("a.md", TEXT_A), _chunks("b.md", TEXT_B)
+    docstore = CompactDocstore()
+    for (a_id, a_doc), (b_id, b_doc) in zip(a.items(), b.items()):
+        docstore.add({a_id: a_doc})
+        docstore.add({b_id: b_doc})
+    _assert_round_trip(docstore, a | b)
+
+
+def test_write_attach_round_trip(tmp_path):
+    a, b = _chunks("a.md", TEXT_A), _chunks("b.md", TEXT_B)
+    docstore = CompactDocstore.from_documents(a | b)
+    docstore.delete(["a.md-1"])
+    docstore.write(str(tmp_path / "v1"))
+
+    loaded = CompactDocstore.load(str(tmp_path / "v1"))
+    del a["a.md-1"]
+    _assert_round_trip(loaded, a | b)
+    assert loaded.search("a.md-1") == "ID a.md-1 not found."
+
+    # Chunks added after loading go to the overlay and survive the next save
+    # (a new snapshot directory, as save_snapshot does: the old blob is still mapped)
+    extra = {"c.md-0": Document(page_content="Rotate the certificate.", metadata={"source": "c.md", "headings": "Runbook"})}
+    loaded.add(extra)
+    loaded.write(str(tmp_path / "v2"))
+    loaded.attach(str(tmp_path / "v2"))
+    _assert_round_trip(loaded, a | b | extra)
+
+
+def test_search_merged_joins_overlapping_chunks():
+    a, b = _chunks("a.md", TEXT_A), _chunks("b.md", TEXT_B)
+    docstore = CompactDocstore.from_documents(a | b)
+
+    merged = docstore.search_merged(["a.md-1", "b.md-0", "a.md-0", "missing"])
+    assert [(doc.page_content, positions) for doc, positions in merged] == [
+        (TEXT_A[:50], [0, 2]),
+        (TEXT_B[:30], [1]),
+    ]
+    assert merged[0][0].id == "a.md-1"
+
+
+def test_gap_keeps_non_consecutive_chunks_apart(tmp_path):
+    # Chunk 1 was dropped (e.g. a near-duplicate): chunks 0 and 2 share no text
+    # and must not be joined into one passage
+    chunks = _chunks("a.md", TEXT_A, skip={1})
+    docstore = CompactDocstore.from_documents(chunks)
+    _assert_round_trip(docstore, chunks)
+    assert len(docstore.search_merged(["a.md-0", "a.md-2"])) == 2
+
+    docstore.write(str(tmp_path))
+    loaded = CompactDocstore.load(str(tmp_path))
+    _assert_round_trip(loaded, chunks)
+    assert len(loaded.search_merged(["a.md-0", "a.md-2"])) == 2
@@ -0,0 +1,68 @@
+# tests/test_embedding_cache.py
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Fake model that records which texts it was asked to embed."""
+
+    embedded: list = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+def _cache(tmp_path, max_entries: int = 100) -> CachedEmbeddings:
+    return CachedEmbeddings(CountingEmbeddings(size=8, embedded=[]), "fake", str(tmp_path), max_entries=max_entries)
+
+
+def test_hits_survive_reopening(tmp_path):
+    cache = _cache(tmp_path)
+    first = cache.embed_documents(["restart redis", "kafka lag", "restart redis"])
+    assert cache.base.embedded == ["restart redis", "kafka lag"]
+
+    reopened = _cache(tmp_path)
+    # Stored as float32
+    assert np.allclose(reopened.embed_documents(["kafka lag", "restart redis"]), [first[1], first[0]])
+    assert reopened.base.embedded == []
+    assert reopened.stats()["hits"] == 2
+
+
+def test_evictions_count_replaced_entries(tmp_path):
+    cache = _cache(tmp_path, max_entries=2)
+    cache.embed_documents(["a", "b"])
+    cache.embed_documents(["c"])
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 2
+
+    # More new texts than slots: only the last `capacity` are stored
+    cache.embed_documents(["d", "e", "f"])
+    assert cache.stats()["evictions"] == 3
+    assert cache.stats()["entries"] == 2
+
+
+def test_writers_sharing_a_cache_keep_each_others_entries(tmp_path):
+    # Both opened before the cache exists, as two ingest processes would be
+    a, b = _cache(tmp_path), _cache(tmp_path)
+    a.embed_documents(["from a"])
+    b.embed_documents(["from b"])
+    # `a` still lists b's slot as free
+    a.embed_documents(["more from a"])
+
+    fresh = _cache(tmp_path)
+    fresh.embed_documents(["from a", "from b", "more from a"])
+    assert fresh.base.embedded == []
+
+
+def test_slot_reused_by_another_writer_is_a_miss(tmp_path):
+    a = _cache(tmp_path, max_entries=1)
+    x = a.embed_documents(["x"])
+    b = _cache(tmp_path, max_entries=1)
+    b.embed_documents(["y"])
+
+    # a's in-memory index still points "x" at the slot that now holds "y"
+    assert np.allclose(a.embed_documents(["x"]), x)
+    assert a.base.embedded == ["x", "x"]
@@ -0,0 +1,162 @@
+# tests/test_engines.py
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from engines import EngineError, GeminiEngine, OllamaEngine
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Local HTTP server answering with a scripted list of (status, headers, delay)
+    responses, the last one repeated; counts requests and the most in flight.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, responses: list[tuple[int, dict, float]]):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.responses = responses
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with server.lock:
+            status, headers, delay = server.responses[min(server.requests, len(server.responses) - 1)]
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if self.path == "/api/generate":
+                self._ollama_stream(delay)
+                return
+            time.sleep(delay)
+            body = json.dumps({"result": "ok"}).encode()
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _ollama_stream(self, delay: float):
+        # Ollama's NDJSON stream, one token every `delay` seconds
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for i in range(20):
+                time.sleep(delay)
+                line = {"model": "stub", "created_at": "2024-01-01T00:00:00Z", "response": f"t{i} ", "done": False}
+                self.wfile.write(json.dumps(line).encode() + b"\n")
+                self.wfile.flush()
+            self.wfile.write(json.dumps({"model": "stub", "response": "", "done": True}).encode() + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(*responses):
+        server = StubServer(list(responses))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _engine(server: StubServer, **settings) -> GeminiEngine:
+    settings = dict({"timeout": 5, "deadline": 10, "max_retries": 2, "backoff": 0.01}, **settings)
+    return GeminiEngine(api_key="test", url=server.url, **settings)
+
+
+def test_retries_503_then_succeeds(stub):
+    server = stub((503, {}, 0), (200, {}, 0))
+    assert _engine(server).generate("q") == "ok"
+    assert server.requests == 2
+
+
+def test_gives_up_after_max_retries(stub):
+    server = stub((503, {}, 0))
+    with pytest.raises(EngineError):
+        _engine(server, max_retries=2).generate("q")
+    assert server.requests == 3
+
+
+def test_client_error_is_not_retried(stub):
+    server = stub((400, {}, 0))
+    with pytest.raises(EngineError):
+        _engine(server).generate("q")
+    assert server.requests == 1
+
+
+def test_deadline_fires(stub):
+    server = stub((200, {}, 3))
+    started = time.monotonic()
+    with pytest.raises(EngineError):
+        _engine(server, deadline=0.5).generate("q")
+    assert time.monotonic() - started < 1.5
+
+
+def test_retry_after_is_honoured(stub):
+    server = stub((429, {"Retry-After": "1"}, 0), (200, {}, 0))
+    started = time.monotonic()
+    assert _engine(server).generate("q") == "ok"
+    assert time.monotonic() - started >= 1.0
+    assert server.requests == 2
+
+
+def test_concurrent_calls_capped_at_max_concurrency(stub):
+    server = stub((200, {}, 0.2))
+    engine = _engine(server, max_concurrency=2)
+
+    async def run():
+        return await asyncio.gather(*(engine.agenerate("q") for _ in range(6)))
+
+    assert asyncio.run(run()) == ["ok"] * 6
+    assert server.requests == 6
+    assert server.max_in_flight == 2
+
+
+def test_ollama_generate_stops_at_deadline(stub):
+    server = stub((200, {}, 0.2))
+    engine = OllamaEngine("ollama", model_name="stub", base_url=server.url, timeout=5, deadline=0.5, max_retries=0)
+    started = time.monotonic()
+    with pytest.raises(EngineError):
+        engine.generate("q")
+    assert time.monotonic() - started < 1.5
+
+
+def test_caller_deadline_ends_call_early(stub):
+    server = stub((200, {}, 3))
+    started = time.monotonic()
+    with pytest.raises(EngineError):
+        _engine(server, deadline=10).generate("q", deadline=started + 0.5)
+    assert time.monotonic() - started < 1.5
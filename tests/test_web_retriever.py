@@ -0,0 +1,128 @@
+# tests/test_web_retriever.py
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from hybrid_assistant import ExternalWebRetriever
+
+PAGE = (
+    "<html><body><article><h1>Redis memory</h1><p>"
+    + "When Redis runs out of memory, check the eviction policy and the maxmemory setting. " * 5
+    + "</p></article></body></html>"
+)
+HEADERS = {"ETag": '"v1"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"}
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Local HTTP server answering GETs with a scripted list of (status, headers)
+    responses, the last one repeated; records the headers of every request.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, responses: list[tuple[int, dict]]):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.responses = responses
+        self.requests: list[dict] = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/page"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            status, headers = server.responses[min(len(server.requests), len(server.responses) - 1)]
+            server.requests.append(dict(self.headers))
+        body = PAGE.encode() if status == 200 else b""
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(*responses):
+        server = StubServer(list(responses))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _retriever(tmp_path, cache_ttl: float = 0) -> ExternalWebRetriever:
+    return ExternalWebRetriever(timeout=2, cache_dir=str(tmp_path), cache_ttl=cache_ttl)
+
+
+def test_cached_text_is_used_within_ttl(stub, tmp_path):
+    server = stub((200, HEADERS))
+    retriever = _retriever(tmp_path, cache_ttl=3600)
+    text = retriever.fetch_text(server.url)
+    assert "eviction policy" in text
+    assert retriever.fetch_text(server.url) == text
+    assert len(server.requests) == 1
+
+
+def test_revalidates_with_conditional_get(stub, tmp_path):
+    server = stub((200, HEADERS), (304, {}))
+    retriever = _retriever(tmp_path)
+    text = retriever.fetch_text(server.url)
+    fetched_at = retriever._read_cache(server.url)["fetched_at"]
+
+    assert retriever.fetch_text(server.url) == text
+    assert server.requests[1]["If-None-Match"] == '"v1"'
+    assert server.requests[1]["If-Modified-Since"] == HEADERS["Last-Modified"]
+    # A 304 restarts the TTL
+    assert retriever._read_cache(server.url)["fetched_at"] > fetched_at
+
+
+def test_stale_copy_while_site_is_down(stub, tmp_path):
+    server = stub((200, HEADERS), (503, {}))
+    retriever = _retriever(tmp_path)
+    text = retriever.fetch_text(server.url)
+    assert retriever.fetch_text(server.url) == text
+
+    url = server.url
+    server.shutdown()
+    server.server_close()
+    assert retriever.fetch_text(url) == text
+
+
+def test_gone_page_drops_the_cached_copy(stub, tmp_path):
+    server = stub((200, HEADERS), (404, {}))
+    retriever = _retriever(tmp_path)
+    retriever.fetch_text(server.url)
+
+    with pytest.raises(requests.HTTPError):
+        retriever.fetch_text(server.url)
+    assert retriever._read_cache(server.url) is None
+
+
+def test_cache_entry_without_fetched_at_is_revalidated(stub, tmp_path):
+    server = stub((304, {}))
+    retriever = _retriever(tmp_path, cache_ttl=3600)
+    with open(retriever._cache_path(server.url), "w") as f:
+        json.dump({"url": server.url, "text": "old text", "etag": '"v1"'}, f)
+
+    assert retriever.fetch_text(server.url) == "old text"
+    assert server.requests[0]["If-None-Match"] == '"v1"'
@@ -1,7 +1,14 @@
 import os
 import subprocess
+import time
 import yaml
 
+# Named values accepted by the `sync:` key of repo-backed internal sources
+SYNC_INTERVALS = {"hourly": 3600, "daily": 86400}
+
+# source name -> time of the last fetch, so each repo is pulled at its own pace
+_last_pull = {}
+
 def load_config(path: str = "config.yaml") -> dict:
     """
     Load configuration from a YAML file.
@@ -14,11 +21,12 @@ def load_config(path: str = "config.yaml") -> dict:
         return yaml.safe_load(f)
 
 
-def setup_internal_sources(sources: list) -> dict:
+def setup_internal_sources(sources: list, interactive: bool = True) -> dict:
     """
     Prepare internal sources: create local folders or clone repos if provided.
     Args:
         sources: list of dicts with keys 'name', 'path', 'repo'
+        interactive: ask before cloning; when False (servers) clones are skipped
     Returns:
         dict {source_name: local_path}
     """
@@ -35,12 +43,21 @@ def setup_internal_sources(sources: list) -> dict:
         if repo:
             # Check if folder is empty (not cloned yet)
             if not os.listdir(path):
-                answer = input(f"Do you want to clone repo '{repo}' into '{path}'? (y/n): ").strip().lower()
+                answer = "n"
+                if interactive:
+                    answer = input(f"Do you want to clone repo '{repo}' into '{path}'? (y/n): ").strip().lower()
                 if answer == "y":
                     print(f"Cloning {repo} into {path} ...")
                     subprocess.run(["git", "clone", repo, path], check=True)
                 else:
                     print(f"Skipping clone of {repo}.")
+            elif parse_sync_interval(src.get("sync")):
+                try:
+                    head = pull_repo(path, src.get("branch"))
+                    _last_pull[name] = time.time()
+                    print(f"Repo folder '{path}' updated to {head[:12]}.")
+                except (subprocess.CalledProcessError, OSError) as e:
+                    print(f"⚠️ Could not update repo '{path}': {e}")
             else:
                 print(f"Repo folder '{path}' already exists, skipping clone.")
 
@@ -48,3 +65,101 @@ def setup_internal_sources(sources: list) -> dict:
 
     return local_paths
 
+
+def parse_sync_interval(value) -> int:
+    """Turn a `sync:` value ('hourly', 'daily', seconds) into seconds; 0 means no sync."""
+    if not value:
+        return 0
+    if isinstance(value, str) and value.lower() in SYNC_INTERVALS:
+        return SYNC_INTERVALS[value.lower()]
+    return int(value)
+
+
+def _git(path: str, *args) -> str:
+    result = subprocess.run(["git", "-C", path, *args], check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+def git_head(path: str) -> str | None:
+    """Return the HEAD commit SHA of a repo folder, or None if it is not a git repo."""
+    try:
+        return _git(path, "rev-parse", "HEAD")
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def pull_repo(path: str, branch: str = None) -> str:
+    """
+    Fetch and fast-forward a cloned repo.
+    Args:
+        path: local clone
+        branch: remote branch to follow (defaults to the clone's upstream)
+    Returns:
+        New HEAD commit SHA.
+    """
+    if branch:
+        _git(path, "fetch", "--quiet", "origin", branch)
+        _git(path, "merge", "--ff-only", "--quiet", "FETCH_HEAD")
+    else:
+        _git(path, "fetch", "--quiet")
+        _git(path, "merge", "--ff-only", "--quiet", "@{upstream}")
+    return git_head(path)
+
+
+def git_changed_paths(path: str, old_sha: str, new_sha: str) -> list | None:
+    """
+    Files changed between two commits of a repo folder (renames show up as delete + add).
+    Returns:
+        List of file paths under `path`, or None if the diff cannot be computed
+        (e.g. the old commit is gone after a force-push).
+    """
+    if old_sha == new_sha:
+        return []
+    try:
+        out = _git(path, "diff", "--name-only", "-z", "--no-renames", old_sha, new_sha)
+    except (subprocess.CalledProcessError, OSError):
+        return None
+    return [os.path.join(path, p) for p in out.split("\0") if p]
+
+
+def repo_changes(sources: list, local_paths: dict, stored: dict | None, pull: bool = False) -> tuple[dict, dict]:
+    """
+    Work out what changed in repo-backed internal sources since the last index.
+    Args:
+        sources: `internal_sources` from config.yaml
+        local_paths: dict {source_name: local_path}
+        stored: manifest of the last index snapshot (holds indexed commit SHAs)
+        pull: fetch and fast-forward repos whose `sync:` interval has elapsed
+    Returns:
+        (commits, changed_paths): {source_name: HEAD sha} and
+        {source_name: [changed file paths]} for sources that can be diffed
+    """
+    indexed = (stored or {}).get("commits", {})
+    commits, changed_paths = {}, {}
+
+    for src in sources:
+        name = src["name"]
+        path = local_paths.get(name)
+        if not src.get("repo") or not path:
+            continue
+
+        interval = parse_sync_interval(src.get("sync"))
+        if pull and interval and time.time() - _last_pull.get(name, 0) >= interval:
+            try:
+                pull_repo(path, src.get("branch"))
+            except (subprocess.CalledProcessError, OSError) as e:
+                print(f"⚠️ Could not update repo '{path}': {e}")
+            _last_pull[name] = time.time()
+
+        head = git_head(path)
+        if head is None:
+            continue
+        commits[name] = head
+
+        if name in indexed:
+            paths = git_changed_paths(path, indexed[name], head)
+            if paths is not None:
+                changed_paths[name] = paths
+
+    return commits, changed_paths
+
@@ -1,13 +1,111 @@
 import os
-from typing import List, Dict
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from typing import Dict, Iterable, Iterator, List
+from langchain.schema import Document
 
+ALLOWED_EXTS = ('.md', '.asciidoc', '.txt')
 
-def load_sop_files_from_config(internal_paths: Dict[str, str]):
+# Never descended into or opened, on top of hidden files/folders
+DEFAULT_IGNORE = ("node_modules", "__pycache__", "venv", "*.egg-info")
+
+DEFAULT_WORKERS = 8
+
+
+def list_sop_files(internal_paths: Dict[str, str], ignore: Iterable[str] = DEFAULT_IGNORE) -> Dict[str, str]:
+    """
+    List SOP files under the internal source folders without reading them.
+    Hidden files and folders, ignored patterns and other extensions are
+    filtered out while walking, so ignored subtrees (e.g. .git) are never entered.
+    Args:
+        internal_paths: dict { source_name: local_path }
+        ignore: glob patterns matched against file/folder names and relative paths
+    Returns:
+        dict { file_path: source_name }
+    """
+    files = {}
+    ignore = tuple(ignore or ())
+
+    for source_name, directory in internal_paths.items():
+        if not os.path.exists(directory):
+            continue
+
+        for root, dirs, names in os.walk(directory):
+            rel_root = os.path.relpath(root, directory)
+            dirs[:] = sorted(
+                d for d in dirs
+                if not d.startswith(".") and not _is_ignored(os.path.join(rel_root, d), ignore)
+            )
+            for name in sorted(names):
+                if is_sop_file(os.path.join(rel_root, name), ignore):
+                    files[os.path.join(root, name)] = source_name
+
+    return files
+
+
+def _is_ignored(relpath: str, ignore: tuple) -> bool:
+    relpath = os.path.normpath(relpath).replace(os.sep, "/")
+    name = relpath.rsplit("/", 1)[-1]
+    return any(fnmatch(name, pattern) or fnmatch(relpath, pattern) for pattern in ignore)
+
+
+def is_sop_file(relpath: str, ignore: Iterable[str] = DEFAULT_IGNORE) -> bool:
+    """True for a non-hidden, non-ignored file with an allowed SOP extension (path relative to the source folder)."""
+    parts = os.path.normpath(relpath).replace(os.sep, "/").split("/")
+    if any(part.startswith(".") and part not in (".", "..") for part in parts):
+        return False
+    ignore = tuple(ignore or ())
+    if any(_is_ignored("/".join(parts[:i + 1]), ignore) for i in range(len(parts))):
+        return False
+    return relpath.lower().endswith(ALLOWED_EXTS)
+
+
+def load_sop_file(path: str, source_type: str) -> Document | None:
+    """Load one SOP file as a Document, or None if it is missing or not UTF-8 text."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"⚠️  Could not read {path}: {e}")
+        return None
+    return Document(page_content=content, metadata={"source": path, "source_type": source_type})
+
+
+def iter_sop_documents(files: Dict[str, str], workers: int = DEFAULT_WORKERS) -> Iterator[Document]:
+    """
+    Read SOP files on a thread pool and yield Documents in the input order.
+    At most ~2x `workers` files are in flight, so callers can split and embed
+    while loading continues without holding every raw file in memory.
+    Args:
+        files: dict { file_path: source_name } (see list_sop_files)
+        workers: number of reader threads
+    """
+    items = iter(files.items())
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="sop-loader") as pool:
+        pending = deque()
+        for path, source_name in items:
+            pending.append(pool.submit(load_sop_file, path, source_name))
+            if len(pending) >= 2 * workers:
+                break
+
+        while pending:
+            doc = pending.popleft().result()
+            next_item = next(items, None)
+            if next_item:
+                pending.append(pool.submit(load_sop_file, *next_item))
+            if doc is not None:
+                yield doc
+
+
+def load_sop_files_from_config(internal_paths: Dict[str, str], workers: int = DEFAULT_WORKERS,
+                               ignore: Iterable[str] = DEFAULT_IGNORE):
     """
     Load SOP documents from multiple internal sources (defined in config.yaml).
     Args:
         internal_paths: dict { source_name: local_path }
+        workers: number of reader threads
+        ignore: glob patterns of files/folders to skip
     Returns:
         List of Document objects
     """
@@ -20,30 +118,12 @@ def load_sop_files_from_config(internal_paths: Dict[str, str]):
 
         print(f"📁 Loading SOPs from: {directory} [{source_name}]")
 
-        loader = DirectoryLoader(
-            path=directory,
-            glob="**/*",
-            loader_cls=TextLoader,
-            loader_kwargs={"encoding": "utf-8"},
-            show_progress=True
-        )
-
-        docs = loader.load()
-
-        # Filter by allowed extensions
-        allowed_exts = ('.md', '.asciidoc', '.txt')
-        filtered_docs = [
-            doc for doc in docs
-            if doc.metadata["source"].lower().endswith(allowed_exts)
-        ]
-
-        # Tag with metadata (source type = repo name or local folder)
-        for doc in filtered_docs:
-            doc.metadata["source_type"] = source_name
+        files = list_sop_files({source_name: directory}, ignore)
+        docs = list(iter_sop_documents(files, workers))
 
-        print(f"✅ Loaded {len(filtered_docs)} docs from '{source_name}'")
+        print(f"✅ Loaded {len(docs)} docs from '{source_name}'")
 
-        all_docs.extend(filtered_docs)
+        all_docs.extend(docs)
 
     print(f"📦 Total documents loaded: {len(all_docs)}")
     return all_docs
@@ -58,22 +138,4 @@ def load_single_sop_folder(directory: str, source_name: str = "manual") -> List:
         print(f"📁 Creating missing directory: {directory}")
         os.makedirs(directory, exist_ok=True)
 
-    loader = DirectoryLoader(
-        path=directory,
-        glob="**/*",
-        loader_cls=TextLoader,
-        loader_kwargs={"encoding": "utf-8"},
-        show_progress=False
-    )
-
-    docs = loader.load()
-    allowed_exts = ('.md', '.asciidoc', '.txt')
-    filtered_docs = [
-        doc for doc in docs
-        if doc.metadata["source"].lower().endswith(allowed_exts)
-    ]
-
-    for doc in filtered_docs:
-        doc.metadata["source_type"] = source_name
-
-    return filtered_docs
+    return list(iter_sop_documents(list_sop_files({source_name: directory})))